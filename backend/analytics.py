@@ -0,0 +1,83 @@
+# ==================== IMPORTS ==================== #
+
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from models import parse_timestamp
+
+
+# Width of the reservation series buckets, the database bins res_time the same way
+BUCKET_MINUTES = 15
+
+# Counters of event_stats, summed into the host totals
+EVENT_COUNTERS = ("reservations", "quantity_claimed", "cancellations", "quantity_cancelled", "attendees", "confirmed")
+
+
+# ==================== HELPER FUNCTION ==================== #
+def bucket_start(value: datetime) -> datetime:
+    """
+    Start of the 15 minute bucket value falls in (UTC), same as date_bin('15 minutes', value, '2000-01-01')
+    """
+    value = value.astimezone(timezone.utc)
+    return value - timedelta(minutes=value.minute % BUCKET_MINUTES, seconds=value.second, microseconds=value.microsecond)
+
+def _ended(event: dict, now: datetime) -> bool:
+    last_res_time = parse_timestamp(event.get("last_res_time"))
+    return last_res_time is not None and last_res_time < now
+
+
+# ==================== HOST ANALYTICS ==================== #
+def build_host_analytics(rollups: dict, now: datetime) -> dict:
+    """
+    Dashboard of a host from the rollup rows (Database.get_host_analytics): totals, per event counters,
+    reservations per 15 minute pickup window, quantity claimed per food, and the busiest window
+    There is no pickup check-in, so a no-show is an attendee of an event that is over who never rated it
+    Cost grows with the number of events and buckets, not with the number of reservations
+    """
+    totals = dict.fromkeys(EVENT_COUNTERS, 0)
+    totals["no_shows"] = 0
+    events = []
+    for row in sorted(rollups.get("events") or [], key=lambda row: row["event_id"]):
+        event = row.get("events") or {}
+        counters = {counter: row.get(counter) or 0 for counter in EVENT_COUNTERS}
+        counters["no_shows"] = max(counters["attendees"] - counters["confirmed"], 0) if _ended(event, now) else 0
+        for counter, value in counters.items():
+            totals[counter] += value
+        events.append({
+            "event_id": row["event_id"],
+            "event_name": event.get("event_name"),
+            "start_time": parse_timestamp(event.get("start_time")),
+            "last_res_time": parse_timestamp(event.get("last_res_time")),
+            **counters,
+        })
+    totals["events"] = len(events)
+
+    # Buckets of different events at the same time are added up
+    windows: dict[datetime, dict] = {}
+    for row in rollups.get("buckets") or []:
+        start = parse_timestamp(row["bucket_start"]).astimezone(timezone.utc)
+        window = windows.setdefault(start, {"bucket_start": start, "reservations": 0, "quantity": 0})
+        window["reservations"] += row.get("reservations") or 0
+        window["quantity"] += row.get("quantity") or 0
+    series = [window for _, window in sorted(windows.items()) if window["reservations"] > 0]
+    peak: Optional[dict] = max(series, key=lambda window: window["reservations"], default=None)
+
+    foods = [
+        {
+            "event_id": row["event_id"],
+            "food_name": row["food_name"],
+            "reservations": row.get("reservations") or 0,
+            "quantity": row.get("quantity") or 0,
+        }
+        for row in rollups.get("foods") or []
+        if (row.get("reservations") or 0) > 0
+    ]
+    foods.sort(key=lambda food: (-food["quantity"], food["event_id"], food["food_name"]))
+
+    return {
+        "totals": totals,
+        "events": events,
+        "reservations_per_15_min": series,
+        "peak": peak,
+        "food_claims": foods,
+    }
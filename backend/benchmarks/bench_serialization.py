@@ -0,0 +1,117 @@
+"""
+Micro-benchmark of encoding event listings (the /events/all shape, 5 foods per event)
+
+    python benchmarks/bench_serialization.py [--events 50 200 1000] [--repeat 50]
+
+Compares what the listing routes used to do (jsonable_encoder, then json.dumps like JSONResponse)
+with the orjson path they use now. Run from the backend folder.
+"""
+
+# ==================== IMPORTS ==================== #
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import orjson
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models import Event
+
+try:
+    from fastapi.encoders import jsonable_encoder
+except ImportError:
+    jsonable_encoder = None
+
+
+# ==================== PAYLOAD ==================== #
+def make_events(count: int, foods_per_event: int = 5) -> list[dict]:
+    random.seed(count)
+    now = datetime.now(timezone.utc)
+    events = []
+    for event_id in range(1, count + 1):
+        start = now + timedelta(minutes=random.randint(-600, 600))
+        events.append(Event.from_row({
+            "event_id": event_id,
+            "event_name": f"Leftover catering #{event_id}",
+            "description": "Sandwiches, wraps and fruit left over from the department seminar. " * 3,
+            "creator_id": random.randint(1, 50),
+            "start_time": start.isoformat(),
+            "last_res_time": (start + timedelta(hours=2)).isoformat(),
+            "created_at": (start - timedelta(days=1)).isoformat(),
+            "location_lat": 42.35 + random.random() / 100,
+            "location_lng": -71.10 + random.random() / 100,
+            "location_address": "665 Commonwealth Ave, Boston, MA",
+            "foods": [
+                {
+                    "food_id": event_id * 10 + i,
+                    "food_name": f"Food item {i}",
+                    "quantity": random.randint(0, 40),
+                    "event_id": event_id,
+                    "dietary_tags": "vegetarian,gluten-free",
+                }
+                for i in range(foods_per_event)
+            ],
+        }).to_dict())
+    return events
+
+
+# ==================== ENCODERS ==================== #
+def encode_stdlib(content) -> bytes:
+    # Same call JSONResponse.render makes
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+def encode_before(content) -> bytes:
+    return encode_stdlib(jsonable_encoder(content))
+
+def encode_stdlib_isoformat(content) -> bytes:
+    # Stand-in for jsonable_encoder when fastapi is not installed, only converts the datetimes
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=datetime.isoformat).encode("utf-8")
+
+def encode_after(content) -> bytes:
+    return orjson.dumps(content)
+
+
+def bench(encode, content, repeat: int) -> float:
+    """
+    Median seconds per encode
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        encode(content)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+# ==================== MAIN ==================== #
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    encoders = []
+    if jsonable_encoder is not None:
+        encoders.append(("jsonable_encoder + json", encode_before))
+    else:
+        print("fastapi is not installed, measuring json.dumps with a datetime default instead of jsonable_encoder + json")
+        encoders.append(("json (isoformat default)", encode_stdlib_isoformat))
+    encoders.append(("orjson", encode_after))
+
+    print(f"{'events':>7} {'bytes':>9}  " + "  ".join(f"{name:>26}" for name, _ in encoders) + "  speedup")
+    for count in args.events:
+        content = make_events(count)
+        size = len(encode_after(content))
+        results = [bench(encode, content, args.repeat) for _, encode in encoders]
+        cells = "  ".join(f"{seconds * 1000:>23.3f} ms" for seconds in results)
+        print(f"{count:>7} {size:>9}  {cells}  {results[0] / results[-1]:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,789 @@
+"""
+In-process stand-in for the supabase client, used by the load test
+
+Implements the part of the supabase-py query builder db.py's fallback path calls:
+table().select() (with embedded "foods(...)", "reservations(*)", "events(...)", and aliased "name:foods!inner(...)"
+embeds filtered with "name.column" filters), eq / in_ / gte / lte / ilike / or_,
+order / limit, insert / update / delete, and rpc() for the functions in supabase/migrations.
+Rows live in plain dicts, every call takes a lock (one statement at a time, like a transaction)
+and can sleep for a fixed latency first to stand in for the network round trip.
+"""
+
+# ==================== IMPORTS ==================== #
+
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from analytics import bucket_start
+
+
+# ==================== SCHEMA ==================== #
+PRIMARY_KEYS = {
+    "users": "user_id",
+    "events": "event_id",
+    "foods": "food_id",
+    "reservations": "res_id",
+    "ratings": "id",
+    "event_rating_summaries": "event_id",
+    "host_rating_summaries": "creator_id",
+    "event_stats": "event_id",
+    "event_attendees": ("event_id", "user_id"),
+    "event_reservation_buckets": ("event_id", "bucket_start"),
+    "event_food_claims": ("event_id", "food_name"),
+}
+
+# Columns compared as timestamps, stored as UTC ISO strings so string order is time order
+TIMESTAMP_COLUMNS = {"start_time", "last_res_time", "created_at", "res_time", "bucket_start"}
+
+# Columns the database fills in when an insert leaves them out
+DEFAULTS = {
+    "users": {"role": "regular_user", "optin": False},
+    "events": {"created_at": "now"},
+    "foods": {"dietary_tags": "", "dietary_mask": 0},
+    "reservations": {"res_time": "now"},
+    "ratings": {"created_at": "now"},
+}
+
+# GENERATED ALWAYS ... STORED columns: table -> {column: expression over the row}
+GENERATED = {
+    "foods": {"dietary_tag_list": lambda row: row.get("dietary_tags").split(",") if row.get("dietary_tags") else None},
+}
+
+# (table, embedded table) -> (column, embedded column, many-to-one)
+RELATIONS = {
+    ("events", "foods"): ("event_id", "event_id", False),
+    ("events", "reservations"): ("event_id", "event_id", False),
+    ("events", "ratings"): ("event_id", "event_id", False),
+    ("reservations", "events"): ("event_id", "event_id", True),
+    ("reservations", "foods"): ("food_id", "food_id", True),
+    ("foods", "events"): ("event_id", "event_id", True),
+    ("event_stats", "events"): ("event_id", "event_id", True),
+}
+
+# ON DELETE CASCADE foreign keys: table -> [(referencing table, referencing column)]
+CASCADES = {
+    "events": [
+        ("foods", "event_id"), ("reservations", "event_id"), ("ratings", "event_id"), ("event_rating_summaries", "event_id"),
+        ("event_stats", "event_id"), ("event_attendees", "event_id"), ("event_reservation_buckets", "event_id"), ("event_food_claims", "event_id"),
+    ],
+    "foods": [("reservations", "food_id")],
+    "users": [("reservations", "user_id"), ("ratings", "user_id"), ("host_rating_summaries", "creator_id")],
+}
+
+
+# ==================== HELPER FUNCTION ==================== #
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def _timestamp(value: Any) -> Any:
+    """
+    Normalize a timestamp to a UTC ISO string, anything else is returned as it is
+    """
+    if isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return value
+    else:
+        return value
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+def _coerce(column: str, value: Any) -> Any:
+    """
+    Filter values arrive as strings from or_(), turn them back into what the column holds
+    """
+    if column in TIMESTAMP_COLUMNS:
+        return _timestamp(value)
+    if isinstance(value, str):
+        if value in ("true", "false"):
+            return value == "true"
+        if re.fullmatch(r"-?\d+", value):
+            return int(value)
+        if re.fullmatch(r"-?\d+\.\d*", value):
+            return float(value)
+    return value
+
+def _split(text: str) -> list[str]:
+    """
+    Split on the commas that are not inside parentheses or double quotes
+    """
+    parts, depth, quoted, current = [], 0, False, []
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            parts.append("".join(current).strip())
+            current = []
+            continue
+        current.append(char)
+    if current:
+        parts.append("".join(current).strip())
+    return [part for part in parts if part]
+
+def _embed(column: str) -> Optional[tuple[str, str, bool, str]]:
+    """
+    (alias, table, inner joined, columns) of an embedded table in a select() list, None for a plain column
+    """
+    match = re.fullmatch(r"(?:(\w+):)?(\w+)(!inner)?\((.*)\)", column, re.DOTALL)
+    if match is None:
+        return None
+    alias, embedded, inner, embedded_columns = match.groups()
+    return alias or embedded, embedded, bool(inner), embedded_columns
+
+def _embeds(columns: str) -> list[tuple[str, str, bool, str]]:
+    return [embed for embed in map(_embed, _split(columns)) if embed is not None]
+
+def _array(literal: str) -> list[str]:
+    """
+    Elements of a postgres array literal ({a,"b c","d\\"e"})
+    """
+    return [
+        re.sub(r"\\(.)", r"\1", quoted) if quoted else bare.strip()
+        for quoted, bare in re.findall(r'"((?:[^"\\]|\\.)*)"|([^,{}]+)', literal)
+    ]
+
+def rating_star(rating: float) -> int:
+    """
+    Histogram bucket (1-5) of a rating, LEAST(GREATEST(ROUND(rating::NUMERIC), 1), 5) like submit_rating
+    """
+    return min(max(int(rating + 0.5), 1), 5)
+
+def _like(pattern: str) -> re.Pattern:
+    return re.compile("^" + ".*".join(re.escape(part) for part in pattern.split("%")) + "$", re.IGNORECASE | re.DOTALL)
+
+
+# ==================== FILTERS ==================== #
+def _compare(row_value: Any, operator: str, value: Any) -> bool:
+    if operator == "eq":
+        return row_value == value
+    if operator == "neq":
+        return row_value != value
+    if operator == "in":
+        return row_value in value
+    if operator == "is":
+        return row_value is None if value is None else row_value is value
+    if row_value is None or value is None:
+        return False
+    if operator == "gt":
+        return row_value > value
+    if operator == "gte":
+        return row_value >= value
+    if operator == "lt":
+        return row_value < value
+    if operator == "lte":
+        return row_value <= value
+    if operator == "ilike":
+        return bool(value.match(str(row_value)))
+    if operator == "cs":
+        return set(value) <= set(row_value)
+    raise ValueError(f"Unsupported operator: {operator}")
+
+def _parse_condition(text: str):
+    """
+    Parse one PostgREST logic tree term: col.op.value, and(...) or or(...)
+    Returns a predicate over a row
+    """
+    for group in ("and", "or"):
+        if text.startswith(f"{group}(") and text.endswith(")"):
+            terms = [_parse_condition(term) for term in _split(text[len(group) + 1:-1])]
+            combine = all if group == "and" else any
+            return lambda row: combine(term(row) for term in terms)
+    column, operator, value = text.split(".", 2)
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        value = value[1:-1]
+    if operator == "ilike":
+        value = _like(value.replace("*", "%"))
+    elif operator == "in":
+        value = [_coerce(column, item.strip('"')) for item in _split(value.strip("()"))]
+    elif operator == "is":
+        value = {"null": None, "true": True, "false": False}[value]
+    else:
+        value = _coerce(column, value)
+    return lambda row: _compare(row.get(column), operator, value)
+
+
+# ==================== TABLES ==================== #
+class Table:
+    """
+    Rows of one table by primary key, with hash indexes built on demand for the columns queries filter on
+    Serial keys are assigned on insert, composite keys (a tuple of columns) have to be given
+    """
+
+    def __init__(self, name: str, rows: Optional[list[dict]] = None):
+        self.name = name
+        self.key = PRIMARY_KEYS[name]
+        self.rows: dict[int, dict] = {}
+        self.next_id = 1
+        self.indexes: dict[str, dict[Any, dict[int, dict]]] = {}
+        for row in rows or []:
+            self.insert(row)
+
+    def insert(self, values: dict) -> dict:
+        row = {column: _timestamp(value) if column in TIMESTAMP_COLUMNS else value for column, value in values.items()}
+        for column, default in DEFAULTS.get(self.name, {}).items():
+            if row.get(column) is None:
+                row[column] = _now() if default == "now" else default
+        for column, expression in GENERATED.get(self.name, {}).items():
+            row[column] = expression(row)
+        if isinstance(self.key, str):
+            if row.get(self.key) is None:
+                row[self.key] = self.next_id
+            self.next_id = max(self.next_id, row[self.key] + 1)
+        key = self.row_key(row)
+        self.rows[key] = row
+        for column, index in self.indexes.items():
+            index.setdefault(row.get(column), {})[key] = row
+        return row
+
+    def row_key(self, row: dict) -> Any:
+        if isinstance(self.key, str):
+            return row[self.key]
+        return tuple(row[column] for column in self.key)
+
+    def update(self, row: dict, values: dict):
+        for column, value in values.items():
+            if column in TIMESTAMP_COLUMNS:
+                value = _timestamp(value)
+            index = self.indexes.get(column)
+            if index is not None and row.get(column) != value:
+                index.get(row.get(column), {}).pop(self.row_key(row), None)
+                index.setdefault(value, {})[self.row_key(row)] = row
+            row[column] = value
+        for column, expression in GENERATED.get(self.name, {}).items():
+            row[column] = expression(row)
+
+    def delete(self, row: dict):
+        self.rows.pop(self.row_key(row), None)
+        for column, index in self.indexes.items():
+            index.get(row.get(column), {}).pop(self.row_key(row), None)
+
+    def lookup(self, column: str, values: list) -> list[dict]:
+        """
+        Rows whose column is one of values, through the column's index
+        """
+        if column == self.key:
+            return [self.rows[value] for value in values if value in self.rows]
+        index = self.indexes.get(column)
+        if index is None:
+            index = {}
+            for row in self.rows.values():
+                index.setdefault(row.get(column), {})[self.row_key(row)] = row
+            self.indexes[column] = index
+        matched = []
+        for value in values:
+            matched.extend(index.get(value, {}).values())
+        return matched
+
+
+# ==================== QUERY BUILDER ==================== #
+@dataclass
+class APIResponse:
+    data: Any
+    count: Optional[int] = None
+
+
+class QueryParams(list):
+    """
+    The (key, value) pairs PostgREST would get, read like httpx.QueryParams by db._query_shape
+    """
+
+    def multi_items(self) -> list[tuple[str, str]]:
+        return list(self)
+
+
+class Query:
+    """
+    One chained table() call, run by execute()
+    """
+
+    def __init__(self, client: "FakeSupabase", table: str):
+        self.client = client
+        self.table = table
+        self.operation = "select"
+        self.columns = "*"
+        self.values: Any = None
+        self.filters: list[tuple[str, str, Any]] = []
+        self.conditions: list = []
+        self.orders: list[tuple[str, bool]] = []
+        self.row_limit: Optional[int] = None
+        self.params = QueryParams()
+
+    # ----- operations ----- #
+    def select(self, columns: str = "*", count: Optional[str] = None) -> "Query":
+        self.columns = columns
+        self.params.append(("select", columns))
+        return self
+
+    def insert(self, values) -> "Query":
+        self.operation = "insert"
+        self.values = values
+        return self
+
+    def update(self, values: dict) -> "Query":
+        self.operation = "update"
+        self.values = values
+        return self
+
+    def delete(self) -> "Query":
+        self.operation = "delete"
+        return self
+
+    # ----- filters ----- #
+    def _filter(self, column: str, operator: str, value: Any) -> "Query":
+        self.filters.append((column, operator, value))
+        self.params.append((column, f"{operator}.{value}"))
+        return self
+
+    def eq(self, column: str, value: Any) -> "Query":
+        return self._filter(column, "eq", _coerce(column, value))
+
+    def neq(self, column: str, value: Any) -> "Query":
+        return self._filter(column, "neq", _coerce(column, value))
+
+    def gt(self, column: str, value: Any) -> "Query":
+        return self._filter(column, "gt", _coerce(column, value))
+
+    def gte(self, column: str, value: Any) -> "Query":
+        return self._filter(column, "gte", _coerce(column, value))
+
+    def lt(self, column: str, value: Any) -> "Query":
+        return self._filter(column, "lt", _coerce(column, value))
+
+    def lte(self, column: str, value: Any) -> "Query":
+        return self._filter(column, "lte", _coerce(column, value))
+
+    def in_(self, column: str, values: list) -> "Query":
+        return self._filter(column, "in", [_coerce(column, value) for value in values])
+
+    def ilike(self, column: str, pattern: str) -> "Query":
+        return self._filter(column, "ilike", _like(pattern))
+
+    def contains(self, column: str, value) -> "Query":
+        return self._filter(column, "cs", _array(value) if isinstance(value, str) else list(value))
+
+    def or_(self, filters: str) -> "Query":
+        self.conditions.append(_parse_condition(f"or({filters})"))
+        self.params.append(("or", f"({filters})"))
+        return self
+
+    # ----- modifiers ----- #
+    def order(self, column: str, desc: bool = False) -> "Query":
+        self.orders.append((column, desc))
+        self.params.append(("order", f"{column}.{'desc' if desc else 'asc'}"))
+        return self
+
+    def limit(self, size: int) -> "Query":
+        self.row_limit = size
+        self.params.append(("limit", str(size)))
+        return self
+
+    def execute(self) -> APIResponse:
+        return self.client._run(self.table, self.operation, self._execute)
+
+    # ----- execution ----- #
+    def _row_filters(self) -> list[tuple[str, str, Any]]:
+        return [(column, operator, value) for column, operator, value in self.filters if "." not in column]
+
+    def _embed_filters(self) -> dict[str, list[tuple[str, str, Any]]]:
+        """
+        Filters on embedded tables ("alias.column") by alias
+        """
+        filters: dict[str, list] = {}
+        for column, operator, value in self.filters:
+            if "." in column:
+                alias, embedded_column = column.split(".", 1)
+                filters.setdefault(alias, []).append((embedded_column, operator, value))
+        return filters
+
+    def _matching(self, table: Table) -> list[dict]:
+        row_filters = self._row_filters()
+        # Start from an index when there is an equality filter, like the planner would
+        indexed = next(((column, operator, value) for column, operator, value in row_filters if operator in ("eq", "in")), None)
+        if indexed is not None:
+            column, operator, value = indexed
+            rows = table.lookup(column, [value] if operator == "eq" else value)
+            rows.sort(key=table.row_key)
+        else:
+            rows = list(table.rows.values())
+        return [
+            row for row in rows
+            if all(_compare(row.get(column), operator, value) for column, operator, value in row_filters)
+            and all(condition(row) for condition in self.conditions)
+        ]
+
+    def _sort(self, rows: list[dict]) -> list[dict]:
+        # Stable sorts from the last key to the first, nulls first when descending like postgres
+        for column, desc in reversed(self.orders):
+            present = [row for row in rows if row.get(column) is not None]
+            missing = [row for row in rows if row.get(column) is None]
+            present.sort(key=lambda row: row[column], reverse=desc)
+            rows = missing + present if desc else present + missing
+        return rows
+
+    def _execute(self) -> Any:
+        table = self.client.tables[self.table]
+        if self.operation == "insert":
+            values = self.values if isinstance(self.values, list) else [self.values]
+            return [dict(table.insert(dict(row))) for row in values]
+
+        rows = self._matching(table)
+        embed_filters = self._embed_filters()
+        if self.operation == "select":
+            # Inner joined embeds drop the rows they have nothing for, before the limit like a join would
+            for alias, embedded, inner, _ in _embeds(self.columns):
+                if inner:
+                    rows = [row for row in rows if self.client._related(self.table, embedded, row, embed_filters.get(alias))]
+        rows = self._sort(rows)
+        if self.row_limit is not None:
+            rows = rows[:self.row_limit]
+        if self.operation == "update":
+            for row in rows:
+                table.update(row, self.values)
+            return [dict(row) for row in rows]
+        if self.operation == "delete":
+            for row in rows:
+                self.client._delete(table, row)
+            return [dict(row) for row in rows]
+        return [self.client._project(self.table, row, self.columns, embed_filters) for row in rows]
+
+
+class RPC:
+    def __init__(self, client: "FakeSupabase", function: str, params: dict):
+        self.client = client
+        self.function = function
+        self.params = params
+
+    def execute(self) -> APIResponse:
+        implementation = getattr(self.client, f"_rpc_{self.function}", None)
+        if implementation is None:
+            raise ValueError(f"Unknown database function: {self.function}")
+        return self.client._run("rpc", self.function, lambda: implementation(**self.params))
+
+
+# ==================== CLIENT ==================== #
+class FakeSupabase:
+    """
+    Drop-in for supabase.Client in db.Database, holding tables (name -> list of rows) in memory
+    latency is slept before every call, outside the lock, so concurrent calls overlap like real round trips
+    """
+
+    def __init__(self, tables: Optional[dict[str, list[dict]]] = None, latency: float = 0.0):
+        self.tables = {name: Table(name, (tables or {}).get(name)) for name in PRIMARY_KEYS}
+        self.latency = latency
+        self._lock = threading.Lock()
+
+        # Counters for the load test report
+        self.calls: Counter = Counter()
+        self.errors: Counter = Counter()
+
+    def table(self, name: str) -> Query:
+        if name not in self.tables:
+            raise ValueError(f"Unknown table: {name}")
+        return Query(self, name)
+
+    def rpc(self, function: str, params: dict) -> RPC:
+        return RPC(self, function, params)
+
+    def _run(self, table: str, operation: str, run) -> APIResponse:
+        if self.latency:
+            time.sleep(self.latency)
+        self.calls[(table, operation)] += 1
+        try:
+            with self._lock:
+                return APIResponse(data=run())
+        except Exception:
+            self.errors[(table, operation)] += 1
+            raise
+
+    # ----- rows ----- #
+    def _delete(self, table: Table, row: dict):
+        table.delete(row)
+        if table.name == "reservations":
+            self._untrack_reservation(row)
+        for referencing, column in CASCADES.get(table.name, ()):
+            child = self.tables[referencing]
+            for child_row in child.lookup(column, [row[table.key]]):
+                self._delete(child, child_row)
+
+    def _related(self, table: str, embedded: str, row: dict, filters: Optional[list] = None) -> list[dict]:
+        """
+        Rows of embedded that belong to row, narrowed by filters on their columns
+        """
+        local, foreign, _ = RELATIONS[(table, embedded)]
+        related = self.tables[embedded].lookup(foreign, [row.get(local)])
+        related = [
+            related_row for related_row in related
+            if all(_compare(related_row.get(column), operator, value) for column, operator, value in filters or ())
+        ]
+        related.sort(key=lambda related_row: related_row[PRIMARY_KEYS[embedded]])
+        return related
+
+    def _project(self, table: str, row: dict, columns: str, embed_filters: Optional[dict] = None) -> dict:
+        """
+        Copy of row with the select()ed columns and embedded tables (narrowed by their filters)
+        """
+        result = {}
+        for column in _split(columns):
+            embed = _embed(column)
+            if embed is None:
+                if column == "*":
+                    result.update(row)
+                else:
+                    result[column] = row.get(column)
+                continue
+            alias, embedded, _, embedded_columns = embed
+            related = self._related(table, embedded, row, (embed_filters or {}).get(alias))
+            projected = [self._project(embedded, related_row, embedded_columns) for related_row in related]
+            to_one = RELATIONS[(table, embedded)][2]
+            result[alias] = (projected[0] if projected else None) if to_one else projected
+        return result
+
+    # ----- database functions (supabase/migrations) ----- #
+    def _rpc_reserve_food(self, p_user_id, p_user_name, p_food_id, p_food_name, p_event_id, p_quantity, p_res_time, p_notes) -> dict:
+        if p_quantity is None or p_quantity <= 0:
+            return {"status": "invalid_quantity"}
+        foods = self.tables["foods"]
+        food = foods.rows.get(p_food_id)
+        if food is None or food["event_id"] != p_event_id or food["quantity"] < p_quantity:
+            return {"status": "sold_out"}
+        foods.update(food, {"quantity": food["quantity"] - p_quantity})
+        remaining = food["quantity"]
+        reservation = self.tables["reservations"].insert({
+            "user_id": p_user_id,
+            "user_name": p_user_name,
+            "food_id": p_food_id,
+            "food_name": p_food_name,
+            "event_id": p_event_id,
+            "quantity": p_quantity,
+            "res_time": p_res_time,
+            "notes": p_notes,
+        })
+        event = self.tables["events"].rows.get(p_event_id)
+        creator_id = event["creator_id"] if event else None
+        self._track_reservation(p_event_id, creator_id, p_user_id, p_food_name, reservation["res_time"], p_quantity, 1)
+        return {
+            "status": "ok",
+            "res_id": reservation["res_id"],
+            "remaining": remaining,
+            "creator_id": creator_id,
+        }
+
+    def _rpc_reserve_foods(self, p_user_id, p_user_name, p_event_id, p_items, p_res_time, p_notes) -> dict:
+        items: dict[int, dict] = {}
+        for item in p_items or []:
+            merged = items.setdefault(item.get("food_id"), {"quantity": 0, "notes": []})
+            merged["quantity"] += item.get("quantity") or 0
+            if item.get("notes"):
+                merged["notes"].append(item["notes"])
+        if not items or any(food_id is None or item["quantity"] <= 0 for food_id, item in items.items()):
+            return {"status": "invalid_quantity"}
+
+        foods = self.tables["foods"]
+        short = []
+        for food_id, item in sorted(items.items()):
+            food = foods.rows.get(food_id)
+            available = food["quantity"] if food is not None and food["event_id"] == p_event_id else 0
+            if available < item["quantity"]:
+                short.append({"food_id": food_id, "requested": item["quantity"], "available": available})
+        if short:
+            return {"status": "sold_out", "short": short}
+
+        event = self.tables["events"].rows.get(p_event_id)
+        creator_id = event["creator_id"] if event else None
+        reservations = []
+        for food_id, item in sorted(items.items()):
+            food = foods.rows[food_id]
+            foods.update(food, {"quantity": food["quantity"] - item["quantity"]})
+            reservation = self.tables["reservations"].insert({
+                "user_id": p_user_id,
+                "user_name": p_user_name,
+                "food_id": food_id,
+                "food_name": food["food_name"],
+                "event_id": p_event_id,
+                "quantity": item["quantity"],
+                "res_time": p_res_time,
+                "notes": "; ".join(item["notes"]) or p_notes,
+            })
+            reservations.append({
+                "res_id": reservation["res_id"],
+                "food_id": food_id,
+                "food_name": food["food_name"],
+                "quantity": item["quantity"],
+                "remaining": food["quantity"],
+            })
+        for reservation in reservations:
+            self._track_reservation(p_event_id, creator_id, p_user_id, reservation["food_name"], _timestamp(p_res_time), reservation["quantity"], 1)
+        return {"status": "ok", "reservations": reservations, "creator_id": creator_id}
+
+    def _rpc_create_event_with_foods(self, p_event, p_foods) -> dict:
+        event = self.tables["events"].insert({
+            column: p_event.get(column)
+            for column in ("creator_id", "event_name", "description", "start_time", "last_res_time", "location_lat", "location_lng", "location_address")
+        })
+        food_ids = []
+        for food in p_foods or []:
+            food_ids.append(self.tables["foods"].insert({
+                "food_name": food.get("food_name"),
+                "quantity": food.get("quantity"),
+                "event_id": event["event_id"],
+                "dietary_tags": food.get("dietary_tags") or "",
+                "dietary_mask": food.get("dietary_mask") or 0,
+            })["food_id"])
+        return {"event_id": event["event_id"], "food_ids": sorted(food_ids)}
+
+    def _rpc_apply_event_update(self, p_event_id, p_event, p_food_updates, p_cancellations) -> dict:
+        events = self.tables["events"]
+        foods = self.tables["foods"]
+        reservations = self.tables["reservations"]
+
+        event_updated = False
+        event = events.rows.get(p_event_id)
+        if p_event and event is not None:
+            changes = {column: value for column, value in p_event.items() if value is not None or column == "description"}
+            events.update(event, changes)
+            event_updated = True
+
+        foods_updated = []
+        for update in p_food_updates or []:
+            food = foods.rows.get(update["food_id"])
+            if food is None or food["event_id"] != p_event_id:
+                continue
+            changes = {"quantity": update["quantity"]}
+            for column in ("dietary_tags", "dietary_mask"):
+                if update.get(column) is not None:
+                    changes[column] = update[column]
+            foods.update(food, changes)
+            foods_updated.append(food["food_id"])
+
+        # Cancelled quantities go back to their food
+        cancelled = []
+        per_food: dict[int, int] = {}
+        for cancellation in p_cancellations or []:
+            reservation = reservations.rows.get(cancellation["res_id"])
+            if reservation is None or reservation["event_id"] != p_event_id:
+                continue
+            self._delete(reservations, reservation)
+            cancelled.append(reservation["res_id"])
+            per_food[reservation["food_id"]] = per_food.get(reservation["food_id"], 0) + reservation["quantity"]
+        restored = []
+        for food_id, quantity in per_food.items():
+            food = foods.rows.get(food_id)
+            if food is not None:
+                foods.update(food, {"quantity": food["quantity"] + quantity})
+                restored.append({"food_id": food_id, "quantity": food["quantity"]})
+
+        return {
+            "event_updated": event_updated,
+            "foods_updated": sorted(foods_updated),
+            "reservations_cancelled": sorted(cancelled),
+            "foods_restored": restored,
+        }
+
+    def _add_rating(self, table: str, key: int, rating: float, values: dict):
+        summaries = self.tables[table]
+        summary = summaries.rows.get(key)
+        if summary is None:
+            summary = summaries.insert({
+                summaries.key: key, **values, "rating_count": 0, "rating_sum": 0.0, **{f"stars_{star}": 0 for star in range(1, 6)}
+            })
+        star = f"stars_{rating_star(rating)}"
+        summaries.update(summary, {
+            "rating_count": summary["rating_count"] + 1,
+            "rating_sum": summary["rating_sum"] + rating,
+            star: summary[star] + 1,
+        })
+
+    def _add_counts(self, table: str, key: dict, counts: dict, values: dict) -> dict:
+        rows = self.tables[table]
+        row = rows.rows.get(rows.row_key(key))
+        if row is None:
+            return rows.insert({**key, **values, **counts})
+        rows.update(row, {column: row[column] + count for column, count in counts.items()})
+        return row
+
+    def _track_reservation(self, event_id, creator_id, user_id, food_name, res_time, quantity, count):
+        """
+        track_reservation of the host_analytics migration
+        """
+        attendees = self.tables["event_attendees"]
+        attendee_delta = confirmed_delta = 0
+        attendee = attendees.rows.get((event_id, user_id))
+        if count > 0:
+            if attendee is None:
+                attendees.insert({"event_id": event_id, "user_id": user_id, "reservations": count, "rated": False})
+                attendee_delta = 1
+            else:
+                attendees.update(attendee, {"reservations": attendee["reservations"] + count})
+        elif attendee is not None:
+            attendees.update(attendee, {"reservations": attendee["reservations"] + count})
+            if attendee["reservations"] <= 0:
+                attendees.delete(attendee)
+                attendee_delta = -1
+                confirmed_delta = -1 if attendee["rated"] else 0
+
+        self._add_counts("event_stats", {"event_id": event_id}, {
+            "reservations": count,
+            "quantity_claimed": quantity,
+            "cancellations": max(-count, 0),
+            "quantity_cancelled": max(-quantity, 0),
+            "attendees": attendee_delta,
+            "confirmed": confirmed_delta,
+        }, {"creator_id": creator_id})
+        if res_time is not None:
+            start = _timestamp(bucket_start(datetime.fromisoformat(res_time)))
+            self._add_counts("event_reservation_buckets", {"event_id": event_id, "bucket_start": start}, {"reservations": count, "quantity": quantity}, {"creator_id": creator_id})
+        self._add_counts("event_food_claims", {"event_id": event_id, "food_name": food_name or ""}, {"reservations": count, "quantity": quantity}, {"creator_id": creator_id})
+
+    def _untrack_reservation(self, reservation: dict):
+        """
+        The reservations_untrack trigger of the untrack_deleted_reservations migration, the rollups of a deleted event went with it
+        """
+        event = self.tables["events"].rows.get(reservation["event_id"])
+        if event is not None:
+            self._track_reservation(
+                event["event_id"], event["creator_id"], reservation["user_id"], reservation.get("food_name"),
+                reservation["res_time"], -reservation["quantity"], -1,
+            )
+
+    def _rpc_submit_rating(self, p_event_id, p_user_id, p_rating, p_description) -> dict:
+        if not any(reservation["user_id"] == p_user_id for reservation in self.tables["reservations"].lookup("event_id", [p_event_id])):
+            return {"status": "not_attended"}
+        event = self.tables["events"].rows.get(p_event_id)
+        creator_id = event["creator_id"] if event else None
+        rating = self.tables["ratings"].insert({
+            "event_id": p_event_id,
+            "user_id": p_user_id,
+            "rating": p_rating,
+            "description": p_description or "",
+        })
+        self._add_rating("event_rating_summaries", p_event_id, p_rating, {"creator_id": creator_id})
+        if creator_id is not None:
+            self._add_rating("host_rating_summaries", creator_id, p_rating, {})
+        attendee = self.tables["event_attendees"].rows.get((p_event_id, p_user_id))
+        if attendee is not None and not attendee["rated"]:
+            self.tables["event_attendees"].update(attendee, {"rated": True})
+            stats = self.tables["event_stats"].rows.get(p_event_id)
+            if stats is not None:
+                self.tables["event_stats"].update(stats, {"confirmed": stats["confirmed"] + 1})
+        return {"status": "ok", "rating_id": rating["id"], "creator_id": creator_id}
+
+    # ----- metrics ----- #
+    def stats(self) -> dict:
+        return {
+            "rows": {name: len(table.rows) for name, table in self.tables.items()},
+            "calls": sum(self.calls.values()),
+            "errors": sum(self.errors.values()),
+        }
@@ -0,0 +1,420 @@
+"""
+Load test of main.py's app against synthetic data, reports latency percentiles and throughput per route
+
+    python benchmarks/load_test.py [--scale small|medium|large] [--concurrency 50] [--duration 30]
+                                   [--mix browse=60,filter=25,reserve=10,host_edit=5] [--db-latency-ms 5]
+                                   [--json results.json] [--baseline previous.json --max-regression 0.2]
+
+By default the app runs against benchmarks/fake_supabase.py (the supabase fallback path of db.py),
+--db-latency-ms adds a fixed round trip to every database call. With --database-url it runs on the
+asyncpg pool path instead, against a local Postgres with the migrations applied: --reset-database
+truncates its tables and loads the synthetic data first.
+
+Requests go straight into the ASGI app (httpx.ASGITransport), so the numbers are the app's own cost
+without sockets or a server in between. Virtual users each loop over weighted scenarios:
+    browse     /events/all, /events/{id}, /get-food/{id}, sometimes /active-events, /ratings/{id}(/summary), /user/reservations
+    filter     /events/filtered with a time and dietary filter (sometimes the next page), sometimes /events/nearby
+    reserve    /get-food/{id} of a running event, then /createreservation (sometimes /createreservation/batch)
+    host_edit  /host/events, sometimes /host/analytics, /events/{id}, then /events/update/{id}
+Emails go to the in-memory outbox backend. Run from the backend folder, needs httpx.
+"""
+
+# ==================== IMPORTS ==================== #
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Optional
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dietary import DIETARY_TAGS
+from fake_supabase import PRIMARY_KEYS, TIMESTAMP_COLUMNS, FakeSupabase
+from synthetic_data import CAMPUS_LAT, CAMPUS_LNG, SCALES, generate
+
+DEFAULT_MIX = "browse=60,filter=25,reserve=10,host_edit=5"
+TIME_FILTERS = ("all", "just_started", "within_hour", "ending_soon", "running_now", "fresh_food")
+
+
+# ==================== APP ==================== #
+def load_app(fake: FakeSupabase, database_url: Optional[str]):
+    """
+    Import main.py with the fake as its supabase client, emails kept in memory
+    """
+    os.environ["EMAIL_BACKEND"] = "memory"
+    os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+    os.environ.setdefault("SUPABASE_KEY", "load-test")
+    if database_url:
+        os.environ["DATABASE_URL"] = database_url
+    else:
+        os.environ.pop("DATABASE_URL", None)
+
+    import supabase
+    supabase.create_client = lambda url, key: fake
+    import main
+    return main
+
+async def seed_postgres(dsn: str, tables: dict[str, list[dict]]):
+    """
+    Replace the contents of a local database with the synthetic rows, sequences continue after them
+    """
+    import asyncpg
+
+    conn = await asyncpg.connect(dsn)
+    try:
+        async with conn.transaction():
+            await conn.execute("TRUNCATE ratings, reservations, foods, events, users RESTART IDENTITY CASCADE")
+            for table, rows in tables.items():
+                if not rows:
+                    continue
+                columns = list(rows[0])
+                records = [
+                    tuple(datetime.fromisoformat(row[column]) if column in TIMESTAMP_COLUMNS and row[column] else row[column] for column in columns)
+                    for row in rows
+                ]
+                await conn.copy_records_to_table(table, records=records, columns=columns)
+                key = PRIMARY_KEYS[table]
+                if not isinstance(key, str):
+                    continue
+                await conn.execute(f"SELECT setval(pg_get_serial_sequence('{table}', '{key}'), (SELECT max({key}) FROM {table}))")
+    finally:
+        await conn.close()
+
+
+# ==================== RECORDING ==================== #
+class Recorder:
+    """
+    Latency samples and status codes per route label, only while recording is on (not during warmup)
+    """
+
+    def __init__(self):
+        self.recording = False
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, Counter] = defaultdict(Counter)
+        self.started_at = 0.0
+        self.stopped_at = 0.0
+
+    def record(self, label: str, status, seconds: float):
+        if not self.recording:
+            return
+        self.latencies[label].append(seconds)
+        self.statuses[label][status] += 1
+
+    def start(self):
+        self.recording = True
+        self.started_at = time.perf_counter()
+
+    def stop(self):
+        self.recording = False
+        self.stopped_at = time.perf_counter()
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile of already sorted samples
+    """
+    if not samples:
+        return 0.0
+    rank = max(1, round(fraction * len(samples) + 0.5))
+    return samples[min(rank, len(samples)) - 1]
+
+def summarize(recorder: Recorder) -> dict:
+    elapsed = max(recorder.stopped_at - recorder.started_at, 1e-9)
+    routes = {}
+    everything = []
+    for label in sorted(recorder.latencies):
+        samples = sorted(recorder.latencies[label])
+        everything.extend(samples)
+        statuses = recorder.statuses[label]
+        routes[label] = {
+            "requests": len(samples),
+            "rps": len(samples) / elapsed,
+            "p50_ms": percentile(samples, 0.50) * 1000,
+            "p95_ms": percentile(samples, 0.95) * 1000,
+            "p99_ms": percentile(samples, 0.99) * 1000,
+            "max_ms": samples[-1] * 1000,
+            "client_errors": sum(count for status, count in statuses.items() if isinstance(status, int) and 400 <= status < 500),
+            "errors": sum(count for status, count in statuses.items() if not isinstance(status, int) or status >= 500),
+            "statuses": {str(status): count for status, count in statuses.items()},
+        }
+    everything.sort()
+    total = {
+        "requests": len(everything),
+        "rps": len(everything) / elapsed,
+        "p50_ms": percentile(everything, 0.50) * 1000,
+        "p95_ms": percentile(everything, 0.95) * 1000,
+        "p99_ms": percentile(everything, 0.99) * 1000,
+        "max_ms": everything[-1] * 1000 if everything else 0.0,
+        "client_errors": sum(route["client_errors"] for route in routes.values()),
+        "errors": sum(route["errors"] for route in routes.values()),
+    }
+    return {"elapsed_seconds": elapsed, "routes": routes, "total": total}
+
+
+# ==================== SCENARIOS ==================== #
+@dataclass
+class Context:
+    client: httpx.AsyncClient
+    recorder: Recorder
+    rng: random.Random
+    tokens: dict[int, str]
+    users: list[int]
+    hosts: list[int]
+    event_ids: list[int]
+    rated_event_ids: list[int]
+    sold_out: set = field(default_factory=set)
+
+    async def call(self, label: str, method: str, url: str, user_id: Optional[int] = None, **kwargs) -> Optional[httpx.Response]:
+        headers = {"Authorization": f"Bearer {self.tokens[user_id]}"} if user_id is not None else {}
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+        except Exception as e:
+            self.recorder.record(label, type(e).__name__, time.perf_counter() - started)
+            return None
+        self.recorder.record(label, response.status_code, time.perf_counter() - started)
+        return response
+
+
+def _json(response: Optional[httpx.Response]):
+    if response is None or response.status_code != 200:
+        return None
+    return response.json()
+
+async def browse(ctx: Context):
+    user_id = ctx.rng.choice(ctx.users)
+    listing = _json(await ctx.call("GET /events/all", "GET", "/events/all?limit=20", user_id))
+    event_id = ctx.rng.choice(listing)["event_id"] if listing else ctx.rng.choice(ctx.event_ids)
+    await ctx.call("GET /events/{event_id}", "GET", f"/events/{event_id}", user_id)
+    await ctx.call("GET /get-food/{event_id}", "GET", f"/get-food/{event_id}")
+    if ctx.rng.random() < 0.3:
+        await ctx.call("GET /active-events", "GET", "/active-events")
+    if ctx.rng.random() < 0.2 and ctx.rated_event_ids:
+        rated_event_id = ctx.rng.choice(ctx.rated_event_ids)
+        await ctx.call("GET /ratings/{event_id}/summary", "GET", f"/ratings/{rated_event_id}/summary")
+        await ctx.call("GET /ratings/{event_id}", "GET", f"/ratings/{rated_event_id}?limit=20")
+    if ctx.rng.random() < 0.1:
+        await ctx.call("GET /user/reservations", "GET", "/user/reservations?limit=20", user_id)
+
+async def filter_events(ctx: Context):
+    user_id = ctx.rng.choice(ctx.users)
+    params = {"time_filter": ctx.rng.choice(TIME_FILTERS), "limit": 20}
+    if ctx.rng.random() < 0.4:
+        params["dietary_restrictions"] = ",".join(ctx.rng.sample(DIETARY_TAGS, ctx.rng.choice((1, 1, 2))))
+    response = await ctx.call("GET /events/filtered", "GET", "/events/filtered", user_id, params=params)
+    next_cursor = response.headers.get("X-Next-Cursor") if response is not None and response.status_code == 200 else None
+    if next_cursor and ctx.rng.random() < 0.3:
+        await ctx.call("GET /events/filtered", "GET", "/events/filtered", user_id, params={**params, "cursor": next_cursor})
+    if ctx.rng.random() < 0.3:
+        await ctx.call("GET /events/nearby", "GET", "/events/nearby", user_id, params={
+            "lat": CAMPUS_LAT + ctx.rng.uniform(-0.01, 0.01),
+            "lng": CAMPUS_LNG + ctx.rng.uniform(-0.01, 0.01),
+            "radius": ctx.rng.choice((500, 1000, 2000)),
+            "time_filter": ctx.rng.choice(("all", "running_now")),
+        })
+
+async def reserve(ctx: Context):
+    user_id = ctx.rng.choice(ctx.users)
+    active = _json(await ctx.call("GET /active-events", "GET", "/active-events"))
+    candidates = [event["event_id"] for event in (active or {}).get("events", []) if event["event_id"] not in ctx.sold_out]
+    event_id = ctx.rng.choice(candidates) if candidates else ctx.rng.choice(ctx.event_ids)
+    foods = _json(await ctx.call("GET /get-food/{event_id}", "GET", f"/get-food/{event_id}"))
+    available = [food for food in (foods or {}).get("foods", []) if food["quantity"] > 0]
+    if not available:
+        ctx.sold_out.add(event_id)
+        return
+    if len(available) > 1 and ctx.rng.random() < 0.3:
+        # A whole order in one request
+        await ctx.call("POST /createreservation/batch", "POST", "/createreservation/batch", user_id, json={
+            "event_id": event_id,
+            "items": [{"food_id": food["food_id"], "quantity": 1} for food in ctx.rng.sample(available, min(len(available), 3))],
+            "pickup_time": datetime.now(timezone.utc).isoformat(),
+        })
+        return
+    food = ctx.rng.choice(available)
+    await ctx.call("POST /createreservation", "POST", "/createreservation", user_id, json={
+        "food_id": food["food_id"],
+        "food_name": food["food_name"],
+        "event_id": event_id,
+        "quantity": 1,
+        "pickup_time": datetime.now(timezone.utc).isoformat(),
+        "note": "",
+    })
+
+async def host_edit(ctx: Context):
+    host_id = ctx.rng.choice(ctx.hosts)
+    listing = _json(await ctx.call("GET /host/events", "GET", "/host/events?limit=20", host_id))
+    if ctx.rng.random() < 0.3:
+        await ctx.call("GET /host/analytics", "GET", "/host/analytics", host_id)
+    events = (listing or {}).get("active_events", []) + (listing or {}).get("archived_events", [])
+    if not events:
+        return
+    event_id = ctx.rng.choice(events)["event_id"]
+    current = _json(await ctx.call("GET /events/{event_id}", "GET", f"/events/{event_id}", host_id))
+    if current is None:
+        return
+    event = current["event"]
+    foods = [
+        {"food_id": food["food_id"], "food_name": food["food_name"], "quantity": food["quantity"], "event_id": event_id}
+        for food in current["food"]
+    ]
+    # A restock of one food and a description edit, like a host topping up a tray
+    if foods:
+        ctx.rng.choice(foods)["quantity"] += ctx.rng.randint(1, 5)
+    description = event["description"] or ""
+    await ctx.call("POST /events/update/{event_id}", "POST", f"/events/update/{event_id}", host_id, json={
+        "eventName": event["event_name"],
+        "eventDescription": description[:-1] if description.endswith("!") else description + "!",
+        "start": event["start_time"],
+        "end": event["last_res_time"],
+        "foods": foods,
+        "reservations": [],
+        "location_lat": event["location_lat"],
+        "location_lng": event["location_lng"],
+        "location_address": event["location_address"],
+    })
+
+SCENARIOS = {"browse": browse, "filter": filter_events, "reserve": reserve, "host_edit": host_edit}
+
+
+# ==================== DRIVER ==================== #
+def parse_mix(value: str) -> dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"Unknown scenario {name!r}, expected one of {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+async def virtual_user(ctx: Context, mix: dict[str, float], deadline: float):
+    scenarios = [SCENARIOS[name] for name in mix]
+    weights = list(mix.values())
+    while time.monotonic() < deadline:
+        await ctx.rng.choices(scenarios, weights)[0](ctx)
+
+async def run(args) -> dict:
+    tables = generate(SCALES[args.scale], seed=args.seed)
+    fake = FakeSupabase(tables, latency=args.db_latency_ms / 1000)
+    if args.database_url and args.reset_database:
+        await seed_postgres(args.database_url, tables)
+    main = load_app(fake, args.database_url)
+
+    users = [user["user_id"] for user in tables["users"] if user["role"] == "regular_user"]
+    hosts = [user["user_id"] for user in tables["users"] if user["role"] == "event_creator"]
+    tokens = {user["user_id"]: main.create_access_token({"sub": str(user["user_id"])}) for user in tables["users"]}
+    event_ids = [event["event_id"] for event in tables["events"]]
+    rated_event_ids = sorted({rating["event_id"] for rating in tables["ratings"]})
+
+    recorder = Recorder()
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=60) as client:
+            contexts = [
+                Context(client, recorder, random.Random(args.seed * 10_000 + i), tokens, users, hosts, event_ids, rated_event_ids)
+                for i in range(args.concurrency)
+            ]
+            if args.warmup > 0:
+                deadline = time.monotonic() + args.warmup
+                await asyncio.gather(*(virtual_user(ctx, args.mix, deadline) for ctx in contexts))
+            calls_before = sum(fake.calls.values())
+            recorder.start()
+            deadline = time.monotonic() + args.duration
+            await asyncio.gather(*(virtual_user(ctx, args.mix, deadline) for ctx in contexts))
+            recorder.stop()
+            db_calls = sum(fake.calls.values()) - calls_before
+            stats = (await client.get("/stats")).json()
+
+    summary = summarize(recorder)
+    summary["config"] = {
+        "scale": args.scale,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "mix": args.mix,
+        "db_latency_ms": args.db_latency_ms,
+        "database": "postgres" if args.database_url else "fake_supabase",
+    }
+    if not args.database_url:
+        summary["total"]["db_calls_per_request"] = db_calls / max(summary["total"]["requests"], 1)
+    summary["stats"] = stats
+    return summary
+
+
+# ==================== REPORT ==================== #
+def print_report(summary: dict):
+    config = summary["config"]
+    print(
+        f"scale={config['scale']} concurrency={config['concurrency']} duration={config['duration']}s "
+        f"database={config['database']} db_latency={config['db_latency_ms']}ms"
+    )
+    header = f"{'route':<34} {'requests':>9} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'4xx':>6} {'errors':>6}"
+    print(header)
+    print("-" * len(header))
+    rows = list(summary["routes"].items()) + [("TOTAL", summary["total"])]
+    for label, route in rows:
+        print(
+            f"{label:<34} {route['requests']:>9} {route['rps']:>8.1f} {route['p50_ms']:>8.2f} {route['p95_ms']:>8.2f} "
+            f"{route['p99_ms']:>8.2f} {route['max_ms']:>8.2f} {route['client_errors']:>6} {route['errors']:>6}"
+        )
+    if "db_calls_per_request" in summary["total"]:
+        print(f"database calls per request: {summary['total']['db_calls_per_request']:.2f}")
+
+def compare(summary: dict, baseline: dict, max_regression: float) -> list[str]:
+    """
+    Routes whose p95 got worse than the baseline by more than max_regression (0.2 = 20%)
+    """
+    regressions = []
+    for label, route in summary["routes"].items():
+        previous = baseline.get("routes", {}).get(label)
+        if previous is None or previous["p95_ms"] <= 0:
+            continue
+        change = route["p95_ms"] / previous["p95_ms"] - 1
+        if change > max_regression:
+            regressions.append(f"{label}: p95 {previous['p95_ms']:.2f} ms -> {route['p95_ms']:.2f} ms (+{change:.0%})")
+    return regressions
+
+
+# ==================== MAIN ==================== #
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--concurrency", type=int, default=50, help="virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds measured")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds run before measuring")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="round trip added to every fake database call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--database-url", help="run on the asyncpg pool path against this database instead of the fake")
+    parser.add_argument("--reset-database", action="store_true", help="truncate --database-url and load the synthetic data")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results of an earlier run (--json) to compare p95 latencies with")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    summary = asyncio.run(run(args))
+    print_report(summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2, default=str)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(summary, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
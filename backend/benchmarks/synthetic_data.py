@@ -0,0 +1,207 @@
+"""
+Synthetic users, events, foods, reservations and ratings for the load test
+
+Events are spread around now (some over, some running, some upcoming) so every time filter has matches,
+locations are scattered around campus and foods carry normalized dietary tags with their bitmask
+"""
+
+# ==================== IMPORTS ==================== #
+
+import os
+import random
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dietary import DIETARY_TAGS, normalize_tags
+from analytics import bucket_start
+from fake_supabase import rating_star
+
+
+# ==================== SCALES ==================== #
+@dataclass(frozen=True)
+class Scale:
+    users: int
+    hosts: int
+    events: int
+    foods_per_event: int
+    reservations: int
+    ratings: int
+
+SCALES = {
+    "small": Scale(users=200, hosts=20, events=300, foods_per_event=4, reservations=1_000, ratings=300),
+    "medium": Scale(users=2_000, hosts=100, events=3_000, foods_per_event=5, reservations=15_000, ratings=4_000),
+    "large": Scale(users=20_000, hosts=500, events=30_000, foods_per_event=6, reservations=150_000, ratings=40_000),
+}
+
+# Campus center, events are placed within about 2 km of it
+CAMPUS_LAT = 42.3505
+CAMPUS_LNG = -71.1054
+
+FOOD_NAMES = ("Pizza", "Sandwiches", "Bagels", "Salad", "Burritos", "Sushi", "Cookies", "Fruit platter", "Wraps", "Pasta", "Dumplings", "Donuts")
+# Not a valid bcrypt hash, the load test signs its own tokens instead of logging in
+PASSWORD_PLACEHOLDER = "not-a-password-hash"
+
+
+# ==================== GENERATOR ==================== #
+def _dietary_tags(rng: random.Random) -> str:
+    count = rng.choices((0, 1, 2, 3), weights=(40, 35, 20, 5))[0]
+    return ",".join(rng.sample(DIETARY_TAGS, count))
+
+def generate(scale: Scale, seed: int = 0, now: Optional[datetime] = None) -> dict[str, list[dict]]:
+    """
+    Rows per table (users, events, foods, reservations, ratings and the summary / rollup tables), with ids assigned from 1
+    Hosts are the first scale.hosts users, the same seed always gives the same data
+    """
+    rng = random.Random(seed)
+    now = now or datetime.now(timezone.utc)
+
+    users = []
+    for user_id in range(1, scale.users + 1):
+        host = user_id <= scale.hosts
+        users.append({
+            "user_id": user_id,
+            "email": f"user{user_id}@example.edu",
+            "password": PASSWORD_PLACEHOLDER,
+            "role": "event_creator" if host else "regular_user",
+            "name": f"User {user_id}",
+            "optin": rng.random() < 0.3,
+        })
+
+    events = []
+    foods = []
+    for event_id in range(1, scale.events + 1):
+        # Half of the events within a few hours of now, the rest over the surrounding two weeks
+        if rng.random() < 0.5:
+            start = now + timedelta(minutes=rng.randint(-240, 240))
+        else:
+            start = now + timedelta(minutes=rng.randint(-7 * 24 * 60, 7 * 24 * 60))
+        end = start + timedelta(minutes=rng.choice((30, 60, 90, 120, 180)))
+        events.append({
+            "event_id": event_id,
+            "event_name": f"Leftover catering #{event_id}",
+            "description": "Food left over from a department event, first come first served",
+            "creator_id": rng.randint(1, scale.hosts),
+            "start_time": start.isoformat(),
+            "last_res_time": end.isoformat(),
+            "created_at": (start - timedelta(hours=rng.randint(1, 72))).isoformat(),
+            "location_lat": CAMPUS_LAT + rng.uniform(-0.018, 0.018),
+            "location_lng": CAMPUS_LNG + rng.uniform(-0.024, 0.024),
+            "location_address": f"{rng.randint(1, 999)} Commonwealth Ave, Boston, MA",
+        })
+        for _ in range(scale.foods_per_event):
+            dietary_tags, dietary_mask = normalize_tags(_dietary_tags(rng))
+            foods.append({
+                "food_id": len(foods) + 1,
+                "food_name": rng.choice(FOOD_NAMES),
+                "quantity": rng.randint(5, 60),
+                "event_id": event_id,
+                "dietary_tags": dietary_tags,
+                "dietary_mask": dietary_mask,
+            })
+
+    reservations = []
+    for res_id in range(1, scale.reservations + 1):
+        food = rng.choice(foods)
+        event = events[food["event_id"] - 1]
+        user_id = rng.randint(scale.hosts + 1, scale.users) if scale.users > scale.hosts else 1
+        reservations.append({
+            "res_id": res_id,
+            "user_id": user_id,
+            "user_name": f"User {user_id}",
+            "food_id": food["food_id"],
+            "food_name": food["food_name"],
+            "event_id": food["event_id"],
+            "quantity": rng.randint(1, 3),
+            "res_time": (datetime.fromisoformat(event["start_time"]) + timedelta(minutes=rng.randint(0, 30))).isoformat(),
+            "notes": "",
+        })
+
+    ratings = []
+    for rating_id in range(1, scale.ratings + 1):
+        reservation = rng.choice(reservations) if reservations else None
+        if reservation is None:
+            break
+        ratings.append({
+            "id": rating_id,
+            "event_id": reservation["event_id"],
+            "user_id": reservation["user_id"],
+            "rating": rng.choice((1, 2, 3, 3.5, 4, 4.5, 5)),
+            "description": "",
+            "created_at": reservation["res_time"],
+        })
+
+    event_summaries, host_summaries = summarize_ratings(ratings, events)
+    rollups = rollup_reservations(reservations, ratings, events)
+
+    return {
+        "users": users,
+        "events": events,
+        "foods": foods,
+        "reservations": reservations,
+        "ratings": ratings,
+        "event_rating_summaries": event_summaries,
+        "host_rating_summaries": host_summaries,
+        **rollups,
+    }
+
+def summarize_ratings(ratings: list[dict], events: list[dict]) -> tuple[list[dict], list[dict]]:
+    """
+    Event and host rating summary rows of ratings, what the rating_summaries migration backfills
+    """
+    creators = {event["event_id"]: event["creator_id"] for event in events}
+    by_event: dict[int, dict] = {}
+    by_host: dict[int, dict] = {}
+    for rating in ratings:
+        creator_id = creators.get(rating["event_id"])
+        summaries = [by_event.setdefault(rating["event_id"], _empty_summary(event_id=rating["event_id"], creator_id=creator_id))]
+        if creator_id is not None:
+            summaries.append(by_host.setdefault(creator_id, _empty_summary(creator_id=creator_id)))
+        for summary in summaries:
+            summary["rating_count"] += 1
+            summary["rating_sum"] += rating["rating"]
+            summary[f"stars_{rating_star(rating['rating'])}"] += 1
+    return list(by_event.values()), list(by_host.values())
+
+def rollup_reservations(reservations: list[dict], ratings: list[dict], events: list[dict]) -> dict[str, list[dict]]:
+    """
+    Host analytics rollup rows of reservations, what the host_analytics migration backfills
+    """
+    creators = {event["event_id"]: event["creator_id"] for event in events}
+    rated = {(rating["event_id"], rating["user_id"]) for rating in ratings}
+    stats = {
+        event_id: {"event_id": event_id, "creator_id": creator_id, **dict.fromkeys(
+            ("reservations", "quantity_claimed", "cancellations", "quantity_cancelled", "attendees", "confirmed"), 0
+        )}
+        for event_id, creator_id in creators.items()
+    }
+    attendees: dict[tuple, dict] = {}
+    buckets: dict[tuple, dict] = {}
+    claims: dict[tuple, dict] = {}
+    for reservation in reservations:
+        event_id, user_id = reservation["event_id"], reservation["user_id"]
+        creator_id = creators.get(event_id)
+        stats[event_id]["reservations"] += 1
+        stats[event_id]["quantity_claimed"] += reservation["quantity"]
+        attendee = attendees.get((event_id, user_id))
+        if attendee is None:
+            attendee = attendees[(event_id, user_id)] = {"event_id": event_id, "user_id": user_id, "reservations": 0, "rated": (event_id, user_id) in rated}
+            stats[event_id]["attendees"] += 1
+            stats[event_id]["confirmed"] += attendee["rated"]
+        attendee["reservations"] += 1
+        start = bucket_start(datetime.fromisoformat(reservation["res_time"])).isoformat()
+        for rows, key in ((buckets, {"bucket_start": start}), (claims, {"food_name": reservation["food_name"]})):
+            row = rows.setdefault((event_id, *key.values()), {"event_id": event_id, **key, "creator_id": creator_id, "reservations": 0, "quantity": 0})
+            row["reservations"] += 1
+            row["quantity"] += reservation["quantity"]
+    return {
+        "event_stats": list(stats.values()),
+        "event_attendees": list(attendees.values()),
+        "event_reservation_buckets": list(buckets.values()),
+        "event_food_claims": list(claims.values()),
+    }
+
+def _empty_summary(**key) -> dict:
+    return {**key, "rating_count": 0, "rating_sum": 0.0, **{f"stars_{star}": 0 for star in range(1, 6)}}
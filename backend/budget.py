@@ -0,0 +1,199 @@
+# ==================== IMPORTS ==================== #
+
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    Raised at the end of a request that went over its budget when the budget is enforced (tests, CI)
+    """
+
+
+# ==================== REQUEST SCOPE ==================== #
+class RequestQueries:
+    """
+    Database calls made while serving one request
+    A shape is (table, operation, statement without its values), the same shape many times
+    in one request is usually a query issued in a loop (N+1)
+    """
+
+    __slots__ = ("calls", "seconds", "shapes")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.shapes: Counter = Counter()
+
+    def record(self, table: str, operation: str, statement: str, seconds: float):
+        self.calls += 1
+        self.seconds += seconds
+        self.shapes[(table, operation, statement)] += 1
+
+    def merge(self, other: "RequestQueries"):
+        self.calls += other.calls
+        self.seconds += other.seconds
+        self.shapes.update(other.shapes)
+
+    def repeated(self, threshold: int) -> list[tuple[tuple[str, str, str], int]]:
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+# Set for the duration of a request by QueryBudgetMiddleware, None in background tasks
+_current: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+def current_queries() -> Optional[RequestQueries]:
+    return _current.get()
+
+def record_query(table: str, operation: str, statement: str, seconds: float):
+    """
+    Count a database call against the request being served, if any
+    """
+    queries = _current.get()
+    if queries is not None:
+        queries.record(table, operation, statement, seconds)
+
+@contextmanager
+def track_queries() -> Iterator[RequestQueries]:
+    """
+    Collect the database calls made inside the block, for a request or a test
+    """
+    queries = RequestQueries()
+    token = _current.set(queries)
+    try:
+        yield queries
+    finally:
+        _current.reset(token)
+
+
+# ==================== BUDGET ==================== #
+class QueryBudget:
+    """
+    Per-request limits on database round trips (max_calls) and time spent in them (max_seconds)
+    Requests over budget and shapes repeated repeat_threshold times or more are logged,
+    with enforce they also raise QueryBudgetExceeded so a test or CI run fails on the regression
+    """
+
+    def __init__(
+        self,
+        max_calls: int = 6,
+        max_seconds: float = 0.5,
+        repeat_threshold: int = 3,
+        debug_headers: bool = False,
+        enforce: bool = False,
+    ):
+        self.max_calls = max_calls
+        self.max_seconds = max_seconds
+        self.repeat_threshold = repeat_threshold
+        self.debug_headers = debug_headers
+        self.enforce = enforce
+
+        # Counters for the stats endpoint
+        self.requests = 0
+        self.over_budget = 0
+        self.repeated_queries = 0
+        self.max_calls_seen = 0
+
+        # Blocks under expect, the requests checked meanwhile count towards them too
+        self._watching: list[RequestQueries] = []
+
+    def problems(self, queries: RequestQueries) -> list[str]:
+        """
+        What is wrong with one request's database calls, empty if nothing
+        """
+        problems = []
+        if queries.calls > self.max_calls:
+            problems.append(f"{queries.calls} database calls (budget {self.max_calls})")
+        if queries.seconds > self.max_seconds:
+            problems.append(f"{queries.seconds * 1000:.1f} ms in the database (budget {self.max_seconds * 1000:.0f} ms)")
+        for (table, operation, statement), count in queries.repeated(self.repeat_threshold):
+            problems.append(f"likely N+1: {table}.{operation} ran {count} times ({statement})")
+        return problems
+
+    def check(self, label: str, queries: RequestQueries):
+        """
+        Log (and with enforce, raise) the problems of a finished request
+        """
+        for watching in self._watching:
+            watching.merge(queries)
+        self.requests += 1
+        self.max_calls_seen = max(self.max_calls_seen, queries.calls)
+        problems = self.problems(queries)
+        if not problems:
+            return
+        if queries.calls > self.max_calls or queries.seconds > self.max_seconds:
+            self.over_budget += 1
+        if queries.repeated(self.repeat_threshold):
+            self.repeated_queries += 1
+        message = f"{label}: " + "; ".join(problems)
+        print(f"[query budget] {message}")
+        if self.enforce:
+            raise QueryBudgetExceeded(message)
+
+    @contextmanager
+    def expect(self, label: str = "block", max_calls: Optional[int] = None) -> Iterator[RequestQueries]:
+        """
+        Enforce the budget (or max_calls) on the database calls made inside the block, for tests,
+        requests served meanwhile through the middleware (TestClient) are added in once they finish:
+            with query_budget.expect("reserve", max_calls=3):
+                client.post("/createreservation", ...)
+        """
+        budget = QueryBudget(
+            max_calls=self.max_calls if max_calls is None else max_calls,
+            max_seconds=self.max_seconds,
+            repeat_threshold=self.repeat_threshold,
+            enforce=True,
+        )
+        with track_queries() as queries:
+            self._watching.append(queries)
+            try:
+                yield queries
+            finally:
+                self._watching.remove(queries)
+        budget.check(label, queries)
+
+    def stats(self) -> dict:
+        return {
+            "max_calls": self.max_calls,
+            "max_seconds": self.max_seconds,
+            "repeat_threshold": self.repeat_threshold,
+            "enforce": self.enforce,
+            "requests": self.requests,
+            "over_budget": self.over_budget,
+            "repeated_queries": self.repeated_queries,
+            "max_calls_seen": self.max_calls_seen,
+        }
+
+
+# ==================== MIDDLEWARE ==================== #
+class QueryBudgetMiddleware:
+    """
+    ASGI middleware giving every request its own database call counter
+    With debug_headers the response carries X-DB-Calls / X-DB-Time-Ms (calls made before the response started)
+    With enforce the error is raised after the response went out, TestClient re-raises it in the test
+    """
+
+    def __init__(self, app, budget: QueryBudget):
+        self.app = app
+        self.budget = budget
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as queries:
+            async def send_with_headers(message):
+                if message["type"] == "http.response.start" and self.budget.debug_headers:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-db-calls", str(queries.calls).encode()),
+                        (b"x-db-time-ms", f"{queries.seconds * 1000:.2f}".encode()),
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_with_headers)
+        # The router has put the matched route in the scope by now
+        route = scope.get("route")
+        self.budget.check(f"{scope['method']} {getattr(route, 'path', scope['path'])}", queries)
@@ -0,0 +1,119 @@
+# ==================== IMPORTS ==================== #
+
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+# ==================== CACHE ==================== #
+class TTLCache:
+    """
+    In-process LRU cache where every entry also expires after ttl seconds
+    Each worker process has its own copy, so writes must invalidate explicitly and the TTL bounds staleness
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+        # Counters for the stats endpoint
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        if self._entries.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def clear(self):
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else None,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+# ==================== RESPONSE CACHE ==================== #
+class ResponseCache:
+    """
+    Rendered responses of hot read routes, keyed by route and parameters
+    Entries carry tags ("events", "event:<id>") that write routes invalidate
+    A build that started before an invalidation is not stored, so a slow read can't put stale data back
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: float = 10.0):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.generation = 0
+        self._tags: dict[str, set] = {}
+
+        # Counters for the stats endpoint
+        self.not_modified = 0
+        self.stale_builds = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        return self.entries.get(key)
+
+    def set(self, key: Hashable, value: Any, tags: tuple, generation: int):
+        if generation != self.generation:
+            self.stale_builds += 1
+            return
+        self.entries.set(key, value)
+        for tag in tags:
+            keys = self._tags.setdefault(tag, set())
+            keys.add(key)
+            # Drop keys the LRU already evicted so tag sets stay bounded
+            if len(keys) > 2 * self.entries.maxsize:
+                keys.intersection_update(self.entries._entries)
+
+    def invalidate(self, *tags: str):
+        self.generation += 1
+        for tag in tags:
+            for key in self._tags.pop(tag, ()):
+                self.entries.invalidate(key)
+
+    def stats(self) -> dict:
+        return {
+            **self.entries.stats(),
+            "generation": self.generation,
+            "not_modified": self.not_modified,
+            "stale_builds": self.stale_builds,
+        }
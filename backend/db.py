@@ -0,0 +1,866 @@
+# ==================== IMPORTS ==================== #
+
+import asyncio
+import json
+import math
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Optional
+
+import asyncpg
+from supabase import Client
+
+from budget import record_query
+from metrics import Metrics
+from models import RESERVATION_FIELDS, Projection
+
+
+# ==================== HELPER FUNCTION ==================== #
+def _value(value: Any) -> Any:
+    """
+    Convert a value coming out of asyncpg into the same shape supabase-py returns
+    Timestamps become ISO strings and numerics become floats
+    """
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+def _row(record: Optional[asyncpg.Record]) -> Optional[dict]:
+    """
+    Turn an asyncpg record into a plain dict (None stays None)
+    """
+    if record is None:
+        return None
+    return {key: _value(value) for key, value in record.items()}
+
+def _rows(records: list) -> list[dict]:
+    return [_row(record) for record in records]
+
+def _jsonable(values: dict) -> dict:
+    """
+    supabase-py sends values as json, so timestamps have to go over as ISO strings
+    """
+    return {key: value.isoformat() if isinstance(value, datetime) else value for key, value in values.items()}
+
+def _text_array(values: list[str]) -> str:
+    """
+    Postgres array literal of values for a PostgREST filter, every element quoted
+    """
+    quoted = ('"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"' for value in values)
+    return "{" + ",".join(quoted) + "}"
+
+def _keyset_sql(alias: str, column: str, id_column: str, descending: bool, after: Optional[tuple], limit: Optional[int], args: list) -> tuple[list[str], str]:
+    """
+    Keyset pagination in SQL: the condition that skips rows up to after = (sort value, id)
+    and the ORDER BY / LIMIT clause, values are appended to args
+    limit + 1 rows are fetched so the caller can tell whether there is a next page
+    """
+    conditions = []
+    if after is not None:
+        value, row_id = after
+        args.extend([datetime.fromisoformat(value.replace('Z', '+00:00')), row_id])
+        operator = "<" if descending else ">"
+        conditions.append(f"({alias}.{column}, {alias}.{id_column}) {operator} (${len(args) - 1}, ${len(args)})")
+    direction = "DESC" if descending else "ASC"
+    clause = f" ORDER BY {alias}.{column} {direction}, {alias}.{id_column} {direction}"
+    if limit is not None:
+        args.append(limit + 1)
+        clause += f" LIMIT ${len(args)}"
+    return conditions, clause
+
+def _keyset_query(query, column: str, id_column: str, descending: bool, after: Optional[tuple], limit: Optional[int]):
+    """
+    Same as _keyset_sql for a supabase query builder
+    """
+    if after is not None:
+        value, row_id = after
+        operator = "lt" if descending else "gt"
+        query = query.or_(f'{column}.{operator}."{value}",and({column}.eq."{value}",{id_column}.{operator}.{row_id})')
+    query = query.order(column, desc=descending).order(id_column, desc=descending)
+    if limit is not None:
+        query = query.limit(limit + 1)
+    return query
+
+def _in_stock(query, alias: str = "foods"):
+    """
+    Same as IN_STOCK_SQL for the foods embedded under alias in a supabase query
+    """
+    return query.gt(f"{alias}.quantity", 0)
+
+def _strip_match(rows: list[dict]) -> list[dict]:
+    """
+    Drop the dietary filter embed (see Database._events_query) from events rows
+    """
+    for row in rows:
+        row.pop(DIETARY_MATCH, None)
+    return rows
+
+def _where(conditions: list[str]) -> str:
+    return " WHERE " + " AND ".join(conditions) if conditions else ""
+
+def _time_ranges(start_from, start_to, end_from, end_to) -> list:
+    return [("start_time", ">=", start_from), ("start_time", "<=", start_to), ("last_res_time", ">=", end_from), ("last_res_time", "<=", end_to)]
+
+def _bounding_box(lat: float, radius: float) -> tuple[float, float]:
+    """
+    Latitude / longitude deltas (degrees) of a box that contains the circle of radius meters around lat
+    """
+    lat_delta = radius / 111_320
+    lng_delta = radius / (111_320 * max(math.cos(math.radians(lat)), 0.01))
+    return lat_delta, lng_delta
+
+def _haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """
+    Great circle distance in meters
+    """
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+def _query_shape(query) -> str:
+    """
+    A supabase query builder without its values: the select list, filtered columns with their operators, order and limit
+    Calls that only differ in their values have the same shape
+    """
+    params = getattr(query, "params", None)
+    if not params:
+        return ""
+    parts = []
+    for key, value in params.multi_items():
+        if key in ("select", "order"):
+            parts.append(f"{key}={value}")
+        elif key in ("limit", "offset", "or", "and"):
+            parts.append(key)
+        else:
+            parts.append(f"{key}={str(value).split('.', 1)[0]}")
+    return "&".join(parts)
+
+async def _init_connection(conn: asyncpg.Connection):
+    """
+    Decode json columns (used for embedded foods / events) into python objects
+    """
+    await conn.set_type_codec("json", encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+    await conn.set_type_codec("jsonb", encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+
+# ==================== SQL ==================== #
+# Same radius earthdistance uses, so both paths agree on distances
+EARTH_RADIUS_M = 6378168
+
+# An event's position on the earth cube, matches the events_location_earth_idx expression
+EVENT_EARTH_SQL = "ll_to_earth(e.location_lat, e.location_lng)"
+
+# Foods at quantity 0 are sold out, they stay in the table for their reservations but every read
+# except the host's edit state (EVENT_STATE_SQL) leaves them out
+IN_STOCK_SQL = "f.quantity > 0"
+
+# Events with their in stock foods embedded as a json array, same shape as select("*, foods(*)") with _in_stock
+EVENTS_WITH_FOODS_SQL = f"""
+    SELECT e.*,
+           COALESCE(
+               (SELECT json_agg(f ORDER BY f.food_id) FROM foods f WHERE f.event_id = e.event_id AND {IN_STOCK_SQL}),
+               '[]'::json
+           ) AS foods
+    FROM events e
+"""
+
+# Alias of the inner joined foods embed that carries the dietary filter of a supabase events query,
+# the foods sent back stay a separate, unfiltered embed
+DIETARY_MATCH = "dietary_match"
+
+# Columns events can be ordered by in filtered listings
+EVENT_ORDER_COLUMNS = ("start_time", "last_res_time")
+
+# Events with their foods and their distance from ($1, $2)
+NEARBY_EVENTS_SQL = f"""
+    SELECT e.*,
+           earth_distance(ll_to_earth($1, $2), {EVENT_EARTH_SQL}) AS distance_m,
+           COALESCE(
+               (SELECT json_agg(f ORDER BY f.food_id) FROM foods f WHERE f.event_id = e.event_id AND {IN_STOCK_SQL}),
+               '[]'::json
+           ) AS foods
+    FROM events e
+"""
+
+# One event with everything a host edit is diffed against
+EVENT_STATE_SQL = """
+    SELECT e.*,
+           COALESCE((SELECT json_agg(f ORDER BY f.food_id) FROM foods f WHERE f.event_id = e.event_id), '[]'::json) AS foods,
+           COALESCE((SELECT json_agg(r ORDER BY r.res_id) FROM reservations r WHERE r.event_id = e.event_id), '[]'::json) AS reservations
+    FROM events e
+    WHERE e.event_id = $1
+"""
+
+# Host view only needs a few food columns, same shape as select("*, foods(food_id, food_name, quantity, dietary_tags)")
+HOST_EVENTS_SQL = f"""
+    SELECT e.*,
+           COALESCE(
+               (SELECT json_agg(json_build_object('food_id', f.food_id, 'food_name', f.food_name, 'quantity', f.quantity, 'dietary_tags', f.dietary_tags) ORDER BY f.food_id)
+                FROM foods f WHERE f.event_id = e.event_id AND {IN_STOCK_SQL}),
+               '[]'::json
+           ) AS foods
+    FROM events e
+    WHERE e.creator_id = $1
+"""
+
+# Reservations joined with their event, same shape as the nested select in /user/reservations
+USER_RESERVATIONS_SQL = """
+    SELECT r.res_id, r.res_time, r.quantity, r.notes, r.food_name,
+           CASE WHEN e.event_id IS NULL THEN NULL ELSE json_build_object(
+               'event_id', e.event_id,
+               'event_name', e.event_name,
+               'description', e.description,
+               'start_time', e.start_time,
+               'last_res_time', e.last_res_time
+           ) END AS events
+    FROM reservations r
+    LEFT JOIN events e ON e.event_id = r.event_id
+    WHERE r.user_id = $1
+"""
+
+# Event columns embedded in a user's reservations
+RESERVATION_EVENT_COLUMNS = ("event_id", "event_name", "description", "start_time", "last_res_time")
+
+# A host's analytics rollups in one round trip, same shapes as the three supabase selects in get_host_analytics
+# $2 narrows everything down to one event (NULL for all of the host's events)
+HOST_ANALYTICS_SQL = """
+    SELECT
+        COALESCE((
+            SELECT json_agg(to_jsonb(s) || jsonb_build_object('events', json_build_object(
+                'event_name', e.event_name, 'start_time', e.start_time, 'last_res_time', e.last_res_time
+            )) ORDER BY s.event_id)
+            FROM event_stats s JOIN events e ON e.event_id = s.event_id
+            WHERE s.creator_id = $1 AND ($2::INT IS NULL OR s.event_id = $2)
+        ), '[]'::json) AS events,
+        COALESCE((
+            SELECT json_agg(json_build_object('event_id', b.event_id, 'bucket_start', b.bucket_start, 'reservations', b.reservations, 'quantity', b.quantity) ORDER BY b.bucket_start)
+            FROM event_reservation_buckets b
+            WHERE b.creator_id = $1 AND ($2::INT IS NULL OR b.event_id = $2)
+        ), '[]'::json) AS buckets,
+        COALESCE((
+            SELECT json_agg(json_build_object('event_id', c.event_id, 'food_name', c.food_name, 'reservations', c.reservations, 'quantity', c.quantity))
+            FROM event_food_claims c
+            WHERE c.creator_id = $1 AND ($2::INT IS NULL OR c.event_id = $2)
+        ), '[]'::json) AS foods
+"""
+
+
+# ==================== PROJECTIONS ==================== #
+# Column names below only ever come from the allowlists in models.py, never straight from a request
+
+def _events_sql(projection: Optional[Projection], required: tuple[str, ...], extra: Optional[str] = None) -> str:
+    """
+    Same as EVENTS_WITH_FOODS_SQL, selecting only the projected columns (and foods only if asked for)
+    extra is one more select expression (distance_m)
+    """
+    select = [f"e.{column}" for column in projection.columns("event_id", *required)]
+    if extra:
+        select.append(extra)
+    if projection.embeds("foods"):
+        food_fields = ", ".join(f"'{column}', f.{column}" for column in projection.foods)
+        select.append(
+            f"COALESCE((SELECT json_agg(json_build_object({food_fields}) ORDER BY f.food_id) FROM foods f WHERE f.event_id = e.event_id AND {IN_STOCK_SQL}), '[]'::json) AS foods"
+        )
+    return "SELECT " + ", ".join(select) + " FROM events e"
+
+def _events_select(projection: Optional[Projection], required: tuple[str, ...]) -> str:
+    """
+    supabase select() string for events with their foods, "*, foods(*)" without a projection
+    """
+    if projection is None:
+        return "*, foods(*)"
+    select = ", ".join(projection.columns("event_id", *required))
+    if projection.embeds("foods"):
+        select += f", foods({', '.join(projection.foods)})"
+    return select
+
+def _reservation_columns(projection: Optional[Projection]) -> tuple[tuple[str, ...], bool]:
+    """
+    Reservation columns to select for /user/reservations and whether the event is embedded
+    res_id and res_time are always there, they make up the cursor
+    """
+    if projection is None:
+        return tuple(field for field in RESERVATION_FIELDS if field != "events"), True
+    return projection.columns("res_id", "res_time"), projection.embeds("events")
+
+
+# ==================== DATABASE ==================== #
+class Database:
+    """
+    Data access layer for the backend
+    Serves every query through an asyncpg connection pool when DATABASE_URL is set,
+    otherwise falls back to the supabase client (run in a worker thread so it never blocks the event loop)
+    """
+
+    def __init__(
+        self,
+        client: Client,
+        dsn: Optional[str] = None,
+        min_size: int = 1,
+        max_size: int = 10,
+        statement_cache_size: int = 100,
+        command_timeout: float = 10.0,
+        metrics: Optional[Metrics] = None,
+    ):
+        self.client = client
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        # Must be 0 when connecting through a transaction-mode pooler (pgbouncer / supavisor on port 6543)
+        self.statement_cache_size = statement_cache_size
+        self.command_timeout = command_timeout
+        self.pool: Optional[asyncpg.Pool] = None
+        # Every round trip below is timed per table and operation
+        self.metrics = metrics or Metrics()
+
+    @property
+    def using_pool(self) -> bool:
+        return self.pool is not None
+
+    async def connect(self):
+        """
+        Open the connection pool, keeps the supabase fallback if there is no DSN or the database is unreachable
+        """
+        if not self.dsn:
+            return
+        try:
+            self.pool = await asyncpg.create_pool(
+                dsn=self.dsn,
+                min_size=self.min_size,
+                max_size=self.max_size,
+                statement_cache_size=self.statement_cache_size,
+                command_timeout=self.command_timeout,
+                init=_init_connection,
+            )
+        except (OSError, asyncpg.PostgresError) as e:
+            print(f"Could not open database pool, falling back to supabase: {e}")
+            self.pool = None
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    # ----- low level helpers ----- #
+    @contextmanager
+    def _timed(self, table: str, operation: str, statement: str):
+        """
+        Time one round trip for the metrics (errors counted apart) and count it against the current request's budget
+        table / operation label it (operation is the function name for rpc calls), statement is its shape without values
+        """
+        started = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            seconds = time.perf_counter() - started
+            self.metrics.observe_db(table, operation, seconds, error)
+            record_query(table, operation, statement, seconds)
+
+    async def _execute(self, query, table: str, operation: str = "select") -> list:
+        """
+        Run a supabase query builder off the event loop and return its rows
+        """
+        with self._timed(table, operation, _query_shape(query)):
+            response = await asyncio.to_thread(query.execute)
+        return response.data or []
+
+    async def _fetch(self, sql: str, *args, table: str, operation: str = "select") -> list[dict]:
+        with self._timed(table, operation, sql):
+            async with self.pool.acquire() as conn:
+                return _rows(await conn.fetch(sql, *args))
+
+    async def _fetchrow(self, sql: str, *args, table: str, operation: str = "select") -> Optional[dict]:
+        with self._timed(table, operation, sql):
+            async with self.pool.acquire() as conn:
+                return _row(await conn.fetchrow(sql, *args))
+
+    async def _fetchval(self, sql: str, *args, table: str, operation: str = "select") -> Any:
+        with self._timed(table, operation, sql):
+            async with self.pool.acquire() as conn:
+                return await conn.fetchval(sql, *args)
+
+    async def _insert(self, table: str, values: dict) -> Optional[dict]:
+        if self.pool is None:
+            rows = await self._execute(self.client.table(table).insert(_jsonable(values)), table, "insert")
+            return rows[0] if rows else None
+        columns = ", ".join(values)
+        params = ", ".join(f"${i}" for i in range(1, len(values) + 1))
+        sql = f"INSERT INTO {table} ({columns}) VALUES ({params}) RETURNING *"
+        return await self._fetchrow(sql, *values.values(), table=table, operation="insert")
+
+    async def _update(self, table: str, key: str, key_value: Any, values: dict) -> Optional[dict]:
+        if self.pool is None:
+            rows = await self._execute(self.client.table(table).update(_jsonable(values)).eq(key, key_value), table, "update")
+            return rows[0] if rows else None
+        assignments = ", ".join(f"{column} = ${i}" for i, column in enumerate(values, start=2))
+        sql = f"UPDATE {table} SET {assignments} WHERE {key} = $1 RETURNING *"
+        return await self._fetchrow(sql, key_value, *values.values(), table=table, operation="update")
+
+    async def _delete(self, table: str, key: str, key_value: Any) -> Optional[dict]:
+        if self.pool is None:
+            rows = await self._execute(self.client.table(table).delete().eq(key, key_value), table, "delete")
+            return rows[0] if rows else None
+        return await self._fetchrow(f"DELETE FROM {table} WHERE {key} = $1 RETURNING *", key_value, table=table, operation="delete")
+
+    async def _rpc(self, function: str, params: dict) -> Any:
+        """
+        Call a database function with named arguments and return its result
+        """
+        if self.pool is None:
+            with self._timed("rpc", function, function):
+                response = await asyncio.to_thread(self.client.rpc(function, _jsonable(params)).execute)
+            return response.data
+        arguments = ", ".join(f"{name} => ${i}" for i, name in enumerate(params, start=1))
+        return await self._fetchval(f"SELECT {function}({arguments})", *params.values(), table="rpc", operation=function)
+
+    async def _select_eq(self, table: str, key: str, key_value: Any, columns: str = "*") -> list[dict]:
+        if self.pool is None:
+            return await self._execute(self.client.table(table).select(columns).eq(key, key_value), table)
+        return await self._fetch(f"SELECT {columns} FROM {table} WHERE {key} = $1", key_value, table=table)
+
+    # ----- users ----- #
+    async def get_user(self, user_id: int) -> Optional[dict]:
+        rows = await self._select_eq("users", "user_id", int(user_id))
+        return rows[0] if rows else None
+
+    async def get_user_by_email(self, email: str) -> Optional[dict]:
+        rows = await self._select_eq("users", "email", email)
+        return rows[0] if rows else None
+
+    async def create_user(self, values: dict) -> Optional[dict]:
+        return await self._insert("users", values)
+
+    async def update_user(self, user_id: int, values: dict) -> Optional[dict]:
+        return await self._update("users", "user_id", int(user_id), values)
+
+    async def get_notification_email(self, user_id: int) -> Optional[str]:
+        """
+        Email of one user, only if they opted in to notifications
+        """
+        if self.pool is None:
+            rows = await self._execute(
+                self.client.table("users").select("email").eq("user_id", user_id).eq("optin", True), "users"
+            )
+            return rows[0]["email"] if rows else None
+        return await self._fetchval("SELECT email FROM users WHERE user_id = $1 AND optin", user_id, table="users")
+
+    async def list_subscriber_emails(self) -> list[str]:
+        """
+        Emails of regular users who opted in to new event notifications
+        Served from the users_subscribers_idx partial index, which follows optin updates on its own
+        """
+        if self.pool is None:
+            rows = await self._execute(
+                self.client.table("users").select("email").eq("role", "regular_user").eq("optin", True), "users"
+            )
+            return [row["email"] for row in rows]
+        rows = await self._fetch("SELECT email FROM users WHERE role = 'regular_user' AND optin", table="users")
+        return [row["email"] for row in rows]
+
+    # ----- events ----- #
+    async def create_event_with_foods(self, event: dict, foods: list[dict]) -> Optional[dict]:
+        """
+        Insert an event and all of its foods in one transaction (see the create_event_with_foods migration)
+        Returns {"event_id", "food_ids"}
+        """
+        return await self._rpc("create_event_with_foods", {
+            "p_event": _jsonable(event),
+            "p_foods": [_jsonable(food) for food in foods],
+        })
+
+    async def get_event(self, event_id: int) -> Optional[dict]:
+        rows = await self._select_eq("events", "event_id", event_id)
+        return rows[0] if rows else None
+
+    async def get_event_with_foods(self, event_id: int) -> Optional[dict]:
+        if self.pool is None:
+            rows = await self._execute(_in_stock(self.client.table("events").select("*, foods(*)")).eq("event_id", event_id), "events")
+            return rows[0] if rows else None
+        return await self._fetchrow(EVENTS_WITH_FOODS_SQL + " WHERE e.event_id = $1", event_id, table="events")
+
+    async def get_event_state(self, event_id: int) -> Optional[dict]:
+        """
+        One event with its foods (sold out ones too, the host can restock them) and reservations embedded, in a single query
+        """
+        if self.pool is None:
+            rows = await self._execute(
+                self.client.table("events").select("*, foods(*), reservations(*)").eq("event_id", event_id), "events"
+            )
+            return rows[0] if rows else None
+        return await self._fetchrow(EVENT_STATE_SQL, event_id, table="events")
+
+    async def apply_event_update(
+        self,
+        event_id: int,
+        event: dict,
+        food_updates: list[dict],
+        cancellations: list[dict],
+    ) -> dict:
+        """
+        Apply a precomputed diff of an event in one transaction (see the apply_event_update migration)
+        Returns a report of what changed
+        """
+        return await self._rpc("apply_event_update", {
+            "p_event_id": event_id,
+            "p_event": _jsonable(event),
+            "p_food_updates": food_updates,
+            "p_cancellations": cancellations,
+        })
+
+    async def delete_event(self, event_id: int) -> Optional[dict]:
+        return await self._delete("events", "event_id", event_id)
+
+    async def list_events_with_foods(
+        self,
+        creator_id: Optional[int] = None,
+        limit: Optional[int] = None,
+        after: Optional[tuple] = None,
+        projection: Optional[Projection] = None,
+    ) -> list[dict]:
+        """
+        Events with their foods embedded, optionally only the ones created by creator_id
+        Newest start_time first, one keyset page of limit (+ 1) rows after the (start_time, event_id) in after
+        With a projection only its columns are read
+        """
+        if self.pool is None:
+            query = self.client.table("events").select(_events_select(projection, ("start_time",)))
+            if projection is None or projection.embeds("foods"):
+                query = _in_stock(query)
+            if creator_id is not None:
+                query = query.eq("creator_id", creator_id)
+            return await self._execute(_keyset_query(query, "start_time", "event_id", True, after, limit), "events")
+        args = []
+        conditions = []
+        if creator_id is not None:
+            args.append(creator_id)
+            conditions.append(f"e.creator_id = ${len(args)}")
+        keyset, clause = _keyset_sql("e", "start_time", "event_id", True, after, limit, args)
+        sql = EVENTS_WITH_FOODS_SQL if projection is None else _events_sql(projection, ("start_time",))
+        return await self._fetch(sql + _where(conditions + keyset) + clause, *args, table="events")
+
+    async def list_active_events(self, now: datetime) -> list[dict]:
+        """
+        Events that have started and still take reservations at time now
+        """
+        if self.pool is None:
+            iso_now = now.isoformat()
+            return await self._execute(
+                self.client.table("events").select("*").lte("start_time", iso_now).gte("last_res_time", iso_now), "events"
+            )
+        return await self._fetch("SELECT * FROM events WHERE start_time <= $1 AND last_res_time >= $1", now, table="events")
+
+    def _events_query(
+        self,
+        projection: Optional[Projection],
+        required: tuple[str, ...],
+        ranges: list,
+        dietary_tags: Optional[list[str]],
+    ):
+        """
+        supabase events query (projected like _events_select) with the time ranges and dietary filter
+        The dietary filter is an inner joined foods embed, so PostgREST keeps only the events with a matching
+        food in stock in the same request (_strip_match drops the embed from the rows)
+        """
+        select = _events_select(projection, required)
+        if dietary_tags:
+            select += f", {DIETARY_MATCH}:foods!inner(food_id)"
+        query = self.client.table("events").select(select)
+        if projection is None or projection.embeds("foods"):
+            query = _in_stock(query)
+        if dietary_tags:
+            query = _in_stock(query, DIETARY_MATCH)
+            # Generated array of the tags column (see the food_dietary_tag_list migration), @> in PostgREST
+            query = query.contains(f"{DIETARY_MATCH}.dietary_tag_list", _text_array(dietary_tags))
+        for column, operator, bound in ranges:
+            if bound is not None:
+                query = query.gte(column, bound.isoformat()) if operator == ">=" else query.lte(column, bound.isoformat())
+        return query
+
+    def _event_conditions(self, ranges: list, dietary_tags: Optional[list[str]], args: list) -> list[str]:
+        """
+        SQL conditions on events e for the time ranges and dietary filter, their values are appended to args
+        """
+        conditions = []
+        for column, operator, bound in ranges:
+            if bound is not None:
+                args.append(bound)
+                conditions.append(f"e.{column} {operator} ${len(args)}")
+        if dietary_tags:
+            args.append(dietary_tags)
+            # Generated array of the tags column, served by its GIN index (see the food_dietary_tag_list migration)
+            conditions.append(f"EXISTS (SELECT 1 FROM foods f WHERE f.event_id = e.event_id AND {IN_STOCK_SQL} AND f.dietary_tag_list @> ${len(args)}::text[])")
+        return conditions
+
+    async def list_filtered_events(
+        self,
+        start_from: Optional[datetime] = None,
+        start_to: Optional[datetime] = None,
+        end_from: Optional[datetime] = None,
+        end_to: Optional[datetime] = None,
+        dietary_tags: Optional[list[str]] = None,
+        order_by: str = "start_time",
+        descending: bool = True,
+        limit: Optional[int] = None,
+        after: Optional[tuple] = None,
+        projection: Optional[Projection] = None,
+    ) -> list[dict]:
+        """
+        Events (with all of their foods) whose start_time / last_res_time fall in the given ranges
+        and that have at least one food carrying every tag in dietary_tags, sorted by order_by
+        Paginated like list_events_with_foods, after is an (order_by value, event_id) pair
+        With a projection only its columns (and both timestamps) are read
+        """
+        if order_by not in EVENT_ORDER_COLUMNS:
+            raise ValueError(f"Cannot order events by {order_by}")
+        ranges = _time_ranges(start_from, start_to, end_from, end_to)
+        required = ("start_time", "last_res_time")
+
+        if self.pool is None:
+            query = self._events_query(projection, required, ranges, dietary_tags)
+            return _strip_match(await self._execute(_keyset_query(query, order_by, "event_id", descending, after, limit), "events"))
+
+        args = []
+        conditions = self._event_conditions(ranges, dietary_tags, args)
+        keyset, clause = _keyset_sql("e", order_by, "event_id", descending, after, limit, args)
+        sql = EVENTS_WITH_FOODS_SQL if projection is None else _events_sql(projection, required)
+        return await self._fetch(sql + _where(conditions + keyset) + clause, *args, table="events")
+
+    async def list_nearby_events(
+        self,
+        lat: float,
+        lng: float,
+        radius: float,
+        limit: int,
+        start_from: Optional[datetime] = None,
+        start_to: Optional[datetime] = None,
+        end_from: Optional[datetime] = None,
+        end_to: Optional[datetime] = None,
+        dietary_tags: Optional[list[str]] = None,
+        projection: Optional[Projection] = None,
+    ) -> list[dict]:
+        """
+        Up to limit events within radius meters of (lat, lng), nearest first, with a distance_m column
+        Takes the same time ranges, dietary filter and projection as list_filtered_events
+        """
+        ranges = _time_ranges(start_from, start_to, end_from, end_to)
+        required = ("start_time", "last_res_time", "location_lat", "location_lng")
+
+        if self.pool is None:
+            # Bounding box on the lat / lng columns, then exact distances here
+            lat_delta, lng_delta = _bounding_box(lat, radius)
+            query = (
+                self._events_query(projection, required, ranges, dietary_tags)
+                .gte("location_lat", lat - lat_delta).lte("location_lat", lat + lat_delta)
+                .gte("location_lng", lng - lng_delta).lte("location_lng", lng + lng_delta)
+            )
+            nearby = []
+            for event in _strip_match(await self._execute(query, "events")):
+                event["distance_m"] = _haversine_m(lat, lng, event["location_lat"], event["location_lng"])
+                if event["distance_m"] <= radius:
+                    nearby.append(event)
+            nearby.sort(key=lambda event: (event["distance_m"], event["event_id"]))
+            return nearby[:limit]
+
+        args = [lat, lng, radius]
+        conditions = [
+            "e.location_lat IS NOT NULL AND e.location_lng IS NOT NULL",
+            f"earth_box(ll_to_earth($1, $2), $3) @> {EVENT_EARTH_SQL}",
+            f"earth_distance(ll_to_earth($1, $2), {EVENT_EARTH_SQL}) <= $3",
+        ]
+        conditions += self._event_conditions(ranges, dietary_tags, args)
+        args.append(limit)
+        select = NEARBY_EVENTS_SQL
+        if projection is not None:
+            select = _events_sql(projection, required, extra=f"earth_distance(ll_to_earth($1, $2), {EVENT_EARTH_SQL}) AS distance_m")
+        sql = select + " WHERE " + " AND ".join(conditions) + f" ORDER BY distance_m, e.event_id LIMIT ${len(args)}"
+        return await self._fetch(sql, *args, table="events")
+
+    async def get_latest_host_event(self, creator_id: int) -> Optional[dict]:
+        if self.pool is None:
+            rows = await self._execute(
+                self.client.table("events")
+                .select("*")
+                .eq("creator_id", creator_id)
+                .order("created_at", desc=True)
+                .limit(1),
+                "events"
+            )
+            return rows[0] if rows else None
+        return await self._fetchrow(
+            "SELECT * FROM events WHERE creator_id = $1 ORDER BY created_at DESC LIMIT 1", creator_id, table="events"
+        )
+
+    async def list_host_events(self, creator_id: int, limit: Optional[int] = None, after: Optional[tuple] = None) -> list[dict]:
+        """
+        A host's events, newest start_time first, paginated like list_events_with_foods
+        """
+        if self.pool is None:
+            query = (
+                self.client.table("events")
+                .select("*, foods(food_id, food_name, quantity, dietary_tags)")
+                .eq("creator_id", creator_id)
+            )
+            query = _in_stock(query)
+            return await self._execute(_keyset_query(query, "start_time", "event_id", True, after, limit), "events")
+        args = [creator_id]
+        keyset, clause = _keyset_sql("e", "start_time", "event_id", True, after, limit, args)
+        return await self._fetch(HOST_EVENTS_SQL + "".join(f" AND {condition}" for condition in keyset) + clause, *args, table="events")
+
+    # ----- foods ----- #
+    async def list_foods(self, event_id: int, projection: Optional[Projection] = None) -> list[dict]:
+        """
+        An event's foods that are still in stock
+        """
+        columns = "*" if projection is None else ", ".join(projection.columns())
+        if self.pool is None:
+            return await self._execute(
+                self.client.table("foods").select(columns).eq("event_id", event_id).gt("quantity", 0), "foods"
+            )
+        return await self._fetch(f"SELECT {columns} FROM foods f WHERE f.event_id = $1 AND {IN_STOCK_SQL}", event_id, table="foods")
+
+    # ----- reservations ----- #
+    async def reserve_food(
+        self,
+        user_id: int,
+        user_name: str,
+        food_id: int,
+        food_name: str,
+        event_id: int,
+        quantity: int,
+        res_time: datetime,
+        notes: str,
+    ) -> dict:
+        """
+        Atomically take quantity of a food and record the reservation (see the reserve_food migration)
+        Returns {"status": "ok" | "sold_out" | "invalid_quantity", "res_id", "remaining", "creator_id"}
+        """
+        return await self._rpc("reserve_food", {
+            "p_user_id": user_id,
+            "p_user_name": user_name,
+            "p_food_id": food_id,
+            "p_food_name": food_name,
+            "p_event_id": event_id,
+            "p_quantity": quantity,
+            "p_res_time": res_time,
+            "p_notes": notes,
+        })
+
+    async def reserve_foods(
+        self,
+        user_id: int,
+        user_name: str,
+        event_id: int,
+        items: list[dict],
+        res_time: datetime,
+        notes: str,
+    ) -> dict:
+        """
+        Reserve several foods of one event all or nothing, items are {"food_id", "quantity", "notes"} (see the reserve_foods migration)
+        Returns {"status": "ok", "reservations": [{"res_id", "food_id", "food_name", "quantity", "remaining"}], "creator_id"},
+        {"status": "sold_out", "short": [{"food_id", "requested", "available"}]} or {"status": "invalid_quantity"}
+        """
+        return await self._rpc("reserve_foods", {
+            "p_user_id": user_id,
+            "p_user_name": user_name,
+            "p_event_id": event_id,
+            "p_items": items,
+            "p_res_time": res_time,
+            "p_notes": notes,
+        })
+
+    async def list_user_reservations(
+        self,
+        user_id: int,
+        limit: Optional[int] = None,
+        after: Optional[tuple] = None,
+        projection: Optional[Projection] = None,
+    ) -> list[dict]:
+        """
+        A user's reservations with their event, newest res_time first
+        Paginated with after as a (res_time, res_id) pair
+        With a projection only its columns are read, and the event is only joined if it is asked for
+        """
+        columns, with_event = _reservation_columns(projection)
+        if self.pool is None:
+            select = ", ".join(columns)
+            if with_event:
+                select += f", events({', '.join(RESERVATION_EVENT_COLUMNS)})"
+            query = self.client.table("reservations").select(select).eq("user_id", user_id)
+            return await self._execute(_keyset_query(query, "res_time", "res_id", True, after, limit), "reservations")
+        args = [user_id]
+        keyset, clause = _keyset_sql("r", "res_time", "res_id", True, after, limit, args)
+        if projection is None:
+            sql = USER_RESERVATIONS_SQL
+        else:
+            select = [f"r.{column}" for column in columns]
+            join = ""
+            if with_event:
+                event_fields = ", ".join(f"'{column}', e.{column}" for column in RESERVATION_EVENT_COLUMNS)
+                select.append(f"CASE WHEN e.event_id IS NULL THEN NULL ELSE json_build_object({event_fields}) END AS events")
+                join = " LEFT JOIN events e ON e.event_id = r.event_id"
+            sql = "SELECT " + ", ".join(select) + " FROM reservations r" + join + " WHERE r.user_id = $1"
+        return await self._fetch(sql + "".join(f" AND {condition}" for condition in keyset) + clause, *args, table="reservations")
+
+    # ----- ratings ----- #
+    async def submit_rating(self, event_id: int, user_id: int, rating: float, description: str) -> dict:
+        """
+        Check the user reserved food at the event, insert the rating and add it to the event and host summaries,
+        all in one transaction (see the submit_rating migration)
+        Returns {"status": "ok" | "not_attended", "rating_id", "creator_id"}
+        """
+        return await self._rpc("submit_rating", {
+            "p_event_id": event_id,
+            "p_user_id": user_id,
+            "p_rating": rating,
+            "p_description": description,
+        })
+
+    async def get_event_rating_summary(self, event_id: int) -> Optional[dict]:
+        rows = await self._select_eq("event_rating_summaries", "event_id", event_id)
+        return rows[0] if rows else None
+
+    async def get_host_rating_summary(self, creator_id: int) -> Optional[dict]:
+        rows = await self._select_eq("host_rating_summaries", "creator_id", creator_id)
+        return rows[0] if rows else None
+
+    async def list_event_ratings(self, event_id: int, limit: Optional[int] = None, after: Optional[tuple] = None) -> list[dict]:
+        """
+        An event's ratings, newest first, paginated with after as a (created_at, id) pair
+        """
+        if self.pool is None:
+            query = self.client.table("ratings").select("*").eq("event_id", event_id)
+            return await self._execute(_keyset_query(query, "created_at", "id", True, after, limit), "ratings")
+        args = [event_id]
+        keyset, clause = _keyset_sql("r", "created_at", "id", True, after, limit, args)
+        sql = "SELECT r.* FROM ratings r WHERE r.event_id = $1"
+        return await self._fetch(sql + "".join(f" AND {condition}" for condition in keyset) + clause, *args, table="ratings")
+
+    # ----- analytics ----- #
+    async def get_host_analytics(self, creator_id: int, event_id: Optional[int] = None) -> dict:
+        """
+        Rollups reserve_food / apply_event_update / submit_rating keep for a host's events (see the host_analytics migration)
+        Returns {"events": event_stats rows with their event embedded, "buckets": event_reservation_buckets rows,
+        "foods": event_food_claims rows}, narrowed to event_id when given
+        """
+        if self.pool is None:
+            queries = {
+                "events": ("event_stats", "*, events(event_name, start_time, last_res_time)"),
+                "buckets": ("event_reservation_buckets", "event_id, bucket_start, reservations, quantity"),
+                "foods": ("event_food_claims", "event_id, food_name, reservations, quantity"),
+            }
+            rollups = {}
+            for name, (table, columns) in queries.items():
+                query = self.client.table(table).select(columns).eq("creator_id", creator_id)
+                if event_id is not None:
+                    query = query.eq("event_id", event_id)
+                rollups[name] = await self._execute(query, table)
+            return rollups
+        return await self._fetchrow(HOST_ANALYTICS_SQL, creator_id, event_id, table="event_stats")
@@ -0,0 +1,39 @@
+# ==================== DIETARY TAGS ==================== #
+# Known dietary tags, each one owns a bit of foods.dietary_mask
+# Only ever append to this list, the position of a tag is stored in the database
+DIETARY_TAGS = (
+    "vegetarian",
+    "vegan",
+    "gluten-free",
+    "dairy-free",
+    "nut-free",
+    "kosher",
+    "halal",
+)
+
+TAG_BITS = {tag: 1 << position for position, tag in enumerate(DIETARY_TAGS)}
+
+
+def split_tags(tags: str) -> list[str]:
+    """
+    Split a comma separated tag string into lowercase, trimmed, de-duplicated tags
+    """
+    seen = []
+    for tag in (tags or "").lower().split(","):
+        tag = tag.strip()
+        if tag and tag not in seen:
+            seen.append(tag)
+    return seen
+
+def normalize_tags(tags: str) -> tuple[str, int]:
+    """
+    Normalize a food's dietary tags on write
+    Returns the canonical tag string (known tags first, in vocabulary order) and its bitmask
+    """
+    parsed = split_tags(tags)
+    known = [tag for tag in DIETARY_TAGS if tag in parsed]
+    unknown = [tag for tag in parsed if tag not in TAG_BITS]
+    mask = 0
+    for tag in known:
+        mask |= TAG_BITS[tag]
+    return ",".join(known + unknown), mask
@@ -1,8 +1,10 @@
 # ==================== IMPORTS ==================== #
 
-from fastapi import FastAPI, HTTPException, Request, Depends, status
+from fastapi import FastAPI, HTTPException, Request, Response, Depends, Query, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel, EmailStr
 from contextlib import asynccontextmanager
 import uvicorn
@@ -17,10 +19,19 @@ from enum import Enum
 from typing import Optional, List
 import os
 import jwt
-import bcrypt
-import smtplib # Send emails
-from email.mime.text import MIMEText  # Format "forget" email
-from email.mime.multipart import MIMEMultipart
+import orjson
+from db import Database
+from outbox import EmailOutbox, SMTPTransport, MemoryTransport
+from dietary import normalize_tags
+from cache import TTLCache, ResponseCache
+from passwords import PasswordHasher
+from pagination import decode_cursor, paginate
+from stream import EventBroker
+from snapshot import ActiveEventsSnapshot
+from metrics import Metrics, MetricsMiddleware
+from budget import QueryBudget, QueryBudgetMiddleware
+from analytics import build_host_analytics
+from models import Event, Food, Projection, RatingSummary, parse_timestamp, parse_fields, EVENT_FIELDS, FOOD_FIELDS, RESERVATION_FIELDS
 
 
 # ==================== DATABASE SETUP ==================== #
@@ -31,12 +42,123 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 JWT_SECRET = os.getenv("JWT_SECRET", "YOUR_SECRET_KEY_CHANGE_THIS")
 JWT_ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 1 week
+MAX_NEARBY_RADIUS_M = 50_000  # /events/nearby search radius cap
+MAX_NEARBY_LIMIT = 100
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "50"))  # listings are paginated, see pagination.py
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "200"))
+MAX_RESERVATION_ITEMS = 20  # foods per /createreservation/batch
 
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+# Direct postgres connection (pooled), the supabase client above is only used when this is not set
+DATABASE_URL = os.getenv("DATABASE_URL")
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))  # set to 0 behind pgbouncer
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", "10"))
+
+# Request latency and database round trips, scraped from /metrics
+metrics = Metrics()
+
+# Database calls per request: logged over budget or when one query shape repeats (N+1),
+# debug headers show the counts on every response, enforce turns problems into errors (tests / CI)
+query_budget = QueryBudget(
+    max_calls=int(os.getenv("QUERY_BUDGET_MAX_CALLS", "6")),
+    max_seconds=float(os.getenv("QUERY_BUDGET_MAX_MS", "500")) / 1000,
+    repeat_threshold=int(os.getenv("QUERY_REPEAT_THRESHOLD", "3")),
+    debug_headers=os.getenv("QUERY_DEBUG_HEADERS", "false").lower() == "true",
+    enforce=os.getenv("QUERY_BUDGET_ENFORCE", "false").lower() == "true",
+)
+
+db = Database(
+    supabase,
+    dsn=DATABASE_URL,
+    min_size=DB_POOL_MIN_SIZE,
+    max_size=DB_POOL_MAX_SIZE,
+    statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+    command_timeout=DB_COMMAND_TIMEOUT,
+    metrics=metrics,
+)
+
+# Events around now (just ended, running, starting soon) with their foods, indexed by start and end time
+# Answers /active-events and the time filters of /events/filtered from memory
+active_snapshot = ActiveEventsSnapshot(
+    lambda since, until: db.list_filtered_events(start_to=until, end_from=since),
+    db.get_event_with_foods,
+    refresh_interval=float(os.getenv("SNAPSHOT_REFRESH_INTERVAL", "60")),
+    horizon=float(os.getenv("SNAPSHOT_HORIZON", "7200")),
+    lookback=float(os.getenv("SNAPSHOT_LOOKBACK", "7200")),
+)
+
+# Authenticated users, keyed by user_id, so each request doesn't cost a users lookup
+user_cache = TTLCache(
+    maxsize=int(os.getenv("USER_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "30")),
+)
+
+# Rendered bodies of the event reads the frontend polls, dropped by the write routes
+# The TTL also bounds how long time dependent answers (active events) can lag the clock
+response_cache = ResponseCache(
+    maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "10")),
+)
+
+# bcrypt runs on this pool so login / register bursts don't freeze the event loop
+password_hasher = PasswordHasher(
+    mode=os.getenv("PASSWORD_POOL", "thread"),  # "thread" or "process"
+    workers=int(os.getenv("PASSWORD_WORKERS", "4")),
+    max_concurrency=int(os.getenv("PASSWORD_MAX_CONCURRENCY", "0")) or None,
+)
+
+# ==================== EMAIL SETUP ==================== #
+# "smtp" sends through SMTP_HOST, "memory" keeps emails in process (local testing)
+EMAIL_BACKEND = os.getenv("EMAIL_BACKEND", "smtp")
+SENDER_EMAIL = os.getenv("SENDER_EMAIL")
+SENDER_PASS = os.getenv("SENDER_PASS")
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_SSL = os.getenv("SMTP_SSL", "true").lower() == "true"
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "false").lower() == "true"
+
+if EMAIL_BACKEND == "memory":
+    memory_transport = MemoryTransport()
+    transport_factory = lambda: memory_transport
+else:
+    transport_factory = lambda: SMTPTransport(SMTP_HOST, SMTP_PORT, SENDER_EMAIL, SENDER_PASS, use_ssl=SMTP_SSL, starttls=SMTP_STARTTLS)
+
+outbox = EmailOutbox(
+    transport_factory,
+    workers=int(os.getenv("EMAIL_WORKERS", "2")),
+    batch_size=int(os.getenv("EMAIL_BATCH_SIZE", "20")),
+    max_attempts=int(os.getenv("EMAIL_MAX_ATTEMPTS", "5")),
+    max_queue=int(os.getenv("EMAIL_QUEUE_SIZE", "10000")),
+)
+
+# ==================== LIVE UPDATES ==================== #
+# Server-sent event streams of inventory changes, fed by the write routes
+broker = EventBroker(
+    max_connections=int(os.getenv("STREAM_MAX_CONNECTIONS", "5000")),
+    max_pending=int(os.getenv("STREAM_MAX_PENDING", "100")),
+    heartbeat=float(os.getenv("STREAM_HEARTBEAT", "15")),
+)
+
 # ==================== APP SETUP ==================== #
+# Open the database pool, load the active events and start the email workers on startup, close them on shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await db.connect()
+    await active_snapshot.start()
+    await outbox.start()
+    password_hasher.start()
+    yield
+    broker.close()
+    password_hasher.close()
+    await outbox.stop()
+    await active_snapshot.stop()
+    await db.close()
+
 # FastAPI instance
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # CORS setup
 app.add_middleware(
@@ -45,8 +167,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "X-DB-Calls", "X-DB-Time-Ms"],  # next page of list routes, cached response version, query debug headers
 )
 
+app.add_middleware(QueryBudgetMiddleware, budget=query_budget)
+# Added last so it is the outermost middleware and times everything below it
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+
 # Security scheme
 security = HTTPBearer()
 
@@ -110,6 +237,18 @@ class CreateRes(BaseModel):
     pickup_time: datetime
     note: str
 
+# One food of a multi-item reservation
+class ResItem(BaseModel):
+    food_id: int
+    quantity: int
+    note: str = ""
+
+class CreateBatchRes(BaseModel):
+    event_id: int
+    items: list[ResItem]
+    pickup_time: datetime
+    note: str = ""
+
 class ReservationData(BaseModel):
     res_id: int
     food_id: int
@@ -125,6 +264,7 @@ class FoodData(BaseModel):
     food_name: str
     quantity: int
     event_id: int
+    dietary_tags: Optional[str] = None # Only updated when sent
 
 class UpdateEvent(BaseModel):
     eventName: str
@@ -159,25 +299,139 @@ class RatingCreate(BaseModel):
     description: Optional[str] = None
 
 # ==================== HELPER FUNCTION ==================== #
-def hash_password(password: str) -> str:
+def time_filter_bounds(time_filter: TimeFilter, now: datetime, freshness_window: int = 30) -> dict:
+    """
+    Turn a time filter into the start_time / last_res_time range and ordering the database applies
+    """
+    if time_filter == TimeFilter.JUST_STARTED:
+        # events that started within the last 30 minutes, most recent first
+        return {"start_from": now - timedelta(minutes=30), "start_to": now, "order_by": "start_time", "descending": True}
+    if time_filter == TimeFilter.WITHIN_HOUR:
+        # events that started within the last 60 minutes, most recent first
+        return {"start_from": now - timedelta(minutes=60), "start_to": now, "order_by": "start_time", "descending": True}
+    if time_filter == TimeFilter.ENDING_SOON:
+        # events ending within the next 60 minutes, soonest first
+        return {"end_from": now, "end_to": now + timedelta(minutes=60), "order_by": "last_res_time", "descending": False}
+    if time_filter == TimeFilter.RUNNING_NOW:
+        # currently active events (started but not yet ended)
+        return {"start_to": now, "end_from": now}
+    if time_filter == TimeFilter.FRESH_FOOD:
+        # events that have just ended (food should still be fresh), most recently ended first
+        return {"end_from": now - timedelta(minutes=freshness_window), "end_to": now, "order_by": "last_res_time", "descending": True}
+    return {}
+
+def read_cursor(cursor: Optional[str], listing: str, column: str, descending: bool = True) -> Optional[tuple]:
+    """
+    Decode a pagination cursor from the query string, 400 if it is not one we handed out for this listing and order
+    """
+    try:
+        return decode_cursor(cursor, listing, column, descending)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def read_fields(fields: Optional[str], allowed: tuple, nested: Optional[tuple] = None) -> Optional[Projection]:
+    """
+    Parse a fields= query parameter against its allowlist, 400 for anything else
+    """
+    try:
+        return parse_fields(fields, allowed, nested)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+def projection_key(projection: Optional[Projection]) -> Optional[tuple]:
+    """
+    Response cache key part of a projection, None for the full shape
+    """
+    return (projection.fields, projection.foods) if projection is not None else None
+
+def dietary_filter(dietary_restrictions: str) -> dict:
     """
-    Hashes a password using bcrypt
+    Turn a comma separated list of dietary restrictions into the dietary filter the database applies,
+    one containment lookup (@>) on the foods' indexed tag array for known and free text tags alike
     """
-    # Convert password to bytes, generate salt, and hash
-    password_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt(rounds=12)  
-    hashed_bytes = bcrypt.hashpw(password_bytes, salt)
+    restrictions = [r.strip().lower() for r in dietary_restrictions.split(",") if r.strip()] if dietary_restrictions else []
+    if not restrictions:
+        return {}
+    return {"dietary_tags": restrictions}
+
+def format_filtered_event(event: Event, time_filter: TimeFilter, now: datetime, projection: Optional[Projection] = None) -> dict:
+    """
+    Shape an event (with foods) for the frontend, with the minutes field the time filter shows
+    """
+    event_data = event.to_dict(projection=projection)
+    
+    if time_filter == TimeFilter.ENDING_SOON:
+        minutes_until_end = int((event.last_res_time - now).total_seconds() / 60)
+        event_data["minutes_until_end"] = minutes_until_end
+        
+    elif time_filter == TimeFilter.JUST_STARTED or time_filter == TimeFilter.WITHIN_HOUR:
+        minutes_since_start = int((now - event.start_time).total_seconds() / 60)
+        event_data["minutes_since_start"] = minutes_since_start
+        
+    elif time_filter == TimeFilter.FRESH_FOOD:
+        minutes_since_end = int((now - event.last_res_time).total_seconds() / 60)
+        event_data["minutes_since_end"] = minutes_since_end
 
-    # Return the hash as a string
-    return hashed_bytes.decode('utf-8')
+    return event_data
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+def diff_event_update(current: dict, data: UpdateEvent) -> dict:
     """
-    Verify a password against a bcrypt hash
+    Compare a host's edit with the event's current state (from db.get_event_state)
+    Only what actually changed is kept, foods and reservations from other events are ignored
     """
-    password_bytes = plain_password.encode('utf-8')
-    hashed_bytes = hashed_password.encode('utf-8')
-    return bcrypt.checkpw(password_bytes, hashed_bytes)
+    # Event columns that differ
+    event_changes = {}
+    new_values = {
+        "event_name": data.eventName,
+        "description": data.eventDescription,
+        "location_lat": data.location_lat,
+        "location_lng": data.location_lng,
+        "location_address": data.location_address,
+    }
+    for column, value in new_values.items():
+        if current.get(column) != value:
+            event_changes[column] = value
+    if parse_timestamp(current["start_time"]) != data.start:
+        event_changes["start_time"] = data.start
+    if parse_timestamp(current["last_res_time"]) != data.end:
+        event_changes["last_res_time"] = data.end
+
+    # Only send new quantities / tags, a food set to zero is kept at 0 like a sold out one
+    # (deleting it would take its reservations with it)
+    current_foods = {food["food_id"]: food for food in current.get("foods") or []}
+    food_updates = []
+    for food in data.foods:
+        current_food = current_foods.get(food.food_id)
+        if current_food is None:
+            continue
+        quantity = max(food.quantity, 0)
+        update = {"food_id": food.food_id, "quantity": quantity}
+        changed = quantity != current_food["quantity"]
+        if food.dietary_tags is not None:
+            update["dietary_tags"], update["dietary_mask"] = normalize_tags(food.dietary_tags)
+            changed = changed or update["dietary_tags"] != current_food.get("dietary_tags") or update["dietary_mask"] != current_food.get("dietary_mask")
+        if changed:
+            food_updates.append(update)
+
+    # Reservations set to zero are cancelled
+    current_reservations = {res["res_id"] for res in current.get("reservations") or []}
+    cancellations = [
+        {"res_id": res.res_id}
+        for res in data.reservations
+        if res.quantity <= 0 and res.res_id in current_reservations
+    ]
+
+    return {
+        "event": event_changes,
+        "food_updates": food_updates,
+        "cancellations": cancellations,
+    }
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     """
@@ -199,7 +453,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     Validate JWT token and return current user
     Extracts token from request
     Decodes JWT to get user_id
-    Fetches user from database
+    Fetches user from the user cache, or the database on a miss
     """
     token = credentials.credentials
     
@@ -214,44 +468,104 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
                 headers={"WWW-Authenticate": "Bearer"},
             )
             
+        user_id = int(user_id)
+        cached_user = user_cache.get(user_id)
+        if cached_user is not None:
+            return cached_user
+
         # Get user from database
-        response = supabase.table("users").select("*").eq("user_id", user_id).execute()
+        user_data = await db.get_user(user_id)
         
-        if not response.data:
+        if not user_data:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found",
             )
         
-        user_data = response.data[0]
-        
-        return User(
+        user = User(
             user_id=user_data["user_id"],
             email=user_data["email"],
             role=user_data["role"],
             name=user_data["name"],
             optin=user_data["optin"],
         )
-    except jwt.PyJWTError:
+        user_cache.set(user_id, user)
+        return user
+    except (jwt.PyJWTError, ValueError):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token or token expired",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-def send_email(recipient: str, subject: str, body: str):
-    sender_email = os.getenv("SENDER_EMAIL")
-    sender_pass = os.getenv("SENDER_PASS")
+def send_email(recipient: str, subject: str, body: str) -> bool:
+    """
+    Queue an email on the outbox, the background workers send it after the request returns
+    """
+    return outbox.enqueue(recipient, subject, body)
 
-    message = MIMEMultipart()
-    message["From"] = sender_email
-    message["To"] = recipient
-    message["Subject"] = subject
-    message.attach(MIMEText(body, "plain"))
+def listing_response(content, next_cursor: Optional[str] = None) -> Response:
+    """
+    Return a listing encoded with orjson, skipping FastAPI's jsonable_encoder pass, orjson encodes datetimes itself
+    The cursor of the next page goes in the X-Next-Cursor header
+    """
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return Response(orjson.dumps(content), media_type="application/json", headers=headers)
 
-    with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-        server.login(sender_email, sender_pass)
-        server.send_message(message)
+def publish_change(message_type: str, data: dict, event_id: int):
+    """
+    Push a change of event_id to its own streams and to the global feed
+    """
+    broker.publish(message_type, jsonable_encoder(data), "feed", f"event:{event_id}")
+
+def open_stream(request: Request, topic: str) -> StreamingResponse:
+    subscriber = broker.subscribe(topic)
+    if subscriber is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many open streams, please try again later",
+            headers={"Retry-After": str(broker.retry_ms // 1000)},
+        )
+    return StreamingResponse(
+        broker.stream(subscriber, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},  # nginx would buffer the stream otherwise
+    )
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    True if the If-None-Match header names etag (or is *)
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match compares weakly, so a W/ prefix added by a proxy still matches
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+async def cached_response(request: Request, key: tuple, tags: tuple, build) -> Response:
+    """
+    Serve a read route from the response cache, building and storing it on a miss
+    build(headers) returns the response content and may add headers that are cached with it
+    Clients that already hold the current version get an empty 304
+    """
+    entry = response_cache.get(key)
+    if entry is None:
+        generation = response_cache.generation
+        headers = {}
+        content = await build(headers)
+        body = orjson.dumps(content)
+        # Strong ETag, the hash of the exact bytes sent
+        headers["ETag"] = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        entry = (body, headers)
+        response_cache.set(key, entry, tags, generation)
+    body, headers = entry
+
+    if etag_matches(request, headers["ETag"]):
+        response_cache.not_modified += 1
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": headers["ETag"], "Cache-Control": "no-cache"})
+    return Response(content=body, media_type="application/json", headers={**headers, "Cache-Control": "no-cache"})
 
 # ==================== ROUTES ==================== #
 @app.get("/")
@@ -265,291 +579,268 @@ async def create_event(data: CreateEvent, current_user: User = Depends(get_curre
     creator_id = current_user.user_id
     name = data.name
     description = data.description
-    start_time = data.start.isoformat()
-    last_res_time = data.end.isoformat()
+    start_time = data.start
+    last_res_time = data.end
     location_lat = data.location_lat
     location_lng = data.location_lng
     location_address = data.location_address
 
-    response = (
-        supabase.table("events")
-        .insert({"creator_id": creator_id, "event_name": name, "description": description, "start_time": start_time, "last_res_time":last_res_time, "location_lat": location_lat, "location_lng": location_lng, "location_address": location_address})
-        .execute()
-    )
+    foods = []
+    for food in data.food:
+        # Store tags normalized, with their bitmask for indexed dietary filtering
+        dietary_tags, dietary_mask = normalize_tags(food.dietary_tags)
+        foods.append({"food_name": food.name, "quantity": food.quantity, "dietary_tags": dietary_tags, "dietary_mask": dietary_mask})
 
-    if not response.data:
+    # Event and all foods are written in one transaction, nothing is left behind if a row fails
+    created = await db.create_event_with_foods({"creator_id": creator_id, "event_name": name, "description": description, "start_time": start_time, "last_res_time":last_res_time, "location_lat": location_lat, "location_lng": location_lng, "location_address": location_address}, foods)
+
+    if not created:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to insert event"
         )
 
-
-    # print(response.data[0]['event_id'])
-    event_id = response.data[0]['event_id']
-
-    for food in data.food:
-        response = (
-            supabase.table("foods")
-            .insert({"food_name": food.name, "quantity": food.quantity, "event_id": event_id, "dietary_tags": food.dietary_tags})
-            .execute()
-        )
-        # print (response)
-        if not response.data:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to insert food item"
-            )
-        
-    response = (
-        supabase.table("users")
-        .select("*")
-        .execute()
-    )
+    # print(created['event_id'])
+    event_id = created['event_id']
+    response_cache.invalidate("events")
+    created_event = await active_snapshot.refresh_event(event_id)
+    if created_event is not None:
+        publish_change("event_created", created_event.to_dict(), event_id)
 
     subject = "New Event Posted"
     message = "Click the link to see the event details: spark-bytes-wheat.vercel.app/events/" + str(event_id) 
-    users = response.data
-    for user in users:
-        if user["role"] == 'regular_user' and user["optin"] == True:
-            print(message)
-            send_email(user["email"], subject, message)
+    # Only the emails of opted in regular users are loaded
+    for email in await db.list_subscriber_emails():
+        send_email(email, subject, message)
 
-    return {"message": "Success"}
+    return {"message": "Success", "event_id": event_id, "food_ids": created["food_ids"]}
 
 @app.post("/events/update/{event_id}")
 async def update_event(data: UpdateEvent, event_id : int, current_user: User = Depends(get_current_user)):
     user_id = current_user.user_id 
-    response = (
-        supabase.table("events")
-        .select("*")
-        .eq("event_id", event_id)
-        .execute()
-    )
-    if not response.data or response.data[0]["creator_id"] != user_id:
+    # Current event with its foods and reservations, in one query
+    event = await db.get_event_state(event_id)
+    if not event or event["creator_id"] != user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You do not have permission to update this event"
         )
 
-    response = (
-        supabase.table("events")
-        .update({"event_name": data.eventName, "description": data.eventDescription, "start_time": data.start.isoformat(), "last_res_time": data.end.isoformat(), "location_lat": data.location_lat, "location_lng": data.location_lng, "location_address": data.location_address})
-        .eq("event_id", event_id)
-        .execute()
-    )
+    # Work out what changed, then apply all of it in one transaction
+    diff = diff_event_update(event, data)
+    if not any(diff.values()):
+        return {"message": "No changes", "changes": None}
+
+    changes = await db.apply_event_update(event_id, diff["event"], diff["food_updates"], diff["cancellations"])
 
-    if not response.data:
+    if not changes:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to insert event"
+            detail="Failed to update event"
         )
-    
-    for food in data.foods:
-        food_id = food.food_id
-        if (food.quantity <= 0):
-            response = (
-                supabase.table("foods")
-                .delete()
-                .eq("food_id", food_id)
-                .execute()
-            )
-        else:
-            response = (
-                supabase.table("foods")
-                .update({"quantity": food.quantity})
-                .eq("food_id", food_id)
-                .execute()
-            )
-            if not response.data:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Failed to update event"
-                )
-
-    for res in data.reservations:
-        res_id = res.res_id
-        food_id = res.food_id
-        if (res.quantity <= 0):
-            response = (
-                supabase.table("reservations")
-                .select("quantity")
-                .eq("res_id", res_id)
-                .execute()
-            )
-            quant = response.data[0]['quantity']
-            response = (
-                supabase.table("foods")
-                .select("quantity")
-                .eq("food_id", food_id)
-                .execute()
-            )
-            if not response.data:
-                response = (
-                    supabase.table("foods")
-                    .insert({"food_name": res.food_name, "quantity": quant, "event_id": event_id})
-                    .execute()
-                )
-            else:
-                currentQuant = response.data[0]['quantity']
-                response = (
-                    supabase.table("foods")
-                    .update({"quantity": quant + currentQuant})
-                    .eq("food_id", food_id)
-                    .execute()
-                )
-            response = (
-                supabase.table("reservations")
-                .delete()
-                .eq("res_id", res_id)
-                .execute()
-            )
-    
+    response_cache.invalidate("events", f"event:{event_id}", f"analytics:host:{user_id}")
+
+    # Cancellations give quantities back, so the snapshot and watchers get the foods as they are now
+    current = await active_snapshot.refresh_event(event_id)
+    if current is not None:
+        publish_change("event_updated", {"event_id": event_id, "event": diff["event"], "foods": [food.to_dict() for food in current.foods or []]}, event_id)
+
+    return {"message": "Success", "changes": changes}
 
 @app.get("/events/filtered")
-async def get_filtered_events(dietary_restrictions: str = "", current_user: User = Depends(get_current_user)):
+async def get_filtered_events(
+    dietary_restrictions: str = "", 
+    time_filter: TimeFilter = TimeFilter.ALL,
+    freshness_window: int = 30,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
     """
-    fetch all events that match the provided dietary restrictions
+    Fetch all events that match the provided dietary restrictions and time filter
+    The time window, dietary tags and ordering are all applied by the database
+    One page at a time, the X-Next-Cursor header holds the cursor of the next page
+    fields= (e.g. event_id,event_name,date,foods.quantity) returns, and reads, only those fields
     """
-    # parse list of restrictions
-    restrictions = [r.strip() for r in dietary_restrictions.split(",")] if dietary_restrictions else []
-    
-    # if no restrictions provided, return all events
-    if not restrictions:
-        return await get_all_events(current_user)
+    projection = read_fields(fields, EVENT_FIELDS, FOOD_FIELDS)
+    # get current time in universal time
+    now = datetime.now(timezone.utc)
+    bounds = time_filter_bounds(time_filter, now, freshness_window)
+    order_by = bounds.get("order_by", "start_time")
+    descending = bounds.get("descending", True)
+    # Each time filter is a listing of its own, its cursors don't continue another filter's order
+    listing = f"/events/filtered/{time_filter.value}"
+
+    after = read_cursor(cursor, listing, order_by, descending)
+    if active_snapshot.covers(bounds):
+        # the whole window is in memory, answered by range scans on the time index in the order the filter needs
+        filtered_events = active_snapshot.list_filtered_events(
+            **dietary_filter(dietary_restrictions),
+            **bounds,
+            limit=limit,
+            after=after
+        )
+    else:
+        if time_filter != TimeFilter.ALL:
+            active_snapshot.fallbacks += 1
+        # fetch only the matching events with their foods, already sorted for the time filter
+        rows = await db.list_filtered_events(
+            **dietary_filter(dietary_restrictions),
+            **bounds,
+            limit=limit,
+            after=after,
+            projection=projection
+        )
+        filtered_events = [Event.from_row(row) for row in rows]
+    page, next_cursor = paginate(filtered_events, limit, listing, order_by, "event_id", descending)
     
-    # fetch all events with their foods
-    response = (
-        supabase.table("events")
-        .select("*, foods(*)")
-        .execute()
+    return listing_response([format_filtered_event(event, time_filter, now, projection) for event in page], next_cursor)
+
+@app.get("/events/stream")
+async def stream_events(request: Request):
+    """
+    Server-sent events for every event: event_created, event_updated, event_deleted and quantity
+    Public like /active-events, EventSource can't send an Authorization header
+    """
+    return open_stream(request, "feed")
+
+@app.get("/events/{event_id}/stream")
+async def stream_event(request: Request, event_id: int):
+    """
+    Server-sent events for one event, the stream ends after event_deleted
+    """
+    return open_stream(request, f"event:{event_id}")
+
+@app.get("/events/nearby")
+async def get_nearby_events(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius: float = Query(1000, gt=0, le=MAX_NEARBY_RADIUS_M),  # in meters
+    limit: int = Query(20, ge=1, le=MAX_NEARBY_LIMIT),
+    dietary_restrictions: str = "",
+    time_filter: TimeFilter = TimeFilter.ALL,
+    freshness_window: int = 30,
+    fields: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Fetch the events closest to (lat, lng) within radius meters, nearest first
+    Combines with the same dietary and time filters as /events/filtered, all answered from the spatial index
+    fields= works like in /events/filtered, distance_m is always returned
+    """
+    projection = read_fields(fields, EVENT_FIELDS, FOOD_FIELDS)
+    now = datetime.now(timezone.utc)
+
+    # distance decides the order here, not the time filter
+    bounds = time_filter_bounds(time_filter, now, freshness_window)
+    bounds.pop("order_by", None)
+    bounds.pop("descending", None)
+
+    nearby_events = await db.list_nearby_events(
+        lat, lng, radius, limit,
+        **dietary_filter(dietary_restrictions),
+        **bounds,
+        projection=projection
     )
-    
-    if not response.data:
-        return []
-    
-    # filter events that have foods matching the restrictions
-    filtered_events = []
-    for event in response.data:
-        # get the foods for this event
-        foods = event.get("foods", [])
-        
-        # check if any food in the event has all the requested dietary tags
-        matching_foods = False
-        for food in foods:
-            food_tags = food.get("dietary_tags", "").lower().split(",")
-            food_tags = [tag.strip() for tag in food_tags]
-            
-            # check if this food meets all the requested restrictions
-            if all(restriction.lower() in food_tags for restriction in restrictions):
-                matching_foods = True
-                break
-        
-        # only include the event if it has matching foods
-        if matching_foods:
-            filtered_events.append({
-                "event_id": event["event_id"],
-                "event_name": event["event_name"],
-                "description": event.get("description"),
-                "date": event["start_time"],
-                "creator_id": event["creator_id"],
-                "created_at": event["created_at"],
-                "last_res_time": event["last_res_time"],
-                "foods": [
-                    {
-                        "food_id": food["food_id"],
-                        "food_name": food["food_name"],
-                        "quantity": food["quantity"],
-                        "event_id": food["event_id"],
-                        "dietary_tags": food.get("dietary_tags", "")
-                    } for food in foods
-                ]
-            })
-    
-    return filtered_events
-    
 
+    events = []
+    for row in nearby_events:
+        event_data = format_filtered_event(Event.from_row(row), time_filter, now, projection)
+        event_data["distance_m"] = round(row["distance_m"], 1)
+        events.append(event_data)
+    return listing_response(events)
 
 @app.post("/createreservation")
 async def create_reservation(data: CreateRes, current_user: User = Depends(get_current_user)):
     user_id = current_user.user_id
     user_name = current_user.name
-    response = (
-        supabase.table("reservations")
-        .insert({"user_id": user_id, "user_name": user_name, "food_id": data.food_id, "food_name": data.food_name, "event_id": data.event_id, "quantity": data.quantity, "res_time": data.pickup_time.isoformat(), "notes": data.note})
-        .execute()
-    )
-    print(response)
+    # Check stock, decrement it and insert the reservation in one database call
+    result = await db.reserve_food(user_id, user_name, data.food_id, data.food_name, data.event_id, data.quantity, data.pickup_time, data.note)
 
-    if not response.data:
+    if not result:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to insert event"
+            detail="Failed to insert reservation"
         )
-    
-    response = (
-        supabase.table("foods")
-        .select("quantity")
-        .eq("food_id", data.food_id)
-        .execute()
-    )
-
-    if not response.data:
+    if result["status"] == "invalid_quantity":
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to fetch food item"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Quantity must be at least 1"
         )
-
-    food_quantity = response.data[0]['quantity']
-    new_quantity = food_quantity - data.quantity
-    if new_quantity < 0:
+    if result["status"] == "sold_out":
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Not enough food available"
         )
-    elif new_quantity == 0:
-        response = (
-            supabase.table("foods")
-            .delete()
-            .eq("food_id", data.food_id)
-            .execute()
-        )
-    else: 
-        response = (
-            supabase.table("foods")
-            .update({"quantity": new_quantity})
-            .eq("food_id", data.food_id)
-            .execute()
+    creator_id = result["creator_id"]
+
+    # Remaining quantities are part of the cached event reads, the reservation is in the host's analytics
+    response_cache.invalidate("events", f"event:{data.event_id}", f"analytics:host:{creator_id}")
+    # A food at zero stays in the database for its reservations, the reads leave it out
+    active_snapshot.set_quantity(data.event_id, data.food_id, result["remaining"])
+    publish_change("quantity", {"event_id": data.event_id, "food_id": data.food_id, "quantity": result["remaining"]}, data.event_id)
+
+    subject = "New Reservation Made on Your Event"
+    message = "Click the link to see the details: spark-bytes-wheat.vercel.app/host/events/" + str(data.event_id) 
+    # Direct lookup of the host, None if they opted out
+    host_email = await db.get_notification_email(creator_id) if creator_id is not None else None
+    if host_email:
+        send_email(host_email, subject, message)
+    
+    return {"message": "Success"}
+
+# Reserve several foods of one event in one request: one transaction and one inventory check,
+# either every item is reserved or none is, and the host gets one email for all of them
+@app.post("/createreservation/batch")
+async def create_reservation_batch(data: CreateBatchRes, current_user: User = Depends(get_current_user)):
+    if not data.items or len(data.items) > MAX_RESERVATION_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Reserve between 1 and {MAX_RESERVATION_ITEMS} foods at a time"
         )
-    if not response.data:
+    items = [{"food_id": item.food_id, "quantity": item.quantity, "notes": item.note} for item in data.items]
+    result = await db.reserve_foods(current_user.user_id, current_user.name, data.event_id, items, data.pickup_time, data.note)
+
+    if not result:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to update food item"
+            detail="Failed to insert reservation"
+        )
+    if result["status"] == "invalid_quantity":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Quantity must be at least 1"
+        )
+    if result["status"] == "sold_out":
+        # Every food that is short, so the client can fix the whole order at once
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"message": "Not enough food available", "short": result["short"]}
         )
-    
-    response = (
-        supabase.table("events")
-        .select("*")
-        .eq("event_id", data.event_id)
-        .execute()
-    )
 
-    creator_id = response.data[0]["creator_id"]
+    reservations = result["reservations"]
+    creator_id = result["creator_id"]
 
-    response = (
-        supabase.table("users")
-        .select("*")
-        .execute()
-    )
+    response_cache.invalidate("events", f"event:{data.event_id}", f"analytics:host:{creator_id}")
+    for reservation in reservations:
+        active_snapshot.set_quantity(data.event_id, reservation["food_id"], reservation["remaining"])
+        publish_change("quantity", {"event_id": data.event_id, "food_id": reservation["food_id"], "quantity": reservation["remaining"]}, data.event_id)
 
     subject = "New Reservation Made on Your Event"
-    message = "Click the link to see the details: spark-bytes-wheat.vercel.app/host/events/" + str(data.event_id) 
-    users = response.data
-    for user in users:
-        if user["user_id"] == creator_id and user["optin"] == True:
-            print(message)
-            send_email(user["email"], subject, message)
-    
-    return {"message": "Success"}
+    reserved = ", ".join(f"{reservation['quantity']} x {reservation['food_name']}" for reservation in reservations)
+    message = f"Reserved: {reserved}\nClick the link to see the details: spark-bytes-wheat.vercel.app/host/events/" + str(data.event_id)
+    host_email = await db.get_notification_email(creator_id) if creator_id is not None else None
+    if host_email:
+        send_email(host_email, subject, message)
+
+    return {
+        "message": "Success",
+        "reservations": [
+            {"res_id": reservation["res_id"], "food_id": reservation["food_id"], "quantity": reservation["quantity"]}
+            for reservation in reservations
+        ],
+    }
 
 @app.post("/register", response_model=User, status_code=status.HTTP_201_CREATED)
 async def register_user(user_data: UserCreate):
@@ -561,16 +852,16 @@ async def register_user(user_data: UserCreate):
     Returns user data (without password)
     """
     # Check if user already exists
-    existing_user = supabase.table("users").select("*").eq("email", user_data.email).execute()
+    existing_user = await db.get_user_by_email(user_data.email)
     
-    if existing_user.data:
+    if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
     # Hash the password
-    hashed_password = hash_password(user_data.password)
+    hashed_password = await password_hasher.hash(user_data.password)
     
     # Insert the new user
     try:
@@ -582,15 +873,14 @@ async def register_user(user_data: UserCreate):
             "optin": False
         }
         
-        response = supabase.table("users").insert(new_user).execute()
+        created_user = await db.create_user(new_user)
         
-        if not response.data:
+        if not created_user:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to create user"
             )
-        
-        created_user = response.data[0]
+        user_cache.invalidate(created_user["user_id"])
         
         return User(
             user_id=created_user["user_id"],
@@ -608,14 +898,10 @@ async def register_user(user_data: UserCreate):
     
 @app.post("/optupdate/{opted}")
 async def optupdate(opted: bool, current_user: User = Depends(get_current_user)):
-    response = (
-        supabase.table("users")
-        .update({"optin": opted})
-        .eq("user_id",current_user.user_id)
-        .execute()
-    )
+    updated_user = await db.update_user(current_user.user_id, {"optin": opted})
+    user_cache.invalidate(current_user.user_id)
 
-    if not response.data:
+    if not updated_user:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to delete event"
@@ -633,18 +919,16 @@ async def login_user(login_data: LoginRequest):
     Returns token and user data 
     """
     # Get user from database
-    response = supabase.table("users").select("*").eq("email", login_data.email).execute()
+    user_data = await db.get_user_by_email(login_data.email)
     
-    if not response.data:
+    if not user_data:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
         )
     
-    user_data = response.data[0]
-    
     # Verify password
-    if not verify_password(login_data.password, user_data["password"]):
+    if not await password_hasher.verify(login_data.password, user_data["password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -677,219 +961,157 @@ async def get_user_profile(current_user: User = Depends(get_current_user)):
 
 
 @app.get("/events")
-async def get_events(current_user: User = Depends(get_current_user)):
+async def get_events(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
     """
-    Fetch all events for the current user
+    Fetch all events for the current user, newest first
+    One page at a time, the X-Next-Cursor header holds the cursor of the next page
+    fields= works like in /events/filtered
     """
-    # fetch events created by the current user
-    response = (
-        supabase.table("events")
-        .select("*, foods(*)")  # select events and their associated foods
-        .eq("creator_id", current_user.user_id)
-        .execute()
-    )
-
-    # if no events found, return an empty list
-    if not response.data:
-        return []
+    projection = read_fields(fields, EVENT_FIELDS, FOOD_FIELDS)
+    # fetch events created by the current user, with their associated foods
+    rows = await db.list_events_with_foods(creator_id=current_user.user_id, limit=limit, after=read_cursor(cursor, "/events", "start_time"), projection=projection)
+    host_events, next_cursor = paginate(rows, limit, "/events", "start_time", "event_id")
 
     # transform the events to match your frontend's expected structure
-    events = []
-    for event in response.data:
-        events.append({
-            "event_id": event["event_id"],
-            "event_name": event["event_name"],
-            "description": event.get("description"),
-            "date": event["start_time"],
-            "creator_id": event["creator_id"],
-            "created_at": event["created_at"],
-            "last_res_time": event["last_res_time"],
-            "location_lat": event.get("location_lat"),
-            "location_lng": event.get("location_lng"),
-            "location_address": event.get("location_address"),
-            "foods": [
-                {
-                    "food_id": food["food_id"],
-                    "food_name": food["food_name"],
-                    "quantity": food["quantity"],
-                    "event_id": food["event_id"]
-                } for food in event.get("foods", [])
-            ]
-        })
-
-    return events
+    return listing_response([Event.from_row(row).to_dict(projection=projection) for row in host_events], next_cursor)
 
 @app.get("/events/all")
-async def get_all_events(current_user: User = Depends(get_current_user)):
+async def get_all_events(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
     """
-    Fetch all events across the system (not just those created by the current user)
+    Fetch all events across the system (not just those created by the current user), newest first
+    One page at a time, the X-Next-Cursor header holds the cursor of the next page
+    fields= works like in /events/filtered
+    Served from the response cache until an event or reservation changes
     """
-    # fetch all events from the database
-    response = (
-        supabase.table("events")
-        .select("*, foods(*)")  # select events and their associated foods
-        .execute()
-    )
-
-    # if no events found, return an empty list
-    if not response.data:
-        return []
+    after = read_cursor(cursor, "/events/all", "start_time")
+    projection = read_fields(fields, EVENT_FIELDS, FOOD_FIELDS)
+    key = ("events/all", limit, cursor, projection_key(projection))
+    return await cached_response(request, key, ("events",), lambda headers: build_all_events(headers, limit, after, projection))
+
+async def build_all_events(headers: dict, limit: int, after: Optional[tuple], projection: Optional[Projection]) -> list:
+    # fetch all events from the database, with their associated foods
+    rows = await db.list_events_with_foods(limit=limit, after=after, projection=projection)
+    all_events, next_cursor = paginate(rows, limit, "/events/all", "start_time", "event_id")
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
 
     # transform events to match frontend
-    events = []
-    for event in response.data:
-        events.append({
-            "event_id": event["event_id"],
-            "event_name": event["event_name"],
-            "description": event.get("description"),
-            "date": event["start_time"],
-            "creator_id": event["creator_id"],
-            "created_at": event["created_at"],
-            "last_res_time": event["last_res_time"],
-            "location_lat": event.get("location_lat"),
-            "location_lng": event.get("location_lng"),
-            "location_address": event.get("location_address"),
-            "foods": [
-                {
-                    "food_id": food["food_id"],
-                    "food_name": food["food_name"],
-                    "quantity": food["quantity"],
-                    "event_id": food["event_id"],
-                    "dietary_tags": food.get("dietary_tags", "")
-                } for food in event.get("foods", [])
-            ]
-        })
-
-    return events
+    return [Event.from_row(row).to_dict(projection=projection) for row in all_events]
 
 @app.get("/events/{event_id}")
-async def get_event(event_id: int, current_user: User = Depends(get_current_user)):
-    response = (
-        supabase.table("events")
-        .select("*")
-        .eq("event_id", event_id)
-        .execute()
-    )
+async def get_event(request: Request, event_id: int, current_user: User = Depends(get_current_user)):
+    # Hosts are cached on their own: the one who created the event also gets its sold out foods
+    host_id = current_user.user_id if current_user.role == "event_creator" else None
+    return await cached_response(request, ("event", event_id, host_id), (f"event:{event_id}",), lambda headers: build_event(event_id, host_id))
 
-    if not response.data:
+async def build_event(event_id: int, host_id: Optional[int] = None) -> dict:
+    # Event, foods and reservations in one query, the host's edit page restocks sold out foods from here
+    event = await db.get_event_state(event_id)
+
+    if not event:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Event not found"
         )
-    
-    event = response.data[0]
-    event_data = {
-        "event_id": event["event_id"],
-        "event_name": event["event_name"],
-        "description": event.get("description"),
-        "date": event["start_time"],
-        "creator_id": event["creator_id"],
-        "start_time": event["start_time"],
-        "last_res_time": event["last_res_time"],
-        "location_lat": event["location_lat"],
-        "location_lng": event["location_lng"],
-        "location_address": event["location_address"],
-    }
-    
-    response = (
-        supabase.table("foods")
-        .select("*")
-        .eq("event_id", event_id)
-        .execute()
-    )
-
-    food = response.data 
-    if not response.data:
-        food = []
-
 
-    response = (
-        supabase.table("reservations")
-        .select("*")
-        .eq("event_id", event_id)
-        .execute()
-    )
-
-    reservations = response.data
-    if not response.data:
-        reservations = []
+    creator = host_id is not None and event.get("creator_id") == host_id
+    food = [row for row in event.get("foods") or [] if creator or row["quantity"] > 0]
 
-    return {"event": event_data, "food": food, "reservations": reservations}
+    return {
+        "event": Event.from_row(event).to_dict(include_foods=False),
+        "food": [Food.from_row(row).to_dict() for row in food],
+        "reservations": event.get("reservations") or [],
+    }
 
 @app.post("/events/delete/{event_id}")
 async def delete_event(event_id: int, current_user: User = Depends(get_current_user)):
-    response = (
-        supabase.table("events")
-        .select("*")
-        .eq("event_id", event_id)
-        .execute()
-    )
+    event = await db.get_event(event_id)
 
-    if not response.data:
+    if not event:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Event not found"
         )
-    if response.data[0]["creator_id"] != current_user.user_id:
+    if event["creator_id"] != current_user.user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You do not have permission to delete this event"
         )
     
-    response = (
-        supabase.table("events")
-        .delete()
-        .eq("event_id", event_id)
-        .execute()
-    )
+    deleted = await db.delete_event(event_id)
 
-    if not response.data:
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to delete event"
         )
+    response_cache.invalidate("events", f"event:{event_id}", f"analytics:host:{current_user.user_id}")
+    active_snapshot.remove_event(event_id)
+    publish_change("event_deleted", {"event_id": event_id}, event_id)
+    broker.close_topic(f"event:{event_id}")
     return {"message": "Event deleted successfully"}
 
 @app.get("/active-events")
-async def get_active_events():
-    now = datetime.now(timezone.utc).isoformat()
+async def get_active_events(request: Request):
+    return await cached_response(request, ("active-events",), ("events",), lambda headers: build_active_events())
 
-    response = supabase.table("events").select("*").lte("start_time", now).gte("last_res_time",now).execute()
-    if not response.data:
-        return {"events": []}
-    
-    # Translate the supabase response to a format that frontend can use
-    events = []
-    for event in response.data:
-        events.append({
-            "event_id": event["event_id"],
-            "event_name": event["event_name"],
-            "description": event.get("description"),
-            "date": event["start_time"],
-            "creator_id": event["creator_id"],
-            "created_at": event["created_at"],
-            "last_res_time": event["last_res_time"]
-        })
-    return {"events": events}
+async def build_active_events() -> dict:
+    now = datetime.now(timezone.utc)
+
+    running = {"start_to": now, "end_from": now}
+    if active_snapshot.covers(running):
+        active_events = active_snapshot.list_filtered_events(**running)
+    else:
+        active_snapshot.fallbacks += 1
+        active_events = [Event.from_row(row) for row in await db.list_active_events(now)]
+
+    # Foods are left out, the database fallback doesn't load them
+    return {"events": [event.to_dict(include_foods=False) for event in active_events]}
+
+@app.post("/active-events/refresh")
+async def refresh_active_events(current_user: User = Depends(get_current_user)):
+    """
+    Reload the active events snapshot now instead of waiting for the next periodic refresh
+    """
+    if current_user.role != "event_creator":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only event creators can refresh active events"
+        )
+    try:
+        await active_snapshot.refresh()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
+    response_cache.invalidate("events")
+    return {"message": "Success", "snapshot": active_snapshot.stats()}
 
 @app.get("/get-food/{event_id}")
-async def get_food(event_id: int):
-    response = supabase.table("foods").select("*").eq("event_id", event_id).execute()
-    if not response.data:
+async def get_food(request: Request, event_id: int, fields: Optional[str] = None):
+    projection = read_fields(fields, FOOD_FIELDS)
+    key = ("get-food", event_id, projection_key(projection))
+    return await cached_response(request, key, (f"event:{event_id}",), lambda headers: build_food(event_id, projection))
+
+async def build_food(event_id: int, projection: Optional[Projection]) -> dict:
+    event_foods = await db.list_foods(event_id, projection)
+    if not event_foods:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No food items found for this event")
     
-    # Translate the supabase response to a format that frontend can use
-    foods = []
-    for food in response.data:
-        foods.append({
-            "food_id": food["food_id"],
-            "food_name": food["food_name"],
-            "quantity": food["quantity"],
-            "event_id": food["event_id"]
-        })
-    return {"foods": foods}
+    # Translate the database rows to a format that frontend can use
+    food_fields = projection.fields if projection is not None else None
+    return {"foods": [Food.from_row(food).to_dict(food_fields) for food in event_foods]}
 
 # ===== Password: Forgotten and Recovery ===== #
 
@@ -899,14 +1121,11 @@ async def forgot_password(request: ForgotRequest):
     email = request.email
 
     # Check if the email exists in the users table
-    response = supabase.table("users").select("*").eq("email", email).execute()
+    user_data = await db.get_user_by_email(email)
 
     # User not in db, generic msg
-    if not response.data:
+    if not user_data:
         return {"message": "If an account with that email exists, a recovery email has been sent."}
-    
-    # Extract user from resp
-    user_data = response.data[0]
 
     # Generate a temporary assword reset 30min
     reset_token = create_access_token(
@@ -914,46 +1133,27 @@ async def forgot_password(request: ForgotRequest):
         expires_delta=timedelta(minutes=30)
     )
     
-    # Send password recovery email
-    try:
-        sender_email = os.getenv("SENDER_EMAIL")  # Sender email addr
-        sender_password = os.getenv("SENDER_PASS")  # Account password
-        smtp_server = "smtp.gmail.com" # Sever for gmail
-        smtp_port = 587
-
-        # Email content
-        subject = "Password Reset Request - Spark! Bytes"
-        content = f"""
-        Hello {email},
-
-        We received a request to reset your password for your SparkBytes account. 
-        Click the link below to reset your password (Valid for 30 minutes):
-
-        spark-bytes-wheat.vercel.app/reset-password?token={reset_token}
-
-        If you did not request this, please ignore this email.
-
-        Best,
-        Spark! Bytes Team
-        """
-
-        # Email object
-        msg = MIMEText(content)
-        msg["Subject"] = subject
-        msg["From"] = sender_email
-        msg["To"] = email
-
-        # Send email
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.sendmail(sender_email, email, msg.as_string())
-    
-    # Exception if fail
-    except Exception as e:
+    # Email content
+    subject = "Password Reset Request - Spark! Bytes"
+    content = f"""
+    Hello {email},
+
+    We received a request to reset your password for your SparkBytes account. 
+    Click the link below to reset your password (Valid for 30 minutes):
+
+    spark-bytes-wheat.vercel.app/reset-password?token={reset_token}
+
+    If you did not request this, please ignore this email.
+
+    Best,
+    Spark! Bytes Team
+    """
+
+    # Queue password recovery email, exception if the outbox can't take it
+    if not send_email(email, subject, content):
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to send recovery email: {str(e)}"
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Failed to send recovery email, please try again later"
         )
 
     # Generic success msg
@@ -974,12 +1174,13 @@ async def reset_password(request: ResetPasswordRequest):  # ✅ New route for re
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Token has expired.")
         
         # Hash the new password
-        new_hashed_password = hash_password(request.new_password)
+        new_hashed_password = await password_hasher.hash(request.new_password)
         
         # Update the user's password in the database
-        response = supabase.table("users").update({"password": new_hashed_password}).eq("user_id", user_id).execute()
+        updated_user = await db.update_user(user_id, {"password": new_hashed_password})
+        user_cache.invalidate(int(user_id))
         
-        if not response.data:
+        if not updated_user:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to update password.")
         
         return {"message": "Password has been successfully reset. You can now log in with your new password."}
@@ -990,151 +1191,6 @@ async def reset_password(request: ResetPasswordRequest):  # ✅ New route for re
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid token.")  
 
-@app.get("/events/filtered")
-async def get_filtered_events(
-    dietary_restrictions: str = "", 
-    time_filter: TimeFilter = TimeFilter.ALL,
-    freshness_window: int = 30,
-    current_user: User = Depends(get_current_user)
-):
-    """
-    Fetch all events that match the provided dietary restrictions and time filter
-    """
-    # get current time in universal time
-    now = datetime.now(timezone.utc)
-    
-    # go through list of dietary restrictions
-    restrictions = [r.strip() for r in dietary_restrictions.split(",")] if dietary_restrictions else []
-    
-    # fetch all events with their foods
-    response = (
-        supabase.table("events")
-        .select("*, foods(*)")
-        .execute()
-    )
-    
-    if not response.data:
-        return []
-    
-    filtered_events = []
-    
-    for event in response.data:
-        # go through event times
-        start_time_str = event["start_time"].replace('Z', '+00:00') if 'Z' in event["start_time"] else event["start_time"]
-        last_res_time_str = event["last_res_time"].replace('Z', '+00:00') if 'Z' in event["last_res_time"] else event["last_res_time"]
-        
-        start_time = datetime.fromisoformat(start_time_str)
-        last_res_time = datetime.fromisoformat(last_res_time_str)
-        
-        # apply time filter
-        passes_time_filter = False
-        
-        if time_filter == TimeFilter.ALL:
-            passes_time_filter = True
-            
-        elif time_filter == TimeFilter.JUST_STARTED:
-            # events that started within the last 30 minutes
-            time_since_start = now - start_time
-            passes_time_filter = time_since_start.total_seconds() >= 0 and time_since_start.total_seconds() <= 30 * 60
-            
-        elif time_filter == TimeFilter.WITHIN_HOUR:
-            # events that started within the last 60 minutes
-            time_since_start = now - start_time
-            passes_time_filter = time_since_start.total_seconds() >= 0 and time_since_start.total_seconds() <= 60 * 60
-            
-        elif time_filter == TimeFilter.ENDING_SOON:
-            # events ending within the next 60 minutes
-            time_until_end = last_res_time - now
-            passes_time_filter = time_until_end.total_seconds() >= 0 and time_until_end.total_seconds() <= 60 * 60
-            
-        elif time_filter == TimeFilter.RUNNING_NOW:
-            # currently active events (started but not yet ended)
-            passes_time_filter = start_time <= now and last_res_time >= now
-            
-        elif time_filter == TimeFilter.FRESH_FOOD:
-            # events that have just ended (food should still be fresh)
-            time_since_end = now - last_res_time
-            passes_time_filter = time_since_end.total_seconds() >= 0 and time_since_end.total_seconds() <= freshness_window * 60
-        
-        if not passes_time_filter:
-            continue
-        
-        # apply dietary filter
-        if not restrictions:
-            filtered_events.append(event)
-            continue
-            
-        # check if any food in the event has all the requested dietary tags
-        foods = event.get("foods", [])
-        matching_foods = False
-        
-        for food in foods:
-            food_tags = food.get("dietary_tags", "").lower().split(",")
-            food_tags = [tag.strip() for tag in food_tags]
-            
-            # check if food meets restrictions
-            if all(restriction.lower() in food_tags for restriction in restrictions):
-                matching_foods = True
-                break
-        
-        # include events with matching foods
-        if matching_foods:
-            filtered_events.append(event)
-    
-    # sort events based on the time filter
-    if time_filter == TimeFilter.ENDING_SOON:
-        # sort by how soon they're ending (ascending)
-        filtered_events.sort(key=lambda e: datetime.fromisoformat(e["last_res_time"].replace('Z', '+00:00') if 'Z' in e["last_res_time"] else e["last_res_time"]))
-    elif time_filter == TimeFilter.JUST_STARTED or time_filter == TimeFilter.WITHIN_HOUR:
-        # sort by how recently they started (most recent first)
-        filtered_events.sort(key=lambda e: datetime.fromisoformat(e["start_time"].replace('Z', '+00:00') if 'Z' in e["start_time"] else e["start_time"]), reverse=True)
-    elif time_filter == TimeFilter.FRESH_FOOD:
-        # sort by how recently they ended (most recent first)
-        filtered_events.sort(key=lambda e: now - datetime.fromisoformat(e["last_res_time"].replace('Z', '+00:00') if 'Z' in e["last_res_time"] else e["last_res_time"]))
-    
-    formatted_events = []
-    for event in filtered_events:
-        event_data = {
-            "event_id": event["event_id"],
-            "event_name": event["event_name"],
-            "description": event.get("description"),
-            "date": event["start_time"],
-            "creator_id": event["creator_id"],
-            "created_at": event["created_at"],
-            "last_res_time": event["last_res_time"],
-            "location_lat": event.get("location_lat"),
-            "location_lng": event.get("location_lng"),
-            "location_address": event.get("location_address"),
-            "foods": [
-                {
-                    "food_id": food["food_id"],
-                    "food_name": food["food_name"],
-                    "quantity": food["quantity"],
-                    "event_id": food["event_id"],
-                    "dietary_tags": food.get("dietary_tags", "")
-                } for food in event.get("foods", [])
-            ]
-        }
-        
-        if time_filter == TimeFilter.ENDING_SOON:
-            last_res_time = datetime.fromisoformat(event["last_res_time"].replace('Z', '+00:00') if 'Z' in event["last_res_time"] else event["last_res_time"])
-            minutes_until_end = int((last_res_time - now).total_seconds() / 60)
-            event_data["minutes_until_end"] = minutes_until_end
-            
-        elif time_filter == TimeFilter.JUST_STARTED or time_filter == TimeFilter.WITHIN_HOUR:
-            start_time = datetime.fromisoformat(event["start_time"].replace('Z', '+00:00') if 'Z' in event["start_time"] else event["start_time"])
-            minutes_since_start = int((now - start_time).total_seconds() / 60)
-            event_data["minutes_since_start"] = minutes_since_start
-            
-        elif time_filter == TimeFilter.FRESH_FOOD:
-            last_res_time = datetime.fromisoformat(event["last_res_time"].replace('Z', '+00:00') if 'Z' in event["last_res_time"] else event["last_res_time"])
-            minutes_since_end = int((now - last_res_time).total_seconds() / 60)
-            event_data["minutes_since_end"] = minutes_since_end
-        
-        formatted_events.append(event_data)
-    
-    return formatted_events
-
 # User rates event they've attended
 @app.post("/rate-event")
 async def rate_event(data: RatingCreate, current_user: User = Depends(get_current_user)):
@@ -1146,82 +1202,80 @@ async def rate_event(data: RatingCreate, current_user: User = Depends(get_curren
             detail="Rating must be between 0 and 5"
         )
 
-    # Check user attended event that is to be rated
-    reservation_check = (
-        supabase.table("reservations")
-        .select("res_id")
-        .eq("user_id", current_user.user_id)
-        .eq("event_id", data.event_id)
-        .execute()
-    )
+    # Check user attended event that is to be rated, add the rating to the table and to the
+    # event / host summaries, one round trip and one transaction (see the submit_rating migration)
+    result = await db.submit_rating(data.event_id, current_user.user_id, data.rating, data.description or "")
+
+    if not result:
+        raise HTTPException(status_code=500, detail="Failed to submit rating")
 
-    if not reservation_check.data:
+    if result["status"] == "not_attended":
         raise HTTPException(
             status_code=403,
             detail="You can only rate events you have attended"
         )
 
-    # Add rating to table
-    insert_resp = (
-        supabase.table("ratings")
-        .insert({
-            "event_id": data.event_id,
-            "user_id": current_user.user_id,
-            "rating": data.rating,
-            "description": data.description or ""
-        })
-        .execute()
-    )
-
-    if not insert_resp.data:
-        raise HTTPException(status_code=500, detail="Failed to submit rating")
+    # A first rating also confirms the user showed up, see the host analytics
+    creator_id = result.get("creator_id")
+    response_cache.invalidate(f"ratings:event:{data.event_id}", f"ratings:host:{creator_id}", f"analytics:host:{creator_id}")
 
     return {"message": "Rating submitted successfully!"}
 
-# Get ratings for event
+# Get ratings for event, newest first, one page at a time (next page cursor in X-Next-Cursor)
+# Counts and averages come from /ratings/{event_id}/summary instead of adding up every page
 @app.get("/ratings/{event_id}")
-async def get_ratings_for_event(event_id: int):
+async def get_ratings_for_event(
+    event_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
     # Return the rating of event
-    response = (
-        supabase.table("ratings")
-        .select("*")
-        .eq("event_id", event_id)
-        .order("id", desc=True)
-        .execute()
-    )
+    listing = f"/ratings/{event_id}"
+    rows = await db.list_event_ratings(event_id, limit=limit, after=read_cursor(cursor, listing, "created_at"))
+    ratings, next_cursor = paginate(rows, limit, listing, "created_at", "id")
 
-    if not response.data:
+    if not ratings:
         raise HTTPException(status_code=500, detail="Could not fetch ratings")
 
-    return {"ratings": response.data}
+    return listing_response({"ratings": ratings}, next_cursor)
+
+# Rating count, sum, average and 1-5 star histogram of an event
+# One primary key read of the summary submit_rating keeps up to date, cached until the next rating
+@app.get("/ratings/{event_id}/summary")
+async def get_event_rating_summary(request: Request, event_id: int):
+    tags = (f"ratings:event:{event_id}", f"event:{event_id}")
+    return await cached_response(request, ("ratings", "event", event_id), tags, lambda headers: build_event_rating_summary(event_id))
+
+async def build_event_rating_summary(event_id: int) -> dict:
+    summary = RatingSummary.from_row(await db.get_event_rating_summary(event_id))
+    return {"event_id": event_id, **summary.to_dict()}
+
+# Same for all the events of a host
+@app.get("/hosts/{creator_id}/ratings/summary")
+async def get_host_rating_summary(request: Request, creator_id: int):
+    tags = (f"ratings:host:{creator_id}",)
+    return await cached_response(request, ("ratings", "host", creator_id), tags, lambda headers: build_host_rating_summary(creator_id))
+
+async def build_host_rating_summary(creator_id: int) -> dict:
+    summary = RatingSummary.from_row(await db.get_host_rating_summary(creator_id))
+    return {"creator_id": creator_id, **summary.to_dict()}
 
 # ======================== Host POV: Latest event ======================= #
 # Define GET endpoint to fetch latest host event
 @app.get("/host-latest-event")
 async def get_host_latest_event(current_user: User = Depends(get_current_user)):
 
-    # Query for most recent event created by host
-    event_resp = (
-        # Using the events table
-        supabase.table("events")
-        # Select all fields from events table
-        .select("*")
-        # Filter to only get events created by the host
-        .eq("creator_id", current_user.user_id)
-        # Order events by the creation time
-        .order("created_at", desc=True)
-        # Extract most recent event - assumption host only hosts 1 event at a time
-        .limit(1)
-        .execute()
-    )
+    # Query for most recent event created by host, ordered by creation time
+    # Assumption host only hosts 1 event at a time
+    latest_event = await db.get_latest_host_event(current_user.user_id)
 
     # If no events found, return a message
-    if not event_resp.data:
+    if not latest_event:
         return {"message": "No events found for this host."}
 
     # Return just the event info (no joins, no extras)
     return {
-        "event": event_resp.data[0]
+        "event": Event.from_row(latest_event).to_dict()
     }
 
 
@@ -1229,26 +1283,22 @@ async def get_host_latest_event(current_user: User = Depends(get_current_user)):
 # Profile contains all events created by host. Split into active and archive sections.
 
 @app.get("/host/events")
-async def get_host_events(current_user: User = Depends(get_current_user)):
+async def get_host_events(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
     # Select all fields of events table and the specific food details needed
     # Filter for just users who are event creators, sort by order for neat display
-    event_response = (
-        supabase.table("events")
-        .select("*, foods(food_id, food_name, quantity)")
-        .eq("creator_id", current_user.user_id)
-        .order("start_time", desc=True)
-        .execute()
-    )
-
-    if not event_response.data:
-        return {"active_events": [], "archived_events": []}
-
-    # Get list of events from query
-    all_events = event_response.data
+    # One page at a time, the X-Next-Cursor header holds the cursor of the next page
+    # Pages are cut by start_time before the split, so a page can have no active events while a later page does:
+    # follow the cursor to the end before concluding there are none
+    rows = await db.list_host_events(current_user.user_id, limit=limit, after=read_cursor(cursor, "/host/events", "start_time"))
+    all_events, next_cursor = paginate(rows, limit, "/host/events", "start_time", "event_id")
 
     # Get today's date
     # today_utc = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0).isoformat()
-    now = datetime.now(timezone.utc).isoformat()
+    now = datetime.now(timezone.utc)
 
     # Categorising events as active or archive
     active = []
@@ -1256,54 +1306,78 @@ async def get_host_events(current_user: User = Depends(get_current_user)):
 
     # Loop through all events of the creator
     # If start time is greater than today consider active
-    for event in all_events:
-        if event["start_time"] <= now and event["last_res_time"] >= now:
-            active.append(event)
+    for row in all_events:
+        event = Event.from_row(row)
+        if event.is_running(now):
+            active.append(event.to_dict())
         else:
-            archived.append(event)
+            archived.append(event.to_dict())
 
     # Get the finalised active-archive lists
-    return {
+    return listing_response({
         "active_events": active,
-        "archived_events": archived
-    }
+        "archived_events": archived,
+    }, next_cursor)
+
+# ======================== Host Analytics ======================= #
+# Totals, reservations per 15 minute pickup window, quantity claimed per food and no-shows of the host's events
+# (or of one of them with event_id), read from the rollups the reservation / update / rating functions keep
+@app.get("/host/analytics")
+async def get_host_analytics(request: Request, event_id: Optional[int] = None, current_user: User = Depends(get_current_user)):
+    creator_id = current_user.user_id
+    key = ("analytics", creator_id, event_id)
+    return await cached_response(request, key, (f"analytics:host:{creator_id}",), lambda headers: build_analytics(creator_id, event_id))
+
+async def build_analytics(creator_id: int, event_id: Optional[int]) -> dict:
+    rollups = await db.get_host_analytics(creator_id, event_id)
+    return build_host_analytics(rollups or {}, datetime.now(timezone.utc))
 
 # ======================== User Profile ======================= #
 @app.get("/user/reservations")
-async def get_user_reservations(current_user: User = Depends(get_current_user)):
+async def get_user_reservations(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    after = read_cursor(cursor, "/user/reservations", "res_time")
+    # fields= picks reservation columns, the event is only joined if "events" is one of them
+    projection = read_fields(fields, RESERVATION_FIELDS)
     try:
-        # Join reservations with event and food database info
-        response = (
-            supabase.table("reservations")
-            .select("""
-                res_id,
-                res_time,
-                quantity,
-                notes,
-                food_name,
-                events (
-                    event_id,
-                    event_name,
-                    description,
-                    start_time,
-                    last_res_time
-                )
-            """)
-            # Filter reservations of certain user
-            .eq("user_id", current_user.user_id)
-            # Descending order
-            .order("res_time", desc=True)
-            .execute()
-        )
-        # Check for errors
-        if not response.data:
-            return {"reservations": []}
+        # Join reservations of certain user with event and food database info, descending order, one page at a time
+        rows = await db.list_user_reservations(current_user.user_id, limit=limit, after=after, projection=projection)
+        reservations, next_cursor = paginate(rows, limit, "/user/reservations", "res_time", "res_id")
+        if projection is not None:
+            reservations = [{field: reservation.get(field) for field in projection.fields} for reservation in reservations]
         # Return list of reservation
-        return {"reservations": response.data}
+        return listing_response({"reservations": reservations}, next_cursor)
     # Catch exceptions
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
 
+# ======================== Stats ======================= #
+# Internal counters used to size queues and caches
+@app.get("/stats")
+async def get_stats():
+    return collect_stats()
+
+def collect_stats() -> dict:
+    return {
+        "outbox": outbox.stats(),
+        "user_cache": user_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "streams": broker.stats(),
+        "active_snapshot": active_snapshot.stats(),
+        "password_hasher": password_hasher.stats(),
+        "query_budget": query_budget.stats(),
+    }
+
+# Prometheus scrape target: per-route latency histograms, status counts and in-flight requests,
+# database round trips per table and operation, and the /stats counters as gauges
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(metrics.render(collect_stats()), media_type="text/plain; version=0.0.4")
+
 # ==================== MAIN ==================== #
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=5001, reload=True)
\ No newline at end of file
@@ -0,0 +1,165 @@
+# ==================== IMPORTS ==================== #
+
+import time
+from bisect import bisect_left
+from collections import Counter
+from typing import Iterator, Optional
+
+
+# Upper bounds (seconds) of the latency buckets, +Inf is implied
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+# ==================== HELPER FUNCTION ==================== #
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# ==================== HISTOGRAM ==================== #
+class Histogram:
+    """
+    Fixed bucket histogram, observe() is a bisect and two additions
+    """
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, label_names: tuple[str, ...], label_values: tuple) -> Iterator[str]:
+        labels = _labels(label_names, label_values)
+        prefix = labels + "," if labels else ""
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}'
+        yield f"{name}_sum{{{labels}}} {_number(self.sum)}"
+        yield f"{name}_count{{{labels}}} {self.count}"
+
+
+# ==================== METRICS ==================== #
+class Metrics:
+    """
+    Request and database call metrics of this worker process, rendered in the Prometheus text format
+    Only touched from the event loop, so plain dicts and counters are enough
+    Each worker process keeps its own, Prometheus adds them up across workers
+    """
+
+    def __init__(self, request_buckets: tuple[float, ...] = REQUEST_BUCKETS, db_buckets: tuple[float, ...] = DB_BUCKETS):
+        self.request_buckets = request_buckets
+        self.db_buckets = db_buckets
+        self.request_latency: dict[tuple[str, str], Histogram] = {}
+        self.responses: Counter = Counter()
+        self.in_flight: Counter = Counter()
+        self.db_latency: dict[tuple[str, str], Histogram] = {}
+        self.db_errors: Counter = Counter()
+
+    # ----- requests ----- #
+    def request_started(self, method: str):
+        self.in_flight[method] += 1
+
+    def request_finished(self, method: str, route: str, status: int, seconds: float):
+        self.in_flight[method] -= 1
+        histogram = self.request_latency.get((method, route))
+        if histogram is None:
+            histogram = self.request_latency[(method, route)] = Histogram(self.request_buckets)
+        histogram.observe(seconds)
+        self.responses[(method, route, status)] += 1
+
+    # ----- database ----- #
+    def observe_db(self, table: str, operation: str, seconds: float, error: bool = False):
+        histogram = self.db_latency.get((table, operation))
+        if histogram is None:
+            histogram = self.db_latency[(table, operation)] = Histogram(self.db_buckets)
+        histogram.observe(seconds)
+        if error:
+            self.db_errors[(table, operation)] += 1
+
+    # ----- exposition ----- #
+    def render(self, stats: Optional[dict] = None) -> str:
+        """
+        Everything in the Prometheus text format, stats (the /stats payload) is added as component_stat gauges
+        """
+        lines = [
+            "# HELP http_request_duration_seconds Request latency by route",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), histogram in sorted(self.request_latency.items()):
+            lines.extend(histogram.render("http_request_duration_seconds", ("method", "route"), (method, route)))
+
+        lines += ["# HELP http_requests_total Responses by route and status", "# TYPE http_requests_total counter"]
+        for (method, route, status), count in sorted(self.responses.items()):
+            lines.append(f"http_requests_total{{{_labels(('method', 'route', 'status'), (method, route, status))}}} {count}")
+
+        lines += ["# HELP http_requests_in_flight Requests being served by method", "# TYPE http_requests_in_flight gauge"]
+        for method, count in sorted(self.in_flight.items()):
+            lines.append(f"http_requests_in_flight{{{_labels(('method',), (method,))}}} {count}")
+
+        lines += [
+            "# HELP db_call_duration_seconds Database round trips by table and operation",
+            "# TYPE db_call_duration_seconds histogram",
+        ]
+        for (table, operation), histogram in sorted(self.db_latency.items()):
+            lines.extend(histogram.render("db_call_duration_seconds", ("table", "operation"), (table, operation)))
+
+        lines += ["# HELP db_call_errors_total Failed database round trips", "# TYPE db_call_errors_total counter"]
+        for (table, operation), count in sorted(self.db_errors.items()):
+            lines.append(f"db_call_errors_total{{{_labels(('table', 'operation'), (table, operation))}}} {count}")
+
+        if stats:
+            lines += ["# HELP component_stat Numeric counters of /stats", "# TYPE component_stat gauge"]
+            for component, values in stats.items():
+                for stat, value in values.items():
+                    # Flags and nested values stay on /stats
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        lines.append(f"component_stat{{{_labels(('component', 'stat'), (component, stat))}}} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# ==================== MIDDLEWARE ==================== #
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency and status per route template ("/events/{event_id}"), in-flight requests per method
+    The route is the one the router put in the scope, read once the request is done instead of matching it again here,
+    paths that match no route share the "unmatched" label to keep the number of series bounded
+    """
+
+    def __init__(self, app, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        self.metrics.request_started(method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            self.metrics.request_finished(method, getattr(route, "path", "unmatched"), status_code, time.perf_counter() - started)
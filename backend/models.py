@@ -0,0 +1,211 @@
+# ==================== IMPORTS ==================== #
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+
+# ==================== HELPER FUNCTION ==================== #
+def parse_timestamp(value) -> Optional[datetime]:
+    """
+    Parse an ISO timestamp coming back from the database (handles the trailing 'Z')
+    asyncpg rows may already hold datetimes, those are returned as they are
+    """
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value.replace('Z', '+00:00') if 'Z' in value else value)
+
+
+# ==================== FIELDS ==================== #
+# What a fields= query parameter may ask for, anything else is rejected
+EVENT_FIELDS = ("event_id", "event_name", "description", "date", "start_time", "creator_id", "created_at", "last_res_time", "location_lat", "location_lng", "location_address", "foods")
+FOOD_FIELDS = ("food_id", "food_name", "quantity", "event_id", "dietary_tags")
+RESERVATION_FIELDS = ("res_id", "res_time", "quantity", "notes", "food_name", "events")
+
+# Response fields that are embedded rows or another name for a column
+EMBEDDED_FIELDS = ("foods", "events")
+FIELD_COLUMNS = {"date": "start_time"}
+
+
+@dataclass(slots=True)
+class Projection:
+    """
+    Parsed fields= of a route: the top level fields and, for events, the fields of their embedded foods
+    """
+    fields: tuple[str, ...]
+    foods: tuple[str, ...] = FOOD_FIELDS
+
+    def columns(self, *required: str) -> tuple[str, ...]:
+        """
+        Table columns to select: what was asked for plus what the route itself needs (sort keys, ids)
+        """
+        wanted = {FIELD_COLUMNS.get(field, field) for field in self.fields if field not in EMBEDDED_FIELDS}
+        return tuple(sorted(wanted.union(required)))
+
+    def embeds(self, field: str) -> bool:
+        return field in self.fields
+
+def parse_fields(value: Optional[str], allowed: tuple[str, ...], nested: Optional[tuple[str, ...]] = None) -> Optional[Projection]:
+    """
+    Parse a comma separated fields= value, None when it is empty (every field)
+    "foods" keeps every food field, "foods.quantity" picks single ones (when nested lists the food fields)
+    Raises ValueError for anything outside the allowlist
+    """
+    if not value:
+        return None
+    fields = set()
+    foods = set()
+    for name in (part.strip() for part in value.split(",")):
+        if not name:
+            continue
+        if nested is not None and name.startswith("foods."):
+            if name[len("foods."):] not in nested:
+                raise ValueError(f"Unknown field: {name}")
+            foods.add(name[len("foods."):])
+            fields.add("foods")
+        elif name in allowed:
+            fields.add(name)
+        else:
+            raise ValueError(f"Unknown field: {name}")
+    if not fields:
+        raise ValueError("No fields requested")
+    projection = Projection(tuple(field for field in allowed if field in fields))
+    if foods and nested is not None:
+        projection.foods = tuple(field for field in nested if field in foods)
+    return projection
+
+
+# ==================== ROWS ==================== #
+# Typed copies of events / foods rows, timestamps are parsed once when the row is read
+@dataclass(slots=True)
+class Food:
+    food_id: Optional[int]
+    food_name: Optional[str]
+    quantity: Optional[int]
+    event_id: Optional[int]
+    dietary_tags: str = ""
+    dietary_mask: Optional[int] = None
+
+    @classmethod
+    def from_row(cls, row: dict, event_id: Optional[int] = None) -> "Food":
+        return cls(
+            # Projected rows only carry the columns that were asked for
+            food_id=row.get("food_id"),
+            food_name=row.get("food_name"),
+            quantity=row.get("quantity"),
+            # Embedded foods may leave out the key of their event
+            event_id=row.get("event_id", event_id),
+            dietary_tags=row.get("dietary_tags") or "",
+            dietary_mask=row.get("dietary_mask"),
+        )
+
+    def to_dict(self, fields: Optional[tuple[str, ...]] = None) -> dict:
+        food_data = {
+            "food_id": self.food_id,
+            "food_name": self.food_name,
+            "quantity": self.quantity,
+            "event_id": self.event_id,
+            "dietary_tags": self.dietary_tags,
+        }
+        if fields is not None:
+            return {field: food_data[field] for field in fields}
+        return food_data
+
+
+@dataclass(slots=True)
+class Event:
+    event_id: int
+    event_name: Optional[str]
+    description: Optional[str]
+    creator_id: Optional[int]
+    start_time: Optional[datetime]
+    last_res_time: Optional[datetime]
+    created_at: Optional[datetime] = None
+    location_lat: Optional[float] = None
+    location_lng: Optional[float] = None
+    location_address: Optional[str] = None
+    # None when the row was read without its foods
+    foods: Optional[list[Food]] = None
+
+    @classmethod
+    def from_row(cls, row: dict) -> "Event":
+        foods = row.get("foods")
+        event_id = row["event_id"]
+        return cls(
+            event_id=event_id,
+            event_name=row.get("event_name"),
+            description=row.get("description"),
+            creator_id=row.get("creator_id"),
+            start_time=parse_timestamp(row.get("start_time")),
+            last_res_time=parse_timestamp(row.get("last_res_time")),
+            created_at=parse_timestamp(row.get("created_at")),
+            location_lat=row.get("location_lat"),
+            location_lng=row.get("location_lng"),
+            location_address=row.get("location_address"),
+            foods=[Food.from_row(food, event_id) for food in foods] if foods is not None else None,
+        )
+
+    def is_running(self, now: datetime) -> bool:
+        return self.start_time <= now <= self.last_res_time
+
+    def to_dict(self, include_foods: bool = True, projection: Optional[Projection] = None) -> dict:
+        """
+        The one event shape every route returns, "date" is the start time (what the frontend reads)
+        Foods are left out when include_foods is False or the row was read without them
+        With a projection only its fields are returned
+        """
+        event_data = {
+            "event_id": self.event_id,
+            "event_name": self.event_name,
+            "description": self.description,
+            "date": self.start_time,
+            "start_time": self.start_time,
+            "creator_id": self.creator_id,
+            "created_at": self.created_at,
+            "last_res_time": self.last_res_time,
+            "location_lat": self.location_lat,
+            "location_lng": self.location_lng,
+            "location_address": self.location_address,
+        }
+        if projection is not None:
+            event_data = {field: event_data[field] for field in projection.fields if field in event_data}
+            if projection.embeds("foods") and self.foods is not None:
+                event_data["foods"] = [food.to_dict(projection.foods) for food in self.foods]
+            return event_data
+        if include_foods and self.foods is not None:
+            event_data["foods"] = [food.to_dict() for food in self.foods]
+        return event_data
+
+
+# ==================== RATINGS ==================== #
+@dataclass(slots=True)
+class RatingSummary:
+    """
+    Rating aggregates of an event or a host (event_rating_summaries / host_rating_summaries rows)
+    An event or host nobody rated yet has no row, from_row(None) is the empty summary
+    """
+    count: int = 0
+    total: float = 0.0
+    histogram: tuple[int, int, int, int, int] = (0, 0, 0, 0, 0)
+
+    @classmethod
+    def from_row(cls, row: Optional[dict]) -> "RatingSummary":
+        if not row:
+            return cls()
+        return cls(
+            count=row.get("rating_count") or 0,
+            total=float(row.get("rating_sum") or 0),
+            histogram=tuple(row.get(f"stars_{star}") or 0 for star in range(1, 6)),
+        )
+
+    @property
+    def average(self) -> Optional[float]:
+        return round(self.total / self.count, 2) if self.count else None
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "average": self.average,
+            "histogram": {str(star): count for star, count in enumerate(self.histogram, start=1)},
+        }
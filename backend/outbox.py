@@ -0,0 +1,306 @@
+# ==================== IMPORTS ==================== #
+
+import asyncio
+import random
+import smtplib # Send emails
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from typing import Callable, Optional
+
+
+# ==================== MODELS ==================== #
+@dataclass
+class EmailMessage:
+    recipient: str
+    subject: str
+    body: str
+    attempts: int = 0
+    last_error: Optional[str] = None
+    queued_at: float = field(default_factory=time.monotonic)
+
+
+# ==================== TRANSPORTS ==================== #
+class SMTPTransport:
+    """
+    One authenticated SMTP session that is kept open and reused across messages
+    Reconnects lazily when the server drops the connection
+    """
+
+    def __init__(self, host: str, port: int, sender: str, password: Optional[str], use_ssl: bool = True, starttls: bool = False, timeout: float = 30.0):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.password = password
+        self.use_ssl = use_ssl
+        self.starttls = starttls
+        self.timeout = timeout
+        self.server: Optional[smtplib.SMTP] = None
+
+    def open(self):
+        if self.use_ssl:
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                server.starttls()
+        # Local stand-ins usually don't need auth
+        if self.password:
+            server.login(self.sender, self.password)
+        self.server = server
+
+    def close(self):
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except smtplib.SMTPException:
+            pass
+        except OSError:
+            pass
+        self.server = None
+
+    def send(self, message: EmailMessage):
+        mime = MIMEMultipart()
+        mime["From"] = self.sender
+        mime["To"] = message.recipient
+        mime["Subject"] = message.subject
+        mime.attach(MIMEText(message.body, "plain"))
+
+        if self.server is None:
+            self.open()
+        try:
+            self.server.send_message(mime)
+        except smtplib.SMTPServerDisconnected:
+            # Session timed out on the server side, log in again once and retry
+            self.server = None
+            self.open()
+            self.server.send_message(mime)
+
+
+class MemoryTransport:
+    """
+    Local stand-in for SMTP, keeps every message in memory instead of sending it
+    """
+
+    def __init__(self):
+        self.sent: list[EmailMessage] = []
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send(self, message: EmailMessage):
+        self.sent.append(message)
+
+
+# ==================== OUTBOX ==================== #
+class EmailOutbox:
+    """
+    Queue of outgoing emails drained by a pool of background workers
+    Each worker owns one SMTP session and sends messages in batches over it,
+    failed messages are retried with exponential backoff and end up in the dead-letter list
+    """
+
+    def __init__(
+        self,
+        transport_factory: Callable[[], object],
+        workers: int = 2,
+        batch_size: int = 20,
+        max_attempts: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        max_queue: int = 10000,
+        idle_timeout: float = 30.0,
+        dead_letter_size: int = 1000,
+    ):
+        self.transport_factory = transport_factory
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_queue = max_queue
+        self.idle_timeout = idle_timeout
+
+        self.queue: Optional[asyncio.Queue] = None
+        self.dead_letters: deque[EmailMessage] = deque(maxlen=dead_letter_size)
+        self._tasks: list[asyncio.Task] = []
+        # Messages waiting out their backoff, with the timer that puts them back on the queue
+        self._retry_handles: dict[int, tuple[asyncio.TimerHandle, EmailMessage]] = {}
+
+        # Counters for the stats endpoint
+        self.sent = 0
+        self.failed_attempts = 0
+        self.retried = 0
+        self.dead_lettered = 0
+        self.in_flight = 0
+        self.last_send_seconds = 0.0
+
+    # ----- lifecycle ----- #
+    async def start(self):
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 10.0):
+        """
+        Give the workers a chance to drain the queue, then cancel them
+        Messages still waiting for a retry won't get one, they go to the dead letters
+        """
+        if self.queue is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"[outbox] shutting down with {self.queue.qsize()} unsent emails")
+        for handle, message in self._retry_handles.values():
+            handle.cancel()
+            message.last_error = f"outbox shut down before retry, last error: {message.last_error}"
+            self._dead_letter(message)
+        self._retry_handles.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # ----- producers ----- #
+    def enqueue(self, recipient: str, subject: str, body: str) -> bool:
+        """
+        Put a message on the queue without waiting, returns False if it could not be queued
+        """
+        message = EmailMessage(recipient=recipient, subject=subject, body=body)
+        if self.queue is None:
+            message.last_error = "outbox not started"
+            self._dead_letter(message)
+            return False
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            message.last_error = "outbox queue full"
+            self._dead_letter(message)
+            return False
+        return True
+
+    # ----- workers ----- #
+    async def _worker(self):
+        """
+        Send batches until cancelled, an unexpected error is logged and the loop goes on with a fresh session
+        """
+        transport = self.transport_factory()
+        try:
+            while True:
+                try:
+                    await self._send_next_batch(transport)
+                except Exception as e:
+                    print(f"[outbox] worker error, restarting: {e!r}")
+                    try:
+                        await asyncio.to_thread(transport.close)
+                    except Exception:
+                        transport = self.transport_factory()
+                    # Don't spin if the error comes back right away
+                    await asyncio.sleep(self.base_delay)
+        finally:
+            await asyncio.to_thread(transport.close)
+
+    async def _send_next_batch(self, transport):
+        """
+        Wait for the next messages on the queue and send them as one batch
+        """
+        try:
+            first = await asyncio.wait_for(self.queue.get(), self.idle_timeout)
+        except asyncio.TimeoutError:
+            # Nothing to send for a while, don't keep the SMTP session open
+            await asyncio.to_thread(transport.close)
+            return
+
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+
+        self.in_flight += len(batch)
+        started = time.perf_counter()
+        try:
+            failures = await asyncio.to_thread(self._send_batch, transport, batch)
+        finally:
+            self.in_flight -= len(batch)
+            for _ in batch:
+                self.queue.task_done()
+        self.last_send_seconds = time.perf_counter() - started
+        self.sent += len(batch) - len(failures)
+
+        for message, error in failures:
+            self._retry_or_dead_letter(message, error)
+
+    def _send_batch(self, transport, batch: list[EmailMessage]) -> list[tuple[EmailMessage, Exception]]:
+        """
+        Runs in a worker thread, sends every message of the batch over the same session
+        """
+        failures = []
+        for message in batch:
+            message.attempts += 1
+            try:
+                transport.send(message)
+            except Exception as e:
+                # Anything the transport raises fails this message only, it is retried or dead-lettered
+                failures.append((message, e))
+                # Start from a fresh session for the rest of the batch
+                try:
+                    transport.close()
+                except Exception:
+                    pass
+        return failures
+
+    def _retry_or_dead_letter(self, message: EmailMessage, error: Exception):
+        self.failed_attempts += 1
+        message.last_error = str(error)
+
+        # Rejected recipients won't succeed on a retry
+        if isinstance(error, smtplib.SMTPRecipientsRefused) or message.attempts >= self.max_attempts:
+            self._dead_letter(message)
+            return
+
+        delay = min(self.base_delay * 2 ** (message.attempts - 1), self.max_delay)
+        delay *= random.uniform(0.5, 1.5)
+        self.retried += 1
+        loop = asyncio.get_running_loop()
+        self._retry_handles[id(message)] = (loop.call_later(delay, self._requeue, message), message)
+
+    def _requeue(self, message: EmailMessage):
+        self._retry_handles.pop(id(message), None)
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            message.last_error = "outbox queue full"
+            self._dead_letter(message)
+
+    def _dead_letter(self, message: EmailMessage):
+        print(f"[outbox] giving up on email to {message.recipient}: {message.last_error}")
+        self.dead_lettered += 1
+        self.dead_letters.append(message)
+
+    # ----- metrics ----- #
+    def stats(self) -> dict:
+        oldest = None
+        if self.queue is not None and not self.queue.empty():
+            # asyncio.Queue keeps its items in a deque, peek at the head for the queueing delay
+            oldest = time.monotonic() - self.queue._queue[0].queued_at
+        return {
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "in_flight": self.in_flight,
+            "waiting_retries": len(self._retry_handles),
+            "oldest_queued_seconds": oldest,
+            "sent": self.sent,
+            "failed_attempts": self.failed_attempts,
+            "retried": self.retried,
+            "dead_lettered": self.dead_lettered,
+            "dead_letter_size": len(self.dead_letters),
+            "workers": len(self._tasks),
+            "last_batch_seconds": self.last_send_seconds,
+        }
@@ -0,0 +1,55 @@
+# ==================== IMPORTS ==================== #
+
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+
+
+# ==================== CURSORS ==================== #
+# Keyset pagination: a page is "the next limit rows after (sort value, id) of the last row already seen",
+# so every page costs one index range scan no matter how deep into the listing it is.
+# Cursors are opaque to clients, they are base64 encoded json of the listing they were handed out for, its sort
+# column and direction, the sort value and the row id. A cursor only continues the listing it came from, the same
+# position read in the other direction (or under another time filter) would skip or repeat rows.
+
+def encode_cursor(listing: str, column: str, descending: bool, value, row_id: int) -> str:
+    payload = json.dumps([listing, column, descending, value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(token: Optional[str], listing: str, column: str, descending: bool = True) -> Optional[tuple]:
+    """
+    (sort value, id) from a cursor token, None for the first page
+    Raises ValueError for tokens that are malformed or belong to another listing, sort column or direction
+    """
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        cursor_listing, cursor_column, cursor_descending, value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if (cursor_listing, cursor_column, cursor_descending) != (listing, column, descending):
+        raise ValueError("Invalid cursor")
+    if not isinstance(value, str) or not isinstance(row_id, int):
+        raise ValueError("Invalid cursor")
+    # Every listing is sorted by a timestamp column, make sure the database will accept it
+    datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return value, row_id
+
+def paginate(rows: list, limit: int, listing: str, column: str, id_column: str, descending: bool = True) -> tuple[list, Optional[str]]:
+    """
+    Cut a page from rows fetched with limit + 1, and build the cursor of the next page (None on the last page)
+    Rows are dicts or typed rows (models.Event)
+    """
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    last = page[-1]
+    if isinstance(last, dict):
+        value, row_id = last[column], last[id_column]
+    else:
+        value, row_id = getattr(last, column), getattr(last, id_column)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return page, encode_cursor(listing, column, descending, value, row_id)
@@ -0,0 +1,110 @@
+# ==================== IMPORTS ==================== #
+
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+import bcrypt
+
+
+# ==================== HELPER FUNCTION ==================== #
+# Module level so they can be sent to a process pool
+def hash_password(password: str) -> str:
+    """
+    Hashes a password using bcrypt
+    """
+    # Convert password to bytes, generate salt, and hash
+    password_bytes = password.encode('utf-8')
+    salt = bcrypt.gensalt(rounds=12)
+    hashed_bytes = bcrypt.hashpw(password_bytes, salt)
+
+    # Return the hash as a string
+    return hashed_bytes.decode('utf-8')
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verify a password against a bcrypt hash
+    """
+    password_bytes = plain_password.encode('utf-8')
+    hashed_bytes = hashed_password.encode('utf-8')
+    return bcrypt.checkpw(password_bytes, hashed_bytes)
+
+
+# ==================== HASHER ==================== #
+class PasswordHasher:
+    """
+    Runs bcrypt off the event loop on a bounded thread or process pool
+    bcrypt releases the GIL, so threads are enough unless the CPU is shared with other work
+    At most max_concurrency hashes run at once, the rest wait their turn (and that wait is measured)
+    """
+
+    def __init__(self, mode: str = "thread", workers: int = 4, max_concurrency: Optional[int] = None):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown password hashing pool: {mode}")
+        self.mode = mode
+        self.workers = workers
+        self.max_concurrency = max_concurrency or workers
+        self.executor: Optional[Executor] = None
+        self.semaphore: Optional[asyncio.Semaphore] = None
+
+        # Counters for the stats endpoint
+        self.completed = 0
+        self.waiting = 0
+        self.running = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    def start(self):
+        if self.mode == "process":
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def _run(self, func, *args):
+        if self.executor is None:
+            self.start()
+        queued = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        started = time.perf_counter()
+        wait = started - queued
+        self.total_wait_seconds += wait
+        self.max_wait_seconds = max(self.max_wait_seconds, wait)
+        self.running += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self.total_run_seconds += time.perf_counter() - started
+            self.semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "max_concurrency": self.max_concurrency,
+            "running": self.running,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "avg_wait_seconds": self.total_wait_seconds / self.completed if self.completed else None,
+            "max_wait_seconds": self.max_wait_seconds,
+            "avg_run_seconds": self.total_run_seconds / self.completed if self.completed else None,
+        }
@@ -0,0 +1,338 @@
+# ==================== IMPORTS ==================== #
+
+import asyncio
+import math
+import time
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Iterator, Optional
+
+from dietary import split_tags
+from models import Event, parse_timestamp
+
+
+# ==================== HELPER FUNCTION ==================== #
+def _matches_diet(event: Event, dietary_tags: Optional[list[str]]) -> bool:
+    """
+    Same test as the database: at least one food carries every requested tag
+    """
+    foods = event.foods or []
+    if dietary_tags:
+        return any(all(tag in split_tags(food.dietary_tags) for tag in dietary_tags) for food in foods)
+    return True
+
+
+# ==================== TIME INDEX ==================== #
+class EventTimeIndex:
+    """
+    Event ids kept sorted by (start_time, event_id) and by (last_res_time, event_id)
+    A time window is two bisects plus a walk over the k events inside it, already in order
+    """
+
+    COLUMNS = ("start_time", "last_res_time")
+
+    def __init__(self, times: Optional[dict[int, tuple[datetime, datetime]]] = None):
+        self.times: dict[int, tuple[datetime, datetime]] = dict(times or {})
+        self.keys = {
+            "start_time": sorted((start, event_id) for event_id, (start, _) in self.times.items()),
+            "last_res_time": sorted((end, event_id) for event_id, (_, end) in self.times.items()),
+        }
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def add(self, event_id: int, start: datetime, end: datetime):
+        self.remove(event_id)
+        self.times[event_id] = (start, end)
+        insort(self.keys["start_time"], (start, event_id))
+        insort(self.keys["last_res_time"], (end, event_id))
+
+    def remove(self, event_id: int):
+        times = self.times.pop(event_id, None)
+        if times is None:
+            return
+        for column, value in zip(self.COLUMNS, times):
+            keys = self.keys[column]
+            del keys[bisect_left(keys, (value, event_id))]
+
+    def _bounds(self, column: str, low: Optional[datetime], high: Optional[datetime]) -> tuple[int, int]:
+        keys = self.keys[column]
+        first = bisect_left(keys, (low, -math.inf)) if low is not None else 0
+        last = bisect_right(keys, (high, math.inf)) if high is not None else len(keys)
+        return first, max(first, last)
+
+    def window(
+        self,
+        ranges: dict[str, tuple[Optional[datetime], Optional[datetime]]],
+        order_by: str,
+        descending: bool,
+        after: Optional[tuple[datetime, int]] = None,
+    ) -> Iterator[int]:
+        """
+        Ids of the events inside every (low, high) range of ranges (inclusive, None is open), sorted by order_by
+        Walks the index of order_by when its range is the narrower one, otherwise collects from the other index and sorts
+        after skips up to and including that (order_by value, event_id) key
+        """
+        other = "last_res_time" if order_by == "start_time" else "start_time"
+        position = self.COLUMNS.index(order_by)
+        other_position = 1 - position
+        first, last = self._bounds(order_by, *ranges.get(order_by, (None, None)))
+        other_low, other_high = ranges.get(other, (None, None))
+        other_first, other_last = self._bounds(other, other_low, other_high)
+
+        if last - first <= other_last - other_first:
+            keys = self.keys[order_by]
+            if after is not None:
+                if descending:
+                    last = min(last, bisect_left(keys, after))
+                else:
+                    first = max(first, bisect_right(keys, after))
+            indexes = range(last - 1, first - 1, -1) if descending else range(first, last)
+            for i in indexes:
+                event_id = keys[i][1]
+                value = self.times[event_id][other_position]
+                if (other_low is None or value >= other_low) and (other_high is None or value <= other_high):
+                    yield event_id
+            return
+
+        low, high = ranges.get(order_by, (None, None))
+        selected = []
+        for _, event_id in self.keys[other][other_first:other_last]:
+            key = (self.times[event_id][position], event_id)
+            if (low is not None and key[0] < low) or (high is not None and key[0] > high):
+                continue
+            if after is not None and (key <= after if not descending else key >= after):
+                continue
+            selected.append(key)
+        selected.sort(reverse=descending)
+        for _, event_id in selected:
+            yield event_id
+
+
+# ==================== SNAPSHOT ==================== #
+class ActiveEventsSnapshot:
+    """
+    In-process copy of the events (with foods) around now: every event that ended at most lookback seconds ago
+    or starts within the next horizon seconds
+    Loaded at startup, kept current by the write routes and reloaded every refresh_interval seconds to catch
+    anything the incremental updates missed (other workers, edits made straight in the database)
+    It only answers time windows that fall inside the last load, callers fall back to the database otherwise
+    """
+
+    def __init__(
+        self,
+        load_window: Callable[[datetime, datetime], Awaitable[list[dict]]],
+        load_event: Callable[[int], Awaitable[Optional[dict]]],
+        refresh_interval: float = 60.0,
+        horizon: float = 7200.0,
+        lookback: float = 7200.0,
+    ):
+        self.load_window = load_window
+        self.load_event = load_event
+        self.refresh_interval = refresh_interval
+        # Must outlast a few missed refreshes, events starting inside it are already loaded
+        self.horizon = timedelta(seconds=max(horizon, 2 * refresh_interval))
+        self.lookback = timedelta(seconds=lookback)
+
+        self._events: dict[int, Event] = {}
+        self._index = EventTimeIndex()
+        self._touched: Optional[set[int]] = None
+        self._task: Optional[asyncio.Task] = None
+        self.loaded_at: Optional[float] = None
+        # Events with last_res_time >= covered_from and start_time <= covered_to are all loaded
+        self.covered_from: Optional[datetime] = None
+        self.covered_to: Optional[datetime] = None
+
+        # Counters for the stats endpoint
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.last_refresh_seconds = 0.0
+        self.last_drift = 0
+        self.total_drift = 0
+        self.incremental_updates = 0
+        self.served = 0
+        self.fallbacks = 0
+
+    # ----- lifecycle ----- #
+    async def start(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            # Reads fall back to the database until a reload succeeds
+            print(f"[snapshot] initial load failed: {e}")
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"[snapshot] refresh failed: {e}")
+
+    async def refresh(self):
+        """
+        Reload the whole window from the database (also the forced refresh hook)
+        Events written while the load was running keep their newer in-memory state
+        """
+        started = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        self._touched = set()
+        try:
+            rows = await self.load_window(now - self.lookback, now + self.horizon)
+        except Exception:
+            self.refresh_errors += 1
+            raise
+        else:
+            events = {row["event_id"]: Event.from_row(row) for row in rows}
+            for event_id in self._touched:
+                if event_id in self._events:
+                    events[event_id] = self._events[event_id]
+                else:
+                    events.pop(event_id, None)
+
+            # How far the incremental updates had drifted from the database
+            if self.loaded_at is not None:
+                drift = sum(1 for event_id, event in events.items() if self._events.get(event_id) != event)
+                drift += sum(1 for event_id in self._events if event_id not in events)
+                self.last_drift = drift
+                self.total_drift += drift
+
+            self._events = events
+            self._index = EventTimeIndex({event_id: (event.start_time, event.last_res_time) for event_id, event in events.items()})
+            self.covered_from = now - self.lookback
+            self.covered_to = now + self.horizon
+            self.loaded_at = time.monotonic()
+            self.refreshes += 1
+            self.last_refresh_seconds = time.perf_counter() - started
+        finally:
+            self._touched = None
+
+    # ----- incremental updates ----- #
+    def _in_window(self, start: datetime, end: datetime) -> bool:
+        return self.covered_from is not None and end >= self.covered_from and start <= self.covered_to
+
+    def _touch(self, event_id: int):
+        self.incremental_updates += 1
+        if self._touched is not None:
+            self._touched.add(event_id)
+
+    def put_event(self, event: Event):
+        """
+        Store the current state of an event (with foods), or drop it if it is outside the window
+        """
+        event_id = event.event_id
+        self._touch(event_id)
+        if self._in_window(event.start_time, event.last_res_time):
+            self._events[event_id] = event
+            self._index.add(event_id, event.start_time, event.last_res_time)
+        else:
+            self._events.pop(event_id, None)
+            self._index.remove(event_id)
+
+    def remove_event(self, event_id: int):
+        self._touch(event_id)
+        self._events.pop(event_id, None)
+        self._index.remove(event_id)
+
+    async def refresh_event(self, event_id: int) -> Optional[Event]:
+        """
+        Reload one event after a write, returns it (None once deleted)
+        """
+        row = await self.load_event(event_id)
+        if row is None:
+            self.remove_event(event_id)
+            return None
+        event = Event.from_row(row)
+        self.put_event(event)
+        return event
+
+    def set_quantity(self, event_id: int, food_id: int, quantity: int):
+        """
+        A reservation changed a food's remaining quantity, a sold out food is left out like the database reads do
+        """
+        event = self._events.get(event_id)
+        if event is None:
+            return
+        self._touch(event_id)
+        foods = []
+        for food in event.foods or []:
+            if food.food_id == food_id:
+                if quantity <= 0:
+                    continue
+                food = replace(food, quantity=quantity)
+            foods.append(food)
+        self._events[event_id] = replace(event, foods=foods)
+
+    # ----- reads ----- #
+    def covers(self, bounds: dict) -> bool:
+        """
+        True if every event inside the start_from / start_to / end_from / end_to ranges of bounds was part of the last load
+        An event never ends before it starts, so a start bound also bounds last_res_time and the other way round
+        """
+        if self.covered_from is None:
+            return False
+        earliest_end = bounds.get("end_from") or bounds.get("start_from")
+        latest_start = bounds.get("start_to") or bounds.get("end_to")
+        if earliest_end is None or latest_start is None:
+            return False
+        return earliest_end >= self.covered_from and latest_start <= self.covered_to
+
+    def list_filtered_events(
+        self,
+        start_from: Optional[datetime] = None,
+        start_to: Optional[datetime] = None,
+        end_from: Optional[datetime] = None,
+        end_to: Optional[datetime] = None,
+        dietary_tags: Optional[list[str]] = None,
+        order_by: str = "start_time",
+        descending: bool = True,
+        limit: Optional[int] = None,
+        after: Optional[tuple] = None,
+    ) -> list[Event]:
+        """
+        Same events as db.list_filtered_events for a window covers() accepts, from memory
+        Paginated the same way: limit + 1 rows after the (order_by value, event_id) in after
+        """
+        if order_by not in EventTimeIndex.COLUMNS:
+            raise ValueError(f"Cannot order events by {order_by}")
+        self.served += 1
+        ranges = {"start_time": (start_from, start_to), "last_res_time": (end_from, end_to)}
+        after_key = (parse_timestamp(after[0]), after[1]) if after is not None else None
+
+        events = []
+        for event_id in self._index.window(ranges, order_by, descending, after_key):
+            event = self._events[event_id]
+            if not _matches_diet(event, dietary_tags):
+                continue
+            events.append(event)
+            if limit is not None and len(events) > limit:
+                break
+        return events
+
+    # ----- metrics ----- #
+    def stats(self) -> dict:
+        now = datetime.now(timezone.utc)
+        return {
+            "events": len(self._events),
+            "ready": self.covers({"start_to": now, "end_from": now}),
+            "age_seconds": time.monotonic() - self.loaded_at if self.loaded_at is not None else None,
+            "covered_from": self.covered_from.isoformat() if self.covered_from is not None else None,
+            "covered_to": self.covered_to.isoformat() if self.covered_to is not None else None,
+            "refresh_interval_seconds": self.refresh_interval,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "last_refresh_seconds": self.last_refresh_seconds,
+            "last_drift": self.last_drift,
+            "total_drift": self.total_drift,
+            "incremental_updates": self.incremental_updates,
+            "served": self.served,
+            "fallbacks": self.fallbacks,
+        }
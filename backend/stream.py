@@ -0,0 +1,166 @@
+# ==================== IMPORTS ==================== #
+
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Optional
+
+
+# ==================== SUBSCRIBER ==================== #
+class Subscriber:
+    """
+    One open stream, with its own bounded queue of encoded messages
+    """
+
+    def __init__(self, topic: str, max_pending: int):
+        self.topic = topic
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self.overflowed = False
+        self.closed = False
+        self.connected_at = time.monotonic()
+
+
+# ==================== BROKER ==================== #
+class EventBroker:
+    """
+    Fan out of inventory changes to server-sent event streams
+    Topics are "feed" (every event) and "event:<id>" (one event), the write routes publish to them
+    A client that stops reading gets a single "resync" message instead of an unbounded backlog,
+    it should refetch the current state and keep listening
+    """
+
+    def __init__(self, max_connections: int = 5000, max_pending: int = 100, heartbeat: float = 15.0, retry_ms: int = 5000):
+        self.max_connections = max_connections
+        self.max_pending = max_pending
+        self.heartbeat = heartbeat
+        self.retry_ms = retry_ms
+        self._topics: dict[str, set[Subscriber]] = {}
+        self._connections = 0
+        self._sequence = 0
+
+        # Counters for the stats endpoint
+        self.published = 0
+        self.delivered = 0
+        self.overflows = 0
+        self.rejected = 0
+
+    # ----- subscribers ----- #
+    def subscribe(self, topic: str) -> Optional[Subscriber]:
+        """
+        Register a stream on topic, None once max_connections streams are open
+        """
+        if self._connections >= self.max_connections:
+            self.rejected += 1
+            return None
+        subscriber = Subscriber(topic, self.max_pending)
+        self._topics.setdefault(topic, set()).add(subscriber)
+        self._connections += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscribers = self._topics.get(subscriber.topic)
+        if subscribers is None or subscriber not in subscribers:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self._topics[subscriber.topic]
+        self._connections -= 1
+
+    def watching(self, *topics: str) -> bool:
+        """
+        True if a stream is open on any of topics, lets producers skip building unread messages
+        """
+        return any(topic in self._topics for topic in topics)
+
+    def close_topic(self, topic: str):
+        """
+        End the streams of topic once they have sent what is already queued
+        """
+        for subscriber in self._topics.get(topic, ()):
+            subscriber.closed = True
+            self._wake(subscriber)
+
+    def close(self):
+        """
+        End every open stream, used on shutdown
+        """
+        for topic in list(self._topics):
+            self.close_topic(topic)
+
+    # ----- producers ----- #
+    def publish(self, message_type: str, data: dict, *topics: str):
+        """
+        Queue a message for every stream on topics without waiting on any of them
+        """
+        self._sequence += 1
+        self.published += 1
+        encoded = self._encode(message_type, data, self._sequence)
+        for topic in topics:
+            for subscriber in self._topics.get(topic, ()):
+                if subscriber.overflowed:
+                    continue
+                try:
+                    subscriber.queue.put_nowait(encoded)
+                except asyncio.QueueFull:
+                    # Too slow to keep up, drop its backlog and tell it to resync
+                    subscriber.overflowed = True
+                    self.overflows += 1
+                    self._drain(subscriber)
+                    self._wake(subscriber)
+
+    def _encode(self, message_type: str, data: dict, sequence: int) -> str:
+        payload = json.dumps(data, separators=(",", ":"), default=str)
+        return f"id: {sequence}\nevent: {message_type}\ndata: {payload}\n\n"
+
+    def _drain(self, subscriber: Subscriber):
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+
+    def _wake(self, subscriber: Subscriber):
+        # An empty string only wakes the stream up, it re-checks its flags
+        try:
+            subscriber.queue.put_nowait("")
+        except asyncio.QueueFull:
+            pass
+
+    # ----- streams ----- #
+    async def stream(self, subscriber: Subscriber, is_disconnected) -> AsyncIterator[str]:
+        """
+        Body of one text/event-stream response
+        Sends a comment as heartbeat when nothing happened for a while, so proxies keep the connection open
+        """
+        try:
+            yield f"retry: {self.retry_ms}\n\n"
+            while not (subscriber.closed and subscriber.queue.empty()):
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    if await is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+
+                if subscriber.overflowed:
+                    self._drain(subscriber)
+                    subscriber.overflowed = False
+                    self._sequence += 1
+                    yield self._encode("resync", {"topic": subscriber.topic}, self._sequence)
+                    continue
+                if message:
+                    self.delivered += 1
+                    yield message
+        finally:
+            self.unsubscribe(subscriber)
+
+    # ----- metrics ----- #
+    def stats(self) -> dict:
+        return {
+            "connections": self._connections,
+            "max_connections": self.max_connections,
+            "topics": len(self._topics),
+            "feed_connections": len(self._topics.get("feed", ())),
+            "published": self.published,
+            "delivered": self.delivered,
+            "overflows": self.overflows,
+            "rejected": self.rejected,
+        }
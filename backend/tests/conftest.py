@@ -0,0 +1,79 @@
+"""
+The app of main.py on benchmarks/fake_supabase.py (the supabase fallback path of db.py), loaded with the
+small synthetic data set the same way the load test does. Run from the backend folder, needs pytest and httpx.
+"""
+
+# ==================== IMPORTS ==================== #
+
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.join(BACKEND, "benchmarks"))
+from fake_supabase import FakeSupabase
+from load_test import load_app
+from synthetic_data import SCALES, generate
+
+
+# ==================== FIXTURES ==================== #
+@pytest.fixture(scope="session")
+def tables():
+    return generate(SCALES["small"], seed=1)
+
+@pytest.fixture(scope="session")
+def fake(tables):
+    return FakeSupabase(tables)
+
+@pytest.fixture(scope="session")
+def main(fake):
+    return load_app(fake, None)
+
+@pytest.fixture(scope="session")
+def client(main):
+    from fastapi.testclient import TestClient
+
+    with TestClient(main.app) as client:
+        yield client
+
+@pytest.fixture
+def auth(main):
+    def headers(user_id: int) -> dict:
+        return {"Authorization": f"Bearer {main.create_access_token({'sub': str(user_id)})}"}
+    return headers
+
+@pytest.fixture(scope="session")
+def guest_id(tables):
+    """
+    A regular user who hosts none of the events
+    """
+    host_ids = {event["creator_id"] for event in tables["events"]}
+    return next(user["user_id"] for user in tables["users"] if user["user_id"] not in host_ids)
+
+@pytest.fixture
+def new_event(fake, tables):
+    """
+    Add a running event (hosted by the first event's host) with one food per quantity straight to the fake, returns (event, foods)
+    Rows are the fake's own, so they show the database's state after a request
+    """
+    def create(*quantities: int) -> tuple[dict, list[dict]]:
+        now = datetime.now(timezone.utc)
+        event = fake.tables["events"].insert({
+            "event_name": "Test event",
+            "description": "",
+            "creator_id": tables["events"][0]["creator_id"],
+            "start_time": now - timedelta(minutes=30),
+            "last_res_time": now + timedelta(minutes=90),
+            "location_lat": 42.35,
+            "location_lng": -71.1,
+            "location_address": "1 Commonwealth Ave, Boston, MA",
+        })
+        foods = [
+            fake.tables["foods"].insert({"food_name": f"Tray {i}", "quantity": quantity, "event_id": event["event_id"]})
+            for i, quantity in enumerate(quantities, start=1)
+        ]
+        return event, foods
+    return create
@@ -0,0 +1,35 @@
+"""
+The rollups behind /host/analytics lose every reservation that goes away, not only the ones cancelled through an edit
+"""
+
+# ==================== IMPORTS ==================== #
+
+from datetime import datetime, timezone
+
+
+# ==================== ROLLUPS ==================== #
+def test_reservations_cascading_with_their_food_or_user_are_taken_out(client, auth, fake, guest_id, new_event):
+    event, (deleted, kept) = new_event(4, 4)
+    # A user of its own, deleting one of the shared ones would change the data the other tests read
+    user = fake.tables["users"].insert({
+        "email": "leaving@example.edu", "password": "", "role": "regular_user", "name": "Leaving user", "optin": False,
+    })
+    for user_id, food, quantity in ((guest_id, deleted, 1), (user["user_id"], kept, 3)):
+        response = client.post("/createreservation", headers=auth(user_id), json={
+            "food_id": food["food_id"],
+            "food_name": food["food_name"],
+            "event_id": event["event_id"],
+            "quantity": quantity,
+            "pickup_time": datetime.now(timezone.utc).isoformat(),
+            "note": "",
+        })
+        assert response.status_code == 200, response.text
+    stats = fake.tables["event_stats"].rows[event["event_id"]]
+    assert (stats["reservations"], stats["quantity_claimed"], stats["attendees"]) == (2, 4, 2)
+
+    fake.table("foods").delete().eq("food_id", deleted["food_id"]).execute()
+    assert (stats["reservations"], stats["quantity_claimed"], stats["attendees"]) == (1, 3, 1)
+
+    fake.table("users").delete().eq("user_id", user["user_id"]).execute()
+    assert (stats["reservations"], stats["quantity_claimed"], stats["attendees"]) == (0, 0, 0)
+    assert fake.tables["event_attendees"].lookup("event_id", [event["event_id"]]) == []
@@ -0,0 +1,39 @@
+"""
+Dietary filters keep the events with at least one food in stock carrying every requested tag,
+one containment lookup on the foods' tag array for vocabulary and free text tags alike
+"""
+
+
+# ==================== HELPER FUNCTION ==================== #
+def filtered_event_ids(client, headers: dict, dietary_restrictions: str) -> set[int]:
+    """
+    Every event /events/filtered returns for the restrictions, following the cursor to the last page
+    """
+    event_ids = set()
+    params = {"dietary_restrictions": dietary_restrictions, "fields": "event_id", "limit": 100}
+    while True:
+        response = client.get("/events/filtered", headers=headers, params=params)
+        assert response.status_code == 200, response.text
+        event_ids.update(event["event_id"] for event in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return event_ids
+        params["cursor"] = cursor
+
+
+# ==================== FILTERS ==================== #
+def test_only_foods_carrying_every_tag_match(client, auth, fake, guest_id, new_event):
+    both, (food,) = new_event(3)
+    one_food_each, (vegan, halal) = new_event(3, 3)
+    sold_out, (gone,) = new_event(0)
+    for row, tags in ((food, "vegan,halal,spicy"), (vegan, "vegan,spicy"), (halal, "halal,spicy"), (gone, "vegan,halal,spicy")):
+        fake.tables["foods"].update(row, {"dietary_tags": tags})
+
+    known = filtered_event_ids(client, auth(guest_id), "Vegan, halal")
+    free_text = filtered_event_ids(client, auth(guest_id), "halal,spicy")
+
+    assert both["event_id"] in known and both["event_id"] in free_text
+    # The tags have to be on the same food, and that food has to be in stock
+    assert one_food_each["event_id"] not in known
+    assert one_food_each["event_id"] in free_text
+    assert sold_out["event_id"] not in known | free_text
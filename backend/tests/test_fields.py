@@ -0,0 +1,35 @@
+"""
+fields= only ever selects columns from the allowlists in models.py, anything else is a 400 before the database is asked
+"""
+
+# ==================== IMPORTS ==================== #
+
+import pytest
+
+
+# ==================== ALLOWLISTS ==================== #
+@pytest.mark.parametrize("url, params", [
+    ("/events/all", {"fields": "event_id,password"}),
+    ("/events/all", {"fields": "event_id,foods.secret"}),
+    ("/events/filtered", {"fields": "event_name;drop table events"}),
+    ("/events/nearby", {"lat": 42.35, "lng": -71.1, "fields": "distance_m"}),
+    ("/user/reservations", {"fields": "res_id,user_id"}),
+    ("/user/reservations", {"fields": "events.event_name"}),
+    ("/get-food/1", {"fields": "food_id,creator_id"}),
+    ("/get-food/1", {"fields": " , "}),
+])
+def test_fields_outside_the_allowlist_are_rejected(main, client, auth, guest_id, url, params):
+    with main.query_budget.expect(f"GET {url} {params}", max_calls=1) as queries:
+        response = client.get(url, headers=auth(guest_id), params=params)
+
+    assert response.status_code == 400, response.text
+    # At most the user lookup, nothing was selected with the bad fields
+    assert queries.calls <= 1
+
+def test_projection_returns_only_the_requested_fields(client, auth, guest_id):
+    response = client.get("/events/all", headers=auth(guest_id), params={"fields": "event_id,date,foods.quantity", "limit": 5})
+
+    assert response.status_code == 200, response.text
+    events = response.json()
+    assert events and all(set(event) == {"event_id", "date", "foods"} for event in events)
+    assert all(set(food) == {"quantity"} for event in events for food in event["foods"])
@@ -0,0 +1,18 @@
+"""
+/metrics labels requests with the route template the router matched, and "unmatched" when there was none
+"""
+
+
+# ==================== ROUTES ==================== #
+def test_requests_are_labelled_with_their_route(main, client, new_event):
+    event, _ = new_event(2)
+    client.get(f"/get-food/{event['event_id']}")
+    client.get("/no-such-route")
+
+    body = client.get("/metrics").text
+
+    assert 'http_requests_total{method="GET",route="/get-food/{event_id}",status="200"}' in body
+    assert 'http_requests_total{method="GET",route="unmatched",status="404"}' in body
+    assert f"/get-food/{event['event_id']}" not in body
+    # Only the /metrics request itself is still being served
+    assert 'http_requests_in_flight{method="GET"} 1' in body
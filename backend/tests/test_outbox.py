@@ -0,0 +1,43 @@
+"""
+Every email the outbox can't send ends up in the dead letters, also the ones still waiting for a retry at shutdown
+"""
+
+# ==================== IMPORTS ==================== #
+
+import asyncio
+
+from outbox import EmailOutbox
+
+
+# ==================== TRANSPORT ==================== #
+class FailingTransport:
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send(self, message):
+        raise ConnectionError("smtp down")
+
+
+# ==================== SHUTDOWN ==================== #
+def test_stop_dead_letters_pending_retries():
+    async def run() -> EmailOutbox:
+        # The backoff outlasts the test, so the message is still waiting for its retry at stop()
+        outbox = EmailOutbox(FailingTransport, workers=1, base_delay=60.0, max_delay=60.0)
+        await outbox.start()
+        assert outbox.enqueue("guest@example.edu", "Subject", "Body")
+        while not outbox._retry_handles:
+            await asyncio.sleep(0.01)
+        await outbox.stop(timeout=1.0)
+        return outbox
+
+    outbox = asyncio.run(run())
+
+    (message,) = outbox.dead_letters
+    assert message.recipient == "guest@example.edu"
+    assert message.attempts == 1
+    assert message.last_error == "outbox shut down before retry, last error: smtp down"
+    stats = outbox.stats()
+    assert (stats["retried"], stats["dead_lettered"], stats["waiting_retries"]) == (1, 1, 0)
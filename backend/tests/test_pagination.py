@@ -0,0 +1,81 @@
+"""
+Keyset pagination of the listings: following X-Next-Cursor walks every row once, in order, and a cursor
+that was not handed out for that listing is a 400
+"""
+
+# ==================== IMPORTS ==================== #
+
+from pagination import encode_cursor
+
+
+# ==================== CURSORS ==================== #
+def test_cursor_round_trip_has_no_duplicates_or_gaps(client, auth, fake, guest_id):
+    # Events sharing a start_time, so pages have to break ties on event_id
+    template = dict(next(iter(fake.tables["events"].rows.values())))
+    for i in range(3):
+        fake.tables["events"].insert({**template, "event_id": None, "event_name": f"Tie {i}"})
+    expected = [
+        event["event_id"]
+        for event in sorted(fake.tables["events"].rows.values(), key=lambda event: (event["start_time"], event["event_id"]), reverse=True)
+    ]
+
+    seen = []
+    cursor = None
+    for _ in range(len(expected)):
+        params = {"limit": 45, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/events/all", headers=auth(guest_id), params=params)
+        assert response.status_code == 200, response.text
+        seen += [event["event_id"] for event in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert seen == expected
+
+def test_malformed_cursor_is_rejected(client, auth, guest_id):
+    for cursor in (
+        "not-a-cursor",
+        encode_cursor("/events/all", "start_time", True, "yesterday", 1),
+        encode_cursor("/events/all", "last_res_time", True, "2026-10-17T12:00:00+00:00", 1),
+        encode_cursor("/events/all", "start_time", False, "2026-10-17T12:00:00+00:00", 1),
+        encode_cursor("/events", "start_time", True, "2026-10-17T12:00:00+00:00", 1),
+    ):
+        response = client.get("/events/all", headers=auth(guest_id), params={"cursor": cursor})
+        assert response.status_code == 400, cursor
+        assert response.json()["detail"] == "Invalid cursor"
+
+def test_cursor_of_another_time_filter_is_rejected(client, auth, guest_id):
+    # fresh_food and ending_soon both sort on last_res_time, in opposite directions
+    fresh_food = encode_cursor("/events/filtered/fresh_food", "last_res_time", True, "2026-10-17T12:00:00+00:00", 1)
+    ending_soon = encode_cursor("/events/filtered/ending_soon", "last_res_time", False, "2026-10-17T12:00:00+00:00", 1)
+
+    rejected = client.get("/events/filtered", headers=auth(guest_id), params={"time_filter": "ending_soon", "cursor": fresh_food})
+    accepted = client.get("/events/filtered", headers=auth(guest_id), params={"time_filter": "ending_soon", "cursor": ending_soon})
+
+    assert rejected.status_code == 400
+    assert rejected.json()["detail"] == "Invalid cursor"
+    assert accepted.status_code == 200, accepted.text
+
+
+# ==================== RESPONSE SHAPE ==================== #
+def test_host_events_pages_carry_the_cursor_in_the_header(client, auth, fake, tables, guest_id):
+    host_id = tables["events"][0]["creator_id"]
+    expected = sorted(event["event_id"] for event in fake.tables["events"].rows.values() if event["creator_id"] == host_id)
+
+    seen = []
+    cursor = None
+    for _ in range(len(expected)):
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/host/events", headers=auth(host_id), params=params)
+        assert response.status_code == 200, response.text
+        assert set(response.json()) == {"active_events", "archived_events"}
+        seen += [event["event_id"] for key in ("active_events", "archived_events") for event in response.json()[key]]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert sorted(seen) == expected
+    # No events at all is the same shape, without a cursor
+    empty = client.get("/host/events", headers=auth(guest_id))
+    assert empty.json() == {"active_events": [], "archived_events": []}
+    assert "X-Next-Cursor" not in empty.headers
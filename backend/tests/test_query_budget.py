@@ -0,0 +1,73 @@
+"""
+Database round trips of the write routes, counted with query_budget.expect so a regression
+(an extra query, or one issued in a loop) fails here instead of showing up in production
+"""
+
+# ==================== IMPORTS ==================== #
+
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from budget import QueryBudgetExceeded
+
+
+# ==================== ROUTES ==================== #
+def test_create_reservation_within_budget(main, client, auth, guest_id, new_event):
+    _, (food,) = new_event(2)
+
+    # The user, the reserve_food call and the host's notification email
+    with main.query_budget.expect("POST /createreservation", max_calls=3) as queries:
+        response = client.post("/createreservation", headers=auth(guest_id), json={
+            "food_id": food["food_id"],
+            "food_name": food["food_name"],
+            "event_id": food["event_id"],
+            "quantity": 1,
+            "pickup_time": datetime.now(timezone.utc).isoformat(),
+            "note": "",
+        })
+
+    assert response.status_code == 200, response.text
+    assert 2 <= queries.calls <= 3
+    assert queries.shapes[("rpc", "reserve_food", "reserve_food")] == 1
+
+def test_update_event_within_budget(main, client, auth, new_event):
+    event, foods = new_event(3, 5, 8)
+    body = {
+        "eventName": event["event_name"],
+        "eventDescription": (event["description"] or "") + " Bring a bag!",
+        "start": event["start_time"],
+        "end": event["last_res_time"],
+        "foods": [
+            {"food_id": food["food_id"], "food_name": food["food_name"], "quantity": food["quantity"] + 1, "event_id": event["event_id"]}
+            for food in foods
+        ],
+        "reservations": [],
+        "location_lat": event["location_lat"],
+        "location_lng": event["location_lng"],
+        "location_address": event["location_address"],
+    }
+
+    # The user, the event state, one apply_event_update for every change, and the snapshot reload,
+    # whatever the number of foods restocked
+    with main.query_budget.expect("POST /events/update/{event_id}", max_calls=4) as queries:
+        response = client.post(f"/events/update/{event['event_id']}", headers=auth(event["creator_id"]), json=body)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["message"] == "Success"
+    assert queries.shapes[("rpc", "apply_event_update", "apply_event_update")] == 1
+
+
+# ==================== REPEATED QUERIES ==================== #
+def test_repeated_query_shape_raises(main, tables):
+    user_ids = [user["user_id"] for user in tables["users"][:main.query_budget.repeat_threshold]]
+
+    async def load_users_one_by_one():
+        for user_id in user_ids:
+            await main.db.get_user(user_id)
+
+    # Well under max_calls, but the same select once per user is an N+1
+    with pytest.raises(QueryBudgetExceeded, match="likely N\\+1: users.select"):
+        with main.query_budget.expect("users one by one", max_calls=len(user_ids) + 10):
+            asyncio.run(load_users_one_by_one())
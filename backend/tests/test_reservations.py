@@ -0,0 +1,96 @@
+"""
+/createreservation and /createreservation/batch take stock and record the reservations in one database call:
+never more than is left (for a batch, nothing at all if one food is short) and a reservation that empties a food is kept
+"""
+
+# ==================== IMPORTS ==================== #
+
+from datetime import datetime, timezone
+
+
+# ==================== HELPER FUNCTION ==================== #
+def reserve(client, headers: dict, food: dict, quantity: int):
+    return client.post("/createreservation", headers=headers, json={
+        "food_id": food["food_id"],
+        "food_name": food["food_name"],
+        "event_id": food["event_id"],
+        "quantity": quantity,
+        "pickup_time": datetime.now(timezone.utc).isoformat(),
+        "note": "",
+    })
+
+def reserve_batch(client, headers: dict, event: dict, items: list[tuple[dict, int]]):
+    return client.post("/createreservation/batch", headers=headers, json={
+        "event_id": event["event_id"],
+        "items": [{"food_id": food["food_id"], "quantity": quantity} for food, quantity in items],
+        "pickup_time": datetime.now(timezone.utc).isoformat(),
+    })
+
+def user_reservations(fake, user_id: int, food_id: int) -> list[dict]:
+    return [row for row in fake.tables["reservations"].rows.values() if row["user_id"] == user_id and row["food_id"] == food_id]
+
+
+# ==================== SINGLE FOOD ==================== #
+def test_reserving_the_last_unit_keeps_the_reservation(client, auth, fake, guest_id, new_event):
+    event, (food,) = new_event(1)
+
+    response = reserve(client, auth(guest_id), food, 1)
+
+    assert response.status_code == 200, response.text
+    # The food stays at zero for its reservation, only the listings leave it out
+    assert fake.tables["foods"].rows[food["food_id"]]["quantity"] == 0
+    assert [row["quantity"] for row in user_reservations(fake, guest_id, food["food_id"])] == [1]
+    assert client.get(f"/get-food/{event['event_id']}").status_code == 404
+
+    # Holding the last portion still counts as attending
+    rating = client.post("/rate-event", headers=auth(guest_id), json={"event_id": event["event_id"], "rating": 5})
+    assert rating.status_code == 200, rating.text
+
+def test_only_the_host_still_sees_a_sold_out_food(client, auth, guest_id, new_event):
+    event, (sold_out, left) = new_event(1, 2)
+    assert reserve(client, auth(guest_id), sold_out, 1).status_code == 200
+
+    hosted = client.get(f"/events/{event['event_id']}", headers=auth(event["creator_id"]))
+    viewed = client.get(f"/events/{event['event_id']}", headers=auth(guest_id))
+
+    # The edit page reads its foods from here, a sold out one has to be there to be restocked
+    assert hosted.status_code == 200, hosted.text
+    assert [(food["food_id"], food["quantity"]) for food in hosted.json()["food"]] == [(sold_out["food_id"], 0), (left["food_id"], 2)]
+    assert len(hosted.json()["reservations"]) == 1
+    assert viewed.status_code == 200, viewed.text
+    assert [food["food_id"] for food in viewed.json()["food"]] == [left["food_id"]]
+
+def test_over_reserving_is_rejected(client, auth, fake, guest_id, new_event):
+    _, (food,) = new_event(2)
+
+    response = reserve(client, auth(guest_id), food, 3)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Not enough food available"
+    assert food["quantity"] == 2
+    assert user_reservations(fake, guest_id, food["food_id"]) == []
+
+
+# ==================== BATCH ==================== #
+def test_batch_emptying_foods_keeps_every_reservation(client, auth, fake, guest_id, new_event):
+    event, (first, second) = new_event(1, 3)
+
+    response = reserve_batch(client, auth(guest_id), event, [(first, 1), (second, 3)])
+
+    assert response.status_code == 200, response.text
+    reserved = {row["food_id"]: row["quantity"] for row in response.json()["reservations"]}
+    assert reserved == {first["food_id"]: 1, second["food_id"]: 3}
+    for food in (first, second):
+        assert fake.tables["foods"].rows[food["food_id"]]["quantity"] == 0
+        assert len(user_reservations(fake, guest_id, food["food_id"])) == 1
+
+def test_batch_with_one_short_line_reserves_nothing(client, auth, fake, guest_id, new_event):
+    event, (plenty, scarce) = new_event(5, 1)
+
+    response = reserve_batch(client, auth(guest_id), event, [(plenty, 2), (scarce, 2)])
+
+    assert response.status_code == 400
+    assert response.json()["detail"]["short"] == [{"food_id": scarce["food_id"], "requested": 2, "available": 1}]
+    assert (plenty["quantity"], scarce["quantity"]) == (5, 1)
+    assert user_reservations(fake, guest_id, plenty["food_id"]) == []
+    assert user_reservations(fake, guest_id, scarce["food_id"]) == []
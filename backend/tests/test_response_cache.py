@@ -0,0 +1,44 @@
+"""
+Cached event reads answer If-None-Match with a 304 while they are current, and a write moves them to a new ETag
+"""
+
+# ==================== IMPORTS ==================== #
+
+from datetime import datetime, timezone
+
+
+# ==================== ETAGS ==================== #
+def test_matching_etag_is_not_modified(client, new_event):
+    event, _ = new_event(4)
+    url = f"/get-food/{event['event_id']}"
+
+    first = client.get(url)
+    etag = first.headers["ETag"]
+
+    assert first.status_code == 200
+    for header in (etag, f"W/{etag}", f'"stale", {etag}', "*"):
+        response = client.get(url, headers={"If-None-Match": header})
+        assert response.status_code == 304, header
+        assert response.headers["ETag"] == etag
+        assert response.content == b""
+
+def test_write_changes_the_etag(client, auth, guest_id, new_event):
+    event, (food,) = new_event(4)
+    url = f"/get-food/{event['event_id']}"
+    etag = client.get(url).headers["ETag"]
+
+    reserved = client.post("/createreservation", headers=auth(guest_id), json={
+        "food_id": food["food_id"],
+        "food_name": food["food_name"],
+        "event_id": event["event_id"],
+        "quantity": 1,
+        "pickup_time": datetime.now(timezone.utc).isoformat(),
+        "note": "",
+    })
+    assert reserved.status_code == 200, reserved.text
+
+    # The reservation dropped the cached body, the old tag no longer matches
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert [item["quantity"] for item in response.json()["foods"]] == [3]
@@ -0,0 +1,85 @@
+"""
+ActiveEventsSnapshot answers time windows like the database does: both ends of every range are inclusive,
+whichever of its two time indexes the window is walked on
+"""
+
+# ==================== IMPORTS ==================== #
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from snapshot import ActiveEventsSnapshot
+
+
+# ==================== FIXTURES ==================== #
+NOW = datetime.now(timezone.utc).replace(microsecond=0)
+TICK = timedelta(microseconds=1)
+
+def event_row(event_id: int, start: datetime, end: datetime) -> dict:
+    return {"event_id": event_id, "event_name": f"Event {event_id}", "start_time": start.isoformat(), "last_res_time": end.isoformat(), "foods": []}
+
+@pytest.fixture
+def snapshot():
+    """
+    A snapshot loaded with events starting or ending exactly on, or just next to, NOW - 30 minutes and NOW
+    """
+    low = NOW - timedelta(minutes=30)
+    rows = [
+        event_row(1, low - TICK, NOW + timedelta(hours=1)),  # starts just before the low bound
+        event_row(2, low, NOW + timedelta(hours=1)),  # starts on the low bound
+        event_row(3, NOW, NOW + timedelta(hours=1)),  # starts on the high bound
+        event_row(4, NOW + TICK, NOW + timedelta(hours=1)),  # starts just after the high bound
+        event_row(5, NOW - timedelta(hours=1), NOW - TICK),  # ended just before now
+        event_row(6, NOW - timedelta(hours=1), NOW),  # ends exactly now
+        event_row(7, NOW, NOW),  # starts and ends exactly now
+    ]
+
+    async def load_window(since: datetime, until: datetime) -> list[dict]:
+        return rows
+
+    async def load_event(event_id: int):
+        return None
+
+    snapshot = ActiveEventsSnapshot(load_window, load_event)
+    asyncio.run(snapshot.refresh())
+    return snapshot
+
+
+# ==================== WINDOWS ==================== #
+def ids(events) -> list[int]:
+    return [event.event_id for event in events]
+
+def test_start_bounds_are_inclusive(snapshot):
+    low = NOW - timedelta(minutes=30)
+
+    assert ids(snapshot.list_filtered_events(start_from=low, start_to=NOW, order_by="start_time", descending=True)) == [7, 3, 2]
+    assert ids(snapshot.list_filtered_events(start_from=low, start_to=NOW, order_by="start_time", descending=False)) == [2, 3, 7]
+    # Sorted by the other column, the narrower start_time range is collected and sorted instead of walked
+    assert ids(snapshot.list_filtered_events(start_from=low, start_to=NOW, order_by="last_res_time", descending=False)) == [7, 2, 3]
+
+def test_end_bounds_are_inclusive(snapshot):
+    # Ending soon: last_res_time in [NOW, NOW + 1h], soonest first
+    assert ids(snapshot.list_filtered_events(end_from=NOW, end_to=NOW + timedelta(hours=1), order_by="last_res_time", descending=False)) == [6, 7, 1, 2, 3, 4]
+    # Fresh food: ended in [NOW - 30 min, NOW], most recent first
+    assert ids(snapshot.list_filtered_events(end_from=NOW - timedelta(minutes=30), end_to=NOW, order_by="last_res_time", descending=True)) == [7, 6, 5]
+
+def test_running_now_includes_both_edges(snapshot):
+    # Started at or before NOW and still taking reservations at NOW, walked from either index
+    running = {"start_to": NOW, "end_from": NOW}
+
+    assert sorted(ids(snapshot.list_filtered_events(**running, order_by="start_time"))) == [1, 2, 3, 6, 7]
+    assert sorted(ids(snapshot.list_filtered_events(**running, order_by="last_res_time"))) == [1, 2, 3, 6, 7]
+
+def test_cursor_on_an_edge_skips_only_that_event(snapshot):
+    low = NOW - timedelta(minutes=30)
+    window = {"start_from": low, "start_to": NOW, "order_by": "start_time", "descending": True}
+
+    assert ids(snapshot.list_filtered_events(**window, after=(NOW.isoformat(), 7))) == [3, 2]
+    assert ids(snapshot.list_filtered_events(**window, after=(NOW.isoformat(), 3))) == [2]
+
+def test_covers_up_to_the_loaded_window(snapshot):
+    assert snapshot.covers({"end_from": snapshot.covered_from, "start_to": snapshot.covered_to})
+    assert not snapshot.covers({"end_from": snapshot.covered_from - TICK, "start_to": snapshot.covered_to})
+    assert not snapshot.covers({"end_from": snapshot.covered_from, "start_to": snapshot.covered_to + TICK})
@@ -0,0 +1,132 @@
+"""
+/events/update/{event_id} diffs the host's edit against the event's current state and applies only what changed
+"""
+
+# ==================== IMPORTS ==================== #
+
+from datetime import datetime, timezone
+
+import pytest
+
+
+# ==================== HELPER FUNCTION ==================== #
+def edit_body(fake, event: dict, quantities: dict[int, int], cancelled: tuple[int, ...] = ()) -> dict:
+    """
+    The edit form as the frontend sends it: the event as it is now, with the foods' quantities from quantities
+    and the reservations in cancelled set to zero
+    """
+    reservations = fake.tables["reservations"].lookup("event_id", [event["event_id"]])
+    foods = [food for food in fake.tables["foods"].rows.values() if food["event_id"] == event["event_id"]]
+    return {
+        "eventName": event["event_name"],
+        "eventDescription": event["description"],
+        "start": event["start_time"],
+        "end": event["last_res_time"],
+        "foods": [
+            {"food_id": food["food_id"], "food_name": food["food_name"], "quantity": quantities.get(food["food_id"], food["quantity"]), "event_id": event["event_id"]}
+            for food in foods
+        ],
+        "reservations": [{**reservation, "quantity": 0} for reservation in reservations if reservation["res_id"] in cancelled],
+        "location_lat": event["location_lat"],
+        "location_lng": event["location_lng"],
+        "location_address": event["location_address"],
+    }
+
+@pytest.fixture
+def apply_calls(main, monkeypatch):
+    """
+    Arguments of every db.apply_event_update call made while the test runs
+    """
+    calls = []
+    apply_event_update = main.db.apply_event_update
+
+    async def record(*args):
+        calls.append(args)
+        return await apply_event_update(*args)
+
+    monkeypatch.setattr(main.db, "apply_event_update", record)
+    return calls
+
+
+# ==================== ROUTES ==================== #
+def test_changing_one_food_writes_only_that_row(client, auth, fake, new_event, apply_calls):
+    event, (kept, changed, other) = new_event(4, 6, 8)
+
+    response = client.post(
+        f"/events/update/{event['event_id']}",
+        headers=auth(event["creator_id"]),
+        json=edit_body(fake, event, {changed["food_id"]: 10}),
+    )
+
+    assert response.status_code == 200, response.text
+    (_, event_changes, food_updates, cancellations), = apply_calls
+    assert event_changes == {}
+    assert food_updates == [{"food_id": changed["food_id"], "quantity": 10}]
+    assert cancellations == []
+
+    changes = response.json()["changes"]
+    assert changes["event_updated"] is False
+    assert changes["foods_updated"] == [changed["food_id"]]
+    assert (kept["quantity"], changed["quantity"], other["quantity"]) == (4, 10, 8)
+
+def test_unchanged_edit_writes_nothing(client, auth, fake, new_event, apply_calls):
+    event, _ = new_event(3, 5)
+
+    response = client.post(f"/events/update/{event['event_id']}", headers=auth(event["creator_id"]), json=edit_body(fake, event, {}))
+
+    assert response.status_code == 200, response.text
+    assert response.json() == {"message": "No changes", "changes": None}
+    assert apply_calls == []
+
+def test_zeroing_a_reserved_food_keeps_its_reservations(client, auth, fake, guest_id, new_event):
+    event, (food,) = new_event(5)
+    reserved = client.post("/createreservation", headers=auth(guest_id), json={
+        "food_id": food["food_id"],
+        "food_name": food["food_name"],
+        "event_id": event["event_id"],
+        "quantity": 2,
+        "pickup_time": datetime.now(timezone.utc).isoformat(),
+        "note": "",
+    })
+    assert reserved.status_code == 200, reserved.text
+
+    response = client.post(
+        f"/events/update/{event['event_id']}",
+        headers=auth(event["creator_id"]),
+        json=edit_body(fake, event, {food["food_id"]: 0}),
+    )
+
+    assert response.status_code == 200, response.text
+    assert response.json()["changes"]["foods_updated"] == [food["food_id"]]
+    # The food is kept at 0 like a sold out one, and the reservation made before the edit still holds
+    assert fake.tables["foods"].rows[food["food_id"]]["quantity"] == 0
+    held = [row for row in fake.tables["reservations"].lookup("food_id", [food["food_id"]]) if row["user_id"] == guest_id]
+    assert [row["quantity"] for row in held] == [2]
+    assert fake.tables["event_stats"].rows[event["event_id"]]["reservations"] == 1
+
+def test_cancelling_a_reservation_takes_it_out_of_the_rollups_once(client, auth, fake, guest_id, new_event):
+    event, (food,) = new_event(5)
+    host = auth(event["creator_id"])
+    reserved = client.post("/createreservation", headers=auth(guest_id), json={
+        "food_id": food["food_id"],
+        "food_name": food["food_name"],
+        "event_id": event["event_id"],
+        "quantity": 2,
+        "pickup_time": datetime.now(timezone.utc).isoformat(),
+        "note": "",
+    })
+    assert reserved.status_code == 200, reserved.text
+    (reservation,) = fake.tables["reservations"].lookup("food_id", [food["food_id"]])
+
+    response = client.post(
+        f"/events/update/{event['event_id']}",
+        headers=host,
+        json=edit_body(fake, event, {}, cancelled=(reservation["res_id"],)),
+    )
+
+    assert response.status_code == 200, response.text
+    assert food["quantity"] == 5
+    analytics = client.get("/host/analytics", headers=host, params={"event_id": event["event_id"]})
+    (counters,) = analytics.json()["events"]
+    assert (counters["reservations"], counters["quantity_claimed"], counters["attendees"]) == (0, 0, 0)
+    assert (counters["cancellations"], counters["quantity_cancelled"]) == (1, 2)
@@ -0,0 +1,6 @@
+-- Range scans for the /events/filtered time windows and /active-events
+CREATE INDEX IF NOT EXISTS events_start_time_idx ON events (start_time);
+CREATE INDEX IF NOT EXISTS events_last_res_time_idx ON events (last_res_time);
+
+-- Embedding foods under their event and the dietary EXISTS check
+CREATE INDEX IF NOT EXISTS foods_event_id_idx ON foods (event_id);
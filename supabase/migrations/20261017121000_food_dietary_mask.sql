@@ -0,0 +1,32 @@
+-- Dietary tags as a bitmask, one bit per tag of the vocabulary in backend/dietary.py
+-- vegetarian=1, vegan=2, gluten-free=4, dairy-free=8, nut-free=16, kosher=32, halal=64
+ALTER TABLE foods ADD COLUMN IF NOT EXISTS dietary_mask INTEGER NOT NULL DEFAULT 0;
+
+-- Backfill: normalize the free text tags (lowercase, trimmed, de-duplicated, vocabulary order first)
+-- and compute the mask for every existing food
+WITH vocabulary (tag, position) AS (
+    VALUES ('vegetarian', 0), ('vegan', 1), ('gluten-free', 2), ('dairy-free', 3),
+           ('nut-free', 4), ('kosher', 5), ('halal', 6)
+),
+parsed AS (
+    SELECT f.food_id, trim(t.tag) AS tag, t.ordinality
+    FROM foods f,
+         unnest(string_to_array(lower(COALESCE(f.dietary_tags, '')), ',')) WITH ORDINALITY AS t (tag, ordinality)
+    WHERE trim(t.tag) <> ''
+),
+normalized AS (
+    SELECT p.food_id,
+           string_agg(p.tag, ',' ORDER BY COALESCE(v.position, 100 + p.first_seen)) AS dietary_tags,
+           COALESCE(bit_or(1 << v.position), 0) AS dietary_mask
+    FROM (SELECT food_id, tag, min(ordinality) AS first_seen FROM parsed GROUP BY food_id, tag) p
+    LEFT JOIN vocabulary v ON v.tag = p.tag
+    GROUP BY p.food_id
+)
+UPDATE foods f
+SET dietary_tags = n.dietary_tags,
+    dietary_mask = n.dietary_mask
+FROM normalized n
+WHERE n.food_id = f.food_id;
+
+-- "has all of these tags" is looked up as dietary_mask = ANY(<every superset mask>)
+CREATE INDEX IF NOT EXISTS foods_dietary_mask_idx ON foods (dietary_mask, event_id);
@@ -0,0 +1,36 @@
+-- Create an event and all of its foods in one round trip and one transaction.
+-- Foods go in as a single multi-row INSERT, so latency stays flat as the food list grows,
+-- and a failure on any row rolls the whole event back.
+CREATE OR REPLACE FUNCTION create_event_with_foods(p_event JSONB, p_foods JSONB)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_event_id INT;
+    v_food_ids INT[];
+BEGIN
+    INSERT INTO events (creator_id, event_name, description, start_time, last_res_time, location_lat, location_lng, location_address)
+    VALUES (
+        (p_event->>'creator_id')::INT,
+        p_event->>'event_name',
+        p_event->>'description',
+        (p_event->>'start_time')::TIMESTAMP WITH TIME ZONE,
+        (p_event->>'last_res_time')::TIMESTAMP WITH TIME ZONE,
+        (p_event->>'location_lat')::DOUBLE PRECISION,
+        (p_event->>'location_lng')::DOUBLE PRECISION,
+        p_event->>'location_address'
+    )
+    RETURNING event_id INTO v_event_id;
+
+    WITH inserted AS (
+        INSERT INTO foods (food_name, quantity, event_id, dietary_tags, dietary_mask)
+        SELECT f.food_name, f.quantity, v_event_id, COALESCE(f.dietary_tags, ''), COALESCE(f.dietary_mask, 0)
+        FROM jsonb_to_recordset(COALESCE(p_foods, '[]'::JSONB))
+             AS f (food_name TEXT, quantity INT, dietary_tags TEXT, dietary_mask INT)
+        RETURNING food_id
+    )
+    SELECT COALESCE(array_agg(food_id ORDER BY food_id), '{}') INTO v_food_ids FROM inserted;
+
+    RETURN jsonb_build_object('event_id', v_event_id, 'food_ids', to_jsonb(v_food_ids));
+END;
+$$;
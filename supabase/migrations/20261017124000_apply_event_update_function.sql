@@ -0,0 +1,99 @@
+-- Apply a host's edit of an event as one batched transaction.
+-- The backend sends only what differs from the current state:
+--   p_event          changed event columns (empty object when nothing changed)
+--   p_food_updates   [{food_id, quantity, dietary_tags, dietary_mask}] for foods whose values changed
+--   p_food_deletes   food ids set to zero or below
+--   p_cancellations  [{res_id, food_name}] reservations to cancel, their quantity goes back to the food
+-- Everything is scoped to p_event_id so a request can't touch another event's rows.
+CREATE OR REPLACE FUNCTION apply_event_update(
+    p_event_id INT,
+    p_event JSONB,
+    p_food_updates JSONB,
+    p_food_deletes INT[],
+    p_cancellations JSONB
+) RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_event_updated BOOLEAN := FALSE;
+    v_foods_updated INT[];
+    v_foods_deleted INT[];
+    v_cancelled INT[];
+    v_restored JSONB;
+    v_recreated JSONB;
+BEGIN
+    IF p_event IS NOT NULL AND p_event <> '{}'::JSONB THEN
+        UPDATE events SET
+            event_name = COALESCE(p_event->>'event_name', event_name),
+            description = CASE WHEN p_event ? 'description' THEN p_event->>'description' ELSE description END,
+            start_time = COALESCE((p_event->>'start_time')::TIMESTAMP WITH TIME ZONE, start_time),
+            last_res_time = COALESCE((p_event->>'last_res_time')::TIMESTAMP WITH TIME ZONE, last_res_time),
+            location_lat = COALESCE((p_event->>'location_lat')::DOUBLE PRECISION, location_lat),
+            location_lng = COALESCE((p_event->>'location_lng')::DOUBLE PRECISION, location_lng),
+            location_address = COALESCE(p_event->>'location_address', location_address)
+        WHERE event_id = p_event_id;
+        v_event_updated := FOUND;
+    END IF;
+
+    -- New quantities (and tags when sent) in one UPDATE
+    WITH updated AS (
+        UPDATE foods f SET
+            quantity = u.quantity,
+            dietary_tags = COALESCE(u.dietary_tags, f.dietary_tags),
+            dietary_mask = COALESCE(u.dietary_mask, f.dietary_mask)
+        FROM jsonb_to_recordset(COALESCE(p_food_updates, '[]'::JSONB))
+             AS u (food_id INT, quantity INT, dietary_tags TEXT, dietary_mask INT)
+        WHERE f.food_id = u.food_id AND f.event_id = p_event_id
+        RETURNING f.food_id
+    )
+    SELECT COALESCE(array_agg(food_id ORDER BY food_id), '{}') INTO v_foods_updated FROM updated;
+
+    WITH deleted AS (
+        DELETE FROM foods
+        WHERE food_id = ANY(COALESCE(p_food_deletes, '{}')) AND event_id = p_event_id
+        RETURNING food_id
+    )
+    SELECT COALESCE(array_agg(food_id ORDER BY food_id), '{}') INTO v_foods_deleted FROM deleted;
+
+    -- Cancel reservations and give their quantity back to the food,
+    -- foods that are gone by now are created again with the reserved quantity
+    WITH cancelled AS (
+        DELETE FROM reservations r
+        USING jsonb_to_recordset(COALESCE(p_cancellations, '[]'::JSONB)) AS c (res_id INT, food_name TEXT)
+        WHERE r.res_id = c.res_id AND r.event_id = p_event_id
+        RETURNING r.res_id, r.food_id, COALESCE(r.food_name, c.food_name) AS food_name, r.quantity
+    ),
+    per_food AS (
+        SELECT food_id, max(food_name) AS food_name, sum(quantity)::INT AS quantity
+        FROM cancelled
+        GROUP BY food_id
+    ),
+    restored AS (
+        UPDATE foods f SET quantity = f.quantity + p.quantity
+        FROM per_food p
+        WHERE f.food_id = p.food_id
+        RETURNING f.food_id, f.quantity
+    ),
+    recreated AS (
+        INSERT INTO foods (food_name, quantity, event_id)
+        SELECT p.food_name, p.quantity, p_event_id
+        FROM per_food p
+        WHERE NOT EXISTS (SELECT 1 FROM restored r WHERE r.food_id = p.food_id)
+        RETURNING food_id, food_name, quantity
+    )
+    SELECT
+        (SELECT COALESCE(array_agg(res_id ORDER BY res_id), '{}') FROM cancelled),
+        (SELECT COALESCE(jsonb_agg(jsonb_build_object('food_id', food_id, 'quantity', quantity)), '[]'::JSONB) FROM restored),
+        (SELECT COALESCE(jsonb_agg(jsonb_build_object('food_id', food_id, 'food_name', food_name, 'quantity', quantity)), '[]'::JSONB) FROM recreated)
+    INTO v_cancelled, v_restored, v_recreated;
+
+    RETURN jsonb_build_object(
+        'event_updated', v_event_updated,
+        'foods_updated', to_jsonb(v_foods_updated),
+        'foods_deleted', to_jsonb(v_foods_deleted),
+        'reservations_cancelled', to_jsonb(v_cancelled),
+        'foods_restored', v_restored,
+        'foods_recreated', v_recreated
+    );
+END;
+$$;
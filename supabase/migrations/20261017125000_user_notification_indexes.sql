@@ -0,0 +1,6 @@
+-- Subscriber set for new event emails: regular users who opted in.
+-- A partial index only holds the matching rows and carries the email, so the lookup is index-only
+-- and /optupdate keeps it current through its normal UPDATE of users.optin.
+CREATE INDEX IF NOT EXISTS users_subscribers_idx
+    ON users (user_id) INCLUDE (email)
+    WHERE role = 'regular_user' AND optin;
@@ -0,0 +1,10 @@
+-- Spatial index for /events/nearby: radius (earth_box) and nearest-first queries on event locations
+CREATE EXTENSION IF NOT EXISTS cube;
+CREATE EXTENSION IF NOT EXISTS earthdistance;
+
+CREATE INDEX IF NOT EXISTS events_location_earth_idx
+    ON events USING gist (ll_to_earth(location_lat, location_lng))
+    WHERE location_lat IS NOT NULL AND location_lng IS NOT NULL;
+
+-- Bounding box scans for the supabase client fallback
+CREATE INDEX IF NOT EXISTS events_location_lat_lng_idx ON events (location_lat, location_lng);
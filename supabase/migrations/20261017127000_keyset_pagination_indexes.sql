@@ -0,0 +1,15 @@
+-- Keyset pagination: each page is an index range scan after the (sort value, id) of the previous page
+
+-- /events/all and /events/filtered (newest first), replaces the single column start_time index
+CREATE INDEX IF NOT EXISTS events_start_time_event_id_idx ON events (start_time DESC, event_id DESC);
+DROP INDEX IF EXISTS events_start_time_idx;
+
+-- /events/filtered windows sorted by end time
+CREATE INDEX IF NOT EXISTS events_last_res_time_event_id_idx ON events (last_res_time, event_id);
+DROP INDEX IF EXISTS events_last_res_time_idx;
+
+-- /events and /host/events
+CREATE INDEX IF NOT EXISTS events_creator_start_time_idx ON events (creator_id, start_time DESC, event_id DESC);
+
+-- /user/reservations
+CREATE INDEX IF NOT EXISTS reservations_user_res_time_idx ON reservations (user_id, res_time DESC, res_id DESC);
@@ -0,0 +1,121 @@
+-- Rating aggregates per event and per host, kept current by submit_rating instead of
+-- summing every rating on read. Each summary is one row: count, sum and a 1-5 star histogram
+-- (a rating counts towards its rounded star, 0 goes in the 1 star bucket).
+
+-- The ratings table was created outside of migrations, make sure it has what the backend uses
+CREATE TABLE IF NOT EXISTS ratings (
+    id SERIAL PRIMARY KEY,
+    event_id INT REFERENCES events(event_id) ON DELETE CASCADE,
+    user_id INT REFERENCES users(user_id) ON DELETE CASCADE,
+    rating DOUBLE PRECISION NOT NULL CHECK (rating >= 0 AND rating <= 5),
+    description TEXT DEFAULT '',
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+ALTER TABLE ratings ADD COLUMN IF NOT EXISTS created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP;
+
+-- /ratings/{event_id} pages, newest first
+CREATE INDEX IF NOT EXISTS ratings_event_created_at_idx ON ratings (event_id, created_at DESC, id DESC);
+
+CREATE TABLE IF NOT EXISTS event_rating_summaries (
+    event_id INT PRIMARY KEY REFERENCES events(event_id) ON DELETE CASCADE,
+    creator_id INT,
+    rating_count INT NOT NULL DEFAULT 0,
+    rating_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    stars_1 INT NOT NULL DEFAULT 0,
+    stars_2 INT NOT NULL DEFAULT 0,
+    stars_3 INT NOT NULL DEFAULT 0,
+    stars_4 INT NOT NULL DEFAULT 0,
+    stars_5 INT NOT NULL DEFAULT 0
+);
+
+-- Keeps the ratings of a host's deleted events
+CREATE TABLE IF NOT EXISTS host_rating_summaries (
+    creator_id INT PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,
+    rating_count INT NOT NULL DEFAULT 0,
+    rating_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    stars_1 INT NOT NULL DEFAULT 0,
+    stars_2 INT NOT NULL DEFAULT 0,
+    stars_3 INT NOT NULL DEFAULT 0,
+    stars_4 INT NOT NULL DEFAULT 0,
+    stars_5 INT NOT NULL DEFAULT 0
+);
+
+-- Backfill from the ratings already there
+INSERT INTO event_rating_summaries (event_id, creator_id, rating_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5)
+SELECT r.event_id, e.creator_id, count(*), sum(r.rating),
+       count(*) FILTER (WHERE LEAST(GREATEST(ROUND(r.rating::NUMERIC), 1), 5) = 1),
+       count(*) FILTER (WHERE LEAST(GREATEST(ROUND(r.rating::NUMERIC), 1), 5) = 2),
+       count(*) FILTER (WHERE LEAST(GREATEST(ROUND(r.rating::NUMERIC), 1), 5) = 3),
+       count(*) FILTER (WHERE LEAST(GREATEST(ROUND(r.rating::NUMERIC), 1), 5) = 4),
+       count(*) FILTER (WHERE LEAST(GREATEST(ROUND(r.rating::NUMERIC), 1), 5) = 5)
+FROM ratings r
+JOIN events e ON e.event_id = r.event_id
+GROUP BY r.event_id, e.creator_id
+ON CONFLICT (event_id) DO NOTHING;
+
+INSERT INTO host_rating_summaries (creator_id, rating_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5)
+SELECT creator_id, sum(rating_count), sum(rating_sum), sum(stars_1), sum(stars_2), sum(stars_3), sum(stars_4), sum(stars_5)
+FROM event_rating_summaries
+WHERE creator_id IS NOT NULL
+GROUP BY creator_id
+ON CONFLICT (creator_id) DO NOTHING;
+
+-- Rate an event in one round trip and one transaction: check the user reserved food there,
+-- insert the rating and add it to both summaries. The upserts take the summary row locks,
+-- so concurrent ratings of the same event or host are added one after the other.
+CREATE OR REPLACE FUNCTION submit_rating(
+    p_event_id INT,
+    p_user_id INT,
+    p_rating DOUBLE PRECISION,
+    p_description TEXT
+) RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_creator_id INT;
+    v_rating_id INT;
+    v_star INT;
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM reservations WHERE user_id = p_user_id AND event_id = p_event_id) THEN
+        RETURN jsonb_build_object('status', 'not_attended');
+    END IF;
+
+    SELECT creator_id INTO v_creator_id FROM events WHERE event_id = p_event_id;
+
+    INSERT INTO ratings (event_id, user_id, rating, description)
+    VALUES (p_event_id, p_user_id, p_rating, COALESCE(p_description, ''))
+    RETURNING id INTO v_rating_id;
+
+    v_star := LEAST(GREATEST(ROUND(p_rating::NUMERIC), 1), 5);
+
+    INSERT INTO event_rating_summaries AS s (event_id, creator_id, rating_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5)
+    VALUES (p_event_id, v_creator_id, 1, p_rating, (v_star = 1)::INT, (v_star = 2)::INT, (v_star = 3)::INT, (v_star = 4)::INT, (v_star = 5)::INT)
+    ON CONFLICT (event_id) DO UPDATE SET
+        rating_count = s.rating_count + 1,
+        rating_sum = s.rating_sum + EXCLUDED.rating_sum,
+        stars_1 = s.stars_1 + EXCLUDED.stars_1,
+        stars_2 = s.stars_2 + EXCLUDED.stars_2,
+        stars_3 = s.stars_3 + EXCLUDED.stars_3,
+        stars_4 = s.stars_4 + EXCLUDED.stars_4,
+        stars_5 = s.stars_5 + EXCLUDED.stars_5;
+
+    IF v_creator_id IS NOT NULL THEN
+        INSERT INTO host_rating_summaries AS s (creator_id, rating_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5)
+        VALUES (v_creator_id, 1, p_rating, (v_star = 1)::INT, (v_star = 2)::INT, (v_star = 3)::INT, (v_star = 4)::INT, (v_star = 5)::INT)
+        ON CONFLICT (creator_id) DO UPDATE SET
+            rating_count = s.rating_count + 1,
+            rating_sum = s.rating_sum + EXCLUDED.rating_sum,
+            stars_1 = s.stars_1 + EXCLUDED.stars_1,
+            stars_2 = s.stars_2 + EXCLUDED.stars_2,
+            stars_3 = s.stars_3 + EXCLUDED.stars_3,
+            stars_4 = s.stars_4 + EXCLUDED.stars_4,
+            stars_5 = s.stars_5 + EXCLUDED.stars_5;
+    END IF;
+
+    RETURN jsonb_build_object(
+        'status', 'ok',
+        'rating_id', v_rating_id,
+        'creator_id', v_creator_id
+    );
+END;
+$$;
@@ -0,0 +1,380 @@
+-- Rollups behind /host/analytics, kept current by reserve_food, apply_event_update and submit_rating
+-- so the dashboard reads a handful of rows per event instead of every reservation.
+-- Counters are by food name and not food id, the name a reservation was made under is the one it is taken out under.
+-- Every removed reservation is taken back out of the rollups (see 20261017135000_untrack_deleted_reservations.sql),
+-- foods that run out are kept at quantity 0 (see 20261017132000_keep_sold_out_foods.sql).
+
+-- Totals per event
+CREATE TABLE IF NOT EXISTS event_stats (
+    event_id INT PRIMARY KEY REFERENCES events(event_id) ON DELETE CASCADE,
+    creator_id INT,
+    reservations INT NOT NULL DEFAULT 0,         -- held right now (made minus cancelled)
+    quantity_claimed INT NOT NULL DEFAULT 0,
+    cancellations INT NOT NULL DEFAULT 0,
+    quantity_cancelled INT NOT NULL DEFAULT 0,
+    attendees INT NOT NULL DEFAULT 0,            -- users holding at least one reservation
+    confirmed INT NOT NULL DEFAULT 0             -- attendees who rated the event, i.e. showed up
+);
+CREATE INDEX IF NOT EXISTS event_stats_creator_idx ON event_stats (creator_id);
+
+-- Reservations held per user, only there to keep attendees / confirmed distinct
+CREATE TABLE IF NOT EXISTS event_attendees (
+    event_id INT REFERENCES events(event_id) ON DELETE CASCADE,
+    user_id INT REFERENCES users(user_id) ON DELETE CASCADE,
+    reservations INT NOT NULL DEFAULT 0,
+    rated BOOLEAN NOT NULL DEFAULT FALSE,
+    PRIMARY KEY (event_id, user_id)
+);
+
+-- Reservations per 15 minute pickup window
+CREATE TABLE IF NOT EXISTS event_reservation_buckets (
+    event_id INT REFERENCES events(event_id) ON DELETE CASCADE,
+    bucket_start TIMESTAMP WITH TIME ZONE,
+    creator_id INT,
+    reservations INT NOT NULL DEFAULT 0,
+    quantity INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (event_id, bucket_start)
+);
+CREATE INDEX IF NOT EXISTS event_reservation_buckets_creator_idx ON event_reservation_buckets (creator_id, bucket_start);
+
+-- Quantity claimed per food
+CREATE TABLE IF NOT EXISTS event_food_claims (
+    event_id INT REFERENCES events(event_id) ON DELETE CASCADE,
+    food_name TEXT,
+    creator_id INT,
+    reservations INT NOT NULL DEFAULT 0,
+    quantity INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (event_id, food_name)
+);
+CREATE INDEX IF NOT EXISTS event_food_claims_creator_idx ON event_food_claims (creator_id);
+
+-- Backfill from the reservations and ratings already there
+INSERT INTO event_attendees (event_id, user_id, reservations, rated)
+SELECT r.event_id, r.user_id, count(*),
+       EXISTS (SELECT 1 FROM ratings ra WHERE ra.event_id = r.event_id AND ra.user_id = r.user_id)
+FROM reservations r
+WHERE r.event_id IS NOT NULL AND r.user_id IS NOT NULL
+GROUP BY r.event_id, r.user_id
+ON CONFLICT (event_id, user_id) DO NOTHING;
+
+INSERT INTO event_stats (event_id, creator_id, reservations, quantity_claimed, attendees, confirmed)
+SELECT e.event_id, e.creator_id,
+       (SELECT count(*) FROM reservations r WHERE r.event_id = e.event_id),
+       (SELECT COALESCE(sum(quantity), 0) FROM reservations r WHERE r.event_id = e.event_id),
+       (SELECT count(*) FROM event_attendees a WHERE a.event_id = e.event_id),
+       (SELECT count(*) FROM event_attendees a WHERE a.event_id = e.event_id AND a.rated)
+FROM events e
+ON CONFLICT (event_id) DO NOTHING;
+
+INSERT INTO event_reservation_buckets (event_id, bucket_start, creator_id, reservations, quantity)
+SELECT r.event_id, date_bin('15 minutes', r.res_time, TIMESTAMP WITH TIME ZONE '2000-01-01 00:00:00+00'), e.creator_id, count(*), sum(r.quantity)
+FROM reservations r
+JOIN events e ON e.event_id = r.event_id
+WHERE r.res_time IS NOT NULL
+GROUP BY 1, 2, 3
+ON CONFLICT (event_id, bucket_start) DO NOTHING;
+
+INSERT INTO event_food_claims (event_id, food_name, creator_id, reservations, quantity)
+SELECT r.event_id, COALESCE(r.food_name, ''), e.creator_id, count(*), sum(r.quantity)
+FROM reservations r
+JOIN events e ON e.event_id = r.event_id
+GROUP BY 1, 2, 3
+ON CONFLICT (event_id, food_name) DO NOTHING;
+
+-- Add (p_count = 1) or take out (p_count = -1, quantity negative) one reservation from the rollups
+CREATE OR REPLACE FUNCTION track_reservation(
+    p_event_id INT,
+    p_creator_id INT,
+    p_user_id INT,
+    p_food_name TEXT,
+    p_res_time TIMESTAMP WITH TIME ZONE,
+    p_quantity INT,
+    p_count INT
+) RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_held INT;
+    v_rated BOOLEAN;
+    v_attendees INT := 0;
+    v_confirmed INT := 0;
+BEGIN
+    -- First reservation of the user at this event, or their last one cancelled
+    IF p_count > 0 THEN
+        INSERT INTO event_attendees AS a (event_id, user_id, reservations)
+        VALUES (p_event_id, p_user_id, p_count)
+        ON CONFLICT (event_id, user_id) DO UPDATE SET reservations = a.reservations + EXCLUDED.reservations
+        RETURNING reservations INTO v_held;
+        IF v_held = p_count THEN
+            v_attendees := 1;
+        END IF;
+    ELSE
+        UPDATE event_attendees SET reservations = reservations + p_count
+        WHERE event_id = p_event_id AND user_id = p_user_id
+        RETURNING reservations, rated INTO v_held, v_rated;
+        IF FOUND AND v_held <= 0 THEN
+            DELETE FROM event_attendees WHERE event_id = p_event_id AND user_id = p_user_id;
+            v_attendees := -1;
+            v_confirmed := CASE WHEN v_rated THEN -1 ELSE 0 END;
+        END IF;
+    END IF;
+
+    INSERT INTO event_stats AS s (event_id, creator_id, reservations, quantity_claimed, cancellations, quantity_cancelled, attendees, confirmed)
+    VALUES (
+        p_event_id, p_creator_id, p_count, p_quantity,
+        GREATEST(-p_count, 0), GREATEST(-p_quantity, 0), v_attendees, v_confirmed
+    )
+    ON CONFLICT (event_id) DO UPDATE SET
+        reservations = s.reservations + EXCLUDED.reservations,
+        quantity_claimed = s.quantity_claimed + EXCLUDED.quantity_claimed,
+        cancellations = s.cancellations + EXCLUDED.cancellations,
+        quantity_cancelled = s.quantity_cancelled + EXCLUDED.quantity_cancelled,
+        attendees = s.attendees + EXCLUDED.attendees,
+        confirmed = s.confirmed + EXCLUDED.confirmed;
+
+    IF p_res_time IS NOT NULL THEN
+        INSERT INTO event_reservation_buckets AS b (event_id, bucket_start, creator_id, reservations, quantity)
+        VALUES (p_event_id, date_bin('15 minutes', p_res_time, TIMESTAMP WITH TIME ZONE '2000-01-01 00:00:00+00'), p_creator_id, p_count, p_quantity)
+        ON CONFLICT (event_id, bucket_start) DO UPDATE SET
+            reservations = b.reservations + EXCLUDED.reservations,
+            quantity = b.quantity + EXCLUDED.quantity;
+    END IF;
+
+    INSERT INTO event_food_claims AS c (event_id, food_name, creator_id, reservations, quantity)
+    VALUES (p_event_id, COALESCE(p_food_name, ''), p_creator_id, p_count, p_quantity)
+    ON CONFLICT (event_id, food_name) DO UPDATE SET
+        reservations = c.reservations + EXCLUDED.reservations,
+        quantity = c.quantity + EXCLUDED.quantity;
+END;
+$$;
+
+-- Same as 20261017122000_reserve_food_function.sql, plus the rollups
+CREATE OR REPLACE FUNCTION reserve_food(
+    p_user_id INT,
+    p_user_name TEXT,
+    p_food_id INT,
+    p_food_name TEXT,
+    p_event_id INT,
+    p_quantity INT,
+    p_res_time TIMESTAMP WITH TIME ZONE,
+    p_notes TEXT
+) RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_remaining INT;
+    v_res_id INT;
+    v_creator_id INT;
+BEGIN
+    IF p_quantity IS NULL OR p_quantity <= 0 THEN
+        RETURN jsonb_build_object('status', 'invalid_quantity');
+    END IF;
+
+    UPDATE foods
+    SET quantity = quantity - p_quantity
+    WHERE food_id = p_food_id
+      AND event_id = p_event_id
+      AND quantity >= p_quantity
+    RETURNING quantity INTO v_remaining;
+
+    -- Either not enough left or the food is already gone
+    IF NOT FOUND THEN
+        RETURN jsonb_build_object('status', 'sold_out');
+    END IF;
+
+    INSERT INTO reservations (user_id, user_name, food_id, food_name, event_id, quantity, res_time, notes)
+    VALUES (p_user_id, p_user_name, p_food_id, p_food_name, p_event_id, p_quantity, p_res_time, p_notes)
+    RETURNING res_id INTO v_res_id;
+
+    IF v_remaining = 0 THEN
+        DELETE FROM foods WHERE food_id = p_food_id;
+    END IF;
+
+    SELECT creator_id INTO v_creator_id FROM events WHERE event_id = p_event_id;
+
+    PERFORM track_reservation(p_event_id, v_creator_id, p_user_id, p_food_name, p_res_time, p_quantity, 1);
+
+    RETURN jsonb_build_object(
+        'status', 'ok',
+        'res_id', v_res_id,
+        'remaining', v_remaining,
+        'creator_id', v_creator_id
+    );
+END;
+$$;
+
+-- Same as 20261017124000_apply_event_update_function.sql, cancellations also come out of the rollups
+CREATE OR REPLACE FUNCTION apply_event_update(
+    p_event_id INT,
+    p_event JSONB,
+    p_food_updates JSONB,
+    p_food_deletes INT[],
+    p_cancellations JSONB
+) RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_event_updated BOOLEAN := FALSE;
+    v_foods_updated INT[];
+    v_foods_deleted INT[];
+    v_cancelled_rows JSONB;
+    v_cancelled INT[];
+    v_restored JSONB;
+    v_recreated JSONB;
+    v_creator_id INT;
+    v_row RECORD;
+BEGIN
+    IF p_event IS NOT NULL AND p_event <> '{}'::JSONB THEN
+        UPDATE events SET
+            event_name = COALESCE(p_event->>'event_name', event_name),
+            description = CASE WHEN p_event ? 'description' THEN p_event->>'description' ELSE description END,
+            start_time = COALESCE((p_event->>'start_time')::TIMESTAMP WITH TIME ZONE, start_time),
+            last_res_time = COALESCE((p_event->>'last_res_time')::TIMESTAMP WITH TIME ZONE, last_res_time),
+            location_lat = COALESCE((p_event->>'location_lat')::DOUBLE PRECISION, location_lat),
+            location_lng = COALESCE((p_event->>'location_lng')::DOUBLE PRECISION, location_lng),
+            location_address = COALESCE(p_event->>'location_address', location_address)
+        WHERE event_id = p_event_id;
+        v_event_updated := FOUND;
+    END IF;
+
+    -- New quantities (and tags when sent) in one UPDATE
+    WITH updated AS (
+        UPDATE foods f SET
+            quantity = u.quantity,
+            dietary_tags = COALESCE(u.dietary_tags, f.dietary_tags),
+            dietary_mask = COALESCE(u.dietary_mask, f.dietary_mask)
+        FROM jsonb_to_recordset(COALESCE(p_food_updates, '[]'::JSONB))
+             AS u (food_id INT, quantity INT, dietary_tags TEXT, dietary_mask INT)
+        WHERE f.food_id = u.food_id AND f.event_id = p_event_id
+        RETURNING f.food_id
+    )
+    SELECT COALESCE(array_agg(food_id ORDER BY food_id), '{}') INTO v_foods_updated FROM updated;
+
+    WITH deleted AS (
+        DELETE FROM foods
+        WHERE food_id = ANY(COALESCE(p_food_deletes, '{}')) AND event_id = p_event_id
+        RETURNING food_id
+    )
+    SELECT COALESCE(array_agg(food_id ORDER BY food_id), '{}') INTO v_foods_deleted FROM deleted;
+
+    -- Cancel reservations, kept aside to take them out of the rollups and give their quantity back
+    WITH cancelled AS (
+        DELETE FROM reservations r
+        USING jsonb_to_recordset(COALESCE(p_cancellations, '[]'::JSONB)) AS c (res_id INT, food_name TEXT)
+        WHERE r.res_id = c.res_id AND r.event_id = p_event_id
+        RETURNING r.res_id, r.food_id, r.user_id, r.res_time, COALESCE(r.food_name, c.food_name) AS food_name, r.quantity
+    )
+    SELECT COALESCE(jsonb_agg(to_jsonb(cancelled)), '[]'::JSONB) INTO v_cancelled_rows FROM cancelled;
+
+    IF v_cancelled_rows <> '[]'::JSONB THEN
+        SELECT creator_id INTO v_creator_id FROM events WHERE event_id = p_event_id;
+        FOR v_row IN
+            SELECT * FROM jsonb_to_recordset(v_cancelled_rows)
+                AS c (res_id INT, food_id INT, user_id INT, res_time TIMESTAMP WITH TIME ZONE, food_name TEXT, quantity INT)
+        LOOP
+            PERFORM track_reservation(p_event_id, v_creator_id, v_row.user_id, v_row.food_name, v_row.res_time, -v_row.quantity, -1);
+        END LOOP;
+    END IF;
+
+    -- Foods that are gone by now are created again with the reserved quantity
+    WITH cancelled AS (
+        SELECT * FROM jsonb_to_recordset(v_cancelled_rows) AS c (res_id INT, food_id INT, food_name TEXT, quantity INT)
+    ),
+    per_food AS (
+        SELECT food_id, max(food_name) AS food_name, sum(quantity)::INT AS quantity
+        FROM cancelled
+        GROUP BY food_id
+    ),
+    restored AS (
+        UPDATE foods f SET quantity = f.quantity + p.quantity
+        FROM per_food p
+        WHERE f.food_id = p.food_id
+        RETURNING f.food_id, f.quantity
+    ),
+    recreated AS (
+        INSERT INTO foods (food_name, quantity, event_id)
+        SELECT p.food_name, p.quantity, p_event_id
+        FROM per_food p
+        WHERE NOT EXISTS (SELECT 1 FROM restored r WHERE r.food_id = p.food_id)
+        RETURNING food_id, food_name, quantity
+    )
+    SELECT
+        (SELECT COALESCE(array_agg(res_id ORDER BY res_id), '{}') FROM cancelled),
+        (SELECT COALESCE(jsonb_agg(jsonb_build_object('food_id', food_id, 'quantity', quantity)), '[]'::JSONB) FROM restored),
+        (SELECT COALESCE(jsonb_agg(jsonb_build_object('food_id', food_id, 'food_name', food_name, 'quantity', quantity)), '[]'::JSONB) FROM recreated)
+    INTO v_cancelled, v_restored, v_recreated;
+
+    RETURN jsonb_build_object(
+        'event_updated', v_event_updated,
+        'foods_updated', to_jsonb(v_foods_updated),
+        'foods_deleted', to_jsonb(v_foods_deleted),
+        'reservations_cancelled', to_jsonb(v_cancelled),
+        'foods_restored', v_restored,
+        'foods_recreated', v_recreated
+    );
+END;
+$$;
+
+-- Same as in 20261017128000_rating_summaries.sql, a first rating also confirms the user showed up
+CREATE OR REPLACE FUNCTION submit_rating(
+    p_event_id INT,
+    p_user_id INT,
+    p_rating DOUBLE PRECISION,
+    p_description TEXT
+) RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_creator_id INT;
+    v_rating_id INT;
+    v_star INT;
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM reservations WHERE user_id = p_user_id AND event_id = p_event_id) THEN
+        RETURN jsonb_build_object('status', 'not_attended');
+    END IF;
+
+    SELECT creator_id INTO v_creator_id FROM events WHERE event_id = p_event_id;
+
+    INSERT INTO ratings (event_id, user_id, rating, description)
+    VALUES (p_event_id, p_user_id, p_rating, COALESCE(p_description, ''))
+    RETURNING id INTO v_rating_id;
+
+    v_star := LEAST(GREATEST(ROUND(p_rating::NUMERIC), 1), 5);
+
+    INSERT INTO event_rating_summaries AS s (event_id, creator_id, rating_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5)
+    VALUES (p_event_id, v_creator_id, 1, p_rating, (v_star = 1)::INT, (v_star = 2)::INT, (v_star = 3)::INT, (v_star = 4)::INT, (v_star = 5)::INT)
+    ON CONFLICT (event_id) DO UPDATE SET
+        rating_count = s.rating_count + 1,
+        rating_sum = s.rating_sum + EXCLUDED.rating_sum,
+        stars_1 = s.stars_1 + EXCLUDED.stars_1,
+        stars_2 = s.stars_2 + EXCLUDED.stars_2,
+        stars_3 = s.stars_3 + EXCLUDED.stars_3,
+        stars_4 = s.stars_4 + EXCLUDED.stars_4,
+        stars_5 = s.stars_5 + EXCLUDED.stars_5;
+
+    IF v_creator_id IS NOT NULL THEN
+        INSERT INTO host_rating_summaries AS s (creator_id, rating_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5)
+        VALUES (v_creator_id, 1, p_rating, (v_star = 1)::INT, (v_star = 2)::INT, (v_star = 3)::INT, (v_star = 4)::INT, (v_star = 5)::INT)
+        ON CONFLICT (creator_id) DO UPDATE SET
+            rating_count = s.rating_count + 1,
+            rating_sum = s.rating_sum + EXCLUDED.rating_sum,
+            stars_1 = s.stars_1 + EXCLUDED.stars_1,
+            stars_2 = s.stars_2 + EXCLUDED.stars_2,
+            stars_3 = s.stars_3 + EXCLUDED.stars_3,
+            stars_4 = s.stars_4 + EXCLUDED.stars_4,
+            stars_5 = s.stars_5 + EXCLUDED.stars_5;
+    END IF;
+
+    UPDATE event_attendees SET rated = TRUE
+    WHERE event_id = p_event_id AND user_id = p_user_id AND NOT rated;
+    IF FOUND THEN
+        UPDATE event_stats SET confirmed = confirmed + 1 WHERE event_id = p_event_id;
+    END IF;
+
+    RETURN jsonb_build_object(
+        'status', 'ok',
+        'rating_id', v_rating_id,
+        'creator_id', v_creator_id
+    );
+END;
+$$;
@@ -0,0 +1,100 @@
+-- Reserve several foods of one event in one round trip and one transaction, all or nothing.
+--   p_items  [{food_id, quantity, notes}], the same food twice is reserved once with the quantities added up
+-- The foods are locked in food_id order (so two batches over the same foods can't deadlock) and checked
+-- together: if any of them is short nothing is taken and every short food is reported back.
+-- Otherwise the stock goes down, one reservation per food is recorded, foods that run out are removed
+-- and the host analytics rollups are updated, like reserve_food does for one food.
+CREATE OR REPLACE FUNCTION reserve_foods(
+    p_user_id INT,
+    p_user_name TEXT,
+    p_event_id INT,
+    p_items JSONB,
+    p_res_time TIMESTAMP WITH TIME ZONE,
+    p_notes TEXT
+) RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_items JSONB;
+    v_short JSONB;
+    v_reservations JSONB;
+    v_creator_id INT;
+    v_row RECORD;
+BEGIN
+    -- One entry per food
+    SELECT COALESCE(jsonb_agg(jsonb_build_object('food_id', food_id, 'quantity', quantity, 'notes', notes) ORDER BY food_id), '[]'::JSONB)
+    INTO v_items
+    FROM (
+        SELECT i.food_id, sum(i.quantity)::INT AS quantity, string_agg(NULLIF(i.notes, ''), '; ') AS notes
+        FROM jsonb_to_recordset(COALESCE(p_items, '[]'::JSONB)) AS i (food_id INT, quantity INT, notes TEXT)
+        GROUP BY i.food_id
+    ) grouped;
+
+    IF v_items = '[]'::JSONB OR EXISTS (
+        SELECT 1 FROM jsonb_to_recordset(v_items) AS i (food_id INT, quantity INT) WHERE i.food_id IS NULL OR i.quantity IS NULL OR i.quantity <= 0
+    ) THEN
+        RETURN jsonb_build_object('status', 'invalid_quantity');
+    END IF;
+
+    -- The one inventory check, under the row locks
+    WITH items AS (
+        SELECT * FROM jsonb_to_recordset(v_items) AS i (food_id INT, quantity INT)
+    ),
+    locked AS (
+        SELECT f.food_id, f.quantity
+        FROM foods f
+        WHERE f.event_id = p_event_id AND f.food_id IN (SELECT food_id FROM items)
+        ORDER BY f.food_id
+        FOR UPDATE
+    )
+    SELECT COALESCE(jsonb_agg(jsonb_build_object('food_id', i.food_id, 'requested', i.quantity, 'available', COALESCE(l.quantity, 0)) ORDER BY i.food_id), '[]'::JSONB)
+    INTO v_short
+    FROM items i
+    LEFT JOIN locked l ON l.food_id = i.food_id
+    WHERE l.food_id IS NULL OR l.quantity < i.quantity;
+
+    IF v_short <> '[]'::JSONB THEN
+        RETURN jsonb_build_object('status', 'sold_out', 'short', v_short);
+    END IF;
+
+    WITH items AS (
+        SELECT * FROM jsonb_to_recordset(v_items) AS i (food_id INT, quantity INT, notes TEXT)
+    ),
+    taken AS (
+        UPDATE foods f SET quantity = f.quantity - i.quantity
+        FROM items i
+        WHERE f.food_id = i.food_id AND f.event_id = p_event_id
+        RETURNING f.food_id, f.food_name, f.quantity AS remaining, i.quantity, i.notes
+    ),
+    inserted AS (
+        INSERT INTO reservations (user_id, user_name, food_id, food_name, event_id, quantity, res_time, notes)
+        SELECT p_user_id, p_user_name, t.food_id, t.food_name, p_event_id, t.quantity, p_res_time, COALESCE(t.notes, p_notes)
+        FROM taken t
+        RETURNING res_id, food_id
+    )
+    SELECT jsonb_agg(jsonb_build_object(
+        'res_id', n.res_id, 'food_id', t.food_id, 'food_name', t.food_name, 'quantity', t.quantity, 'remaining', t.remaining
+    ) ORDER BY t.food_id)
+    INTO v_reservations
+    FROM taken t
+    JOIN inserted n ON n.food_id = t.food_id;
+
+    DELETE FROM foods
+    WHERE event_id = p_event_id
+      AND food_id IN (SELECT (r->>'food_id')::INT FROM jsonb_array_elements(v_reservations) r WHERE (r->>'remaining')::INT = 0);
+
+    SELECT creator_id INTO v_creator_id FROM events WHERE event_id = p_event_id;
+
+    FOR v_row IN
+        SELECT * FROM jsonb_to_recordset(v_reservations) AS r (food_name TEXT, quantity INT)
+    LOOP
+        PERFORM track_reservation(p_event_id, v_creator_id, p_user_id, v_row.food_name, p_res_time, v_row.quantity, 1);
+    END LOOP;
+
+    RETURN jsonb_build_object(
+        'status', 'ok',
+        'reservations', v_reservations,
+        'creator_id', v_creator_id
+    );
+END;
+$$;
@@ -0,0 +1,7 @@
+-- dietary_tags as an array, so the supabase client can ask for foods that carry every one of a set of tags
+-- (dietary_tag_list=cs.{...}, @>) instead of splitting the column on our side. Tags are stored normalized
+-- (lowercase, no spaces around the commas) since 20261017121000_food_dietary_mask.sql.
+ALTER TABLE foods ADD COLUMN IF NOT EXISTS dietary_tag_list TEXT[]
+    GENERATED ALWAYS AS (string_to_array(NULLIF(dietary_tags, ''), ',')) STORED;
+
+CREATE INDEX IF NOT EXISTS foods_dietary_tag_list_idx ON foods USING GIN (dietary_tag_list);
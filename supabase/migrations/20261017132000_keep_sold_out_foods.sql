@@ -0,0 +1,55 @@
+-- A food that runs out stays in the table at quantity 0 instead of being deleted.
+-- reservations.food_id is ON DELETE CASCADE, so deleting the food also deleted the reservation that had
+-- just taken its last portion (and with it the user's right to rate the event), while the rollups still counted it.
+-- The food and event reads of the backend leave out the foods at quantity 0.
+
+-- Same as in 20261017129000_host_analytics.sql, without removing the food once it runs out
+CREATE OR REPLACE FUNCTION reserve_food(
+    p_user_id INT,
+    p_user_name TEXT,
+    p_food_id INT,
+    p_food_name TEXT,
+    p_event_id INT,
+    p_quantity INT,
+    p_res_time TIMESTAMP WITH TIME ZONE,
+    p_notes TEXT
+) RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_remaining INT;
+    v_res_id INT;
+    v_creator_id INT;
+BEGIN
+    IF p_quantity IS NULL OR p_quantity <= 0 THEN
+        RETURN jsonb_build_object('status', 'invalid_quantity');
+    END IF;
+
+    UPDATE foods
+    SET quantity = quantity - p_quantity
+    WHERE food_id = p_food_id
+      AND event_id = p_event_id
+      AND quantity >= p_quantity
+    RETURNING quantity INTO v_remaining;
+
+    -- Either not enough left or the food is already gone
+    IF NOT FOUND THEN
+        RETURN jsonb_build_object('status', 'sold_out');
+    END IF;
+
+    INSERT INTO reservations (user_id, user_name, food_id, food_name, event_id, quantity, res_time, notes)
+    VALUES (p_user_id, p_user_name, p_food_id, p_food_name, p_event_id, p_quantity, p_res_time, p_notes)
+    RETURNING res_id INTO v_res_id;
+
+    SELECT creator_id INTO v_creator_id FROM events WHERE event_id = p_event_id;
+
+    PERFORM track_reservation(p_event_id, v_creator_id, p_user_id, p_food_name, p_res_time, p_quantity, 1);
+
+    RETURN jsonb_build_object(
+        'status', 'ok',
+        'res_id', v_res_id,
+        'remaining', v_remaining,
+        'creator_id', v_creator_id
+    );
+END;
+$$;
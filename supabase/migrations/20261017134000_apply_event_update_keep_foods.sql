@@ -0,0 +1,97 @@
+-- A host setting a food to 0 no longer deletes it: reservations.food_id is ON DELETE CASCADE, so the delete
+-- also removed every reservation of the food. The food is kept at quantity 0 like a sold out one
+-- (see 20261017132000_keep_sold_out_foods.sql), so apply_event_update loses p_food_deletes.
+-- With foods never deleted under their reservations, cancelled quantities always have their food to go back to
+-- and the food is not created again any more.
+DROP FUNCTION IF EXISTS apply_event_update(INT, JSONB, JSONB, INT[], JSONB);
+
+-- Same as in 20261017129000_host_analytics.sql, without p_food_deletes
+CREATE OR REPLACE FUNCTION apply_event_update(
+    p_event_id INT,
+    p_event JSONB,
+    p_food_updates JSONB,
+    p_cancellations JSONB
+) RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_event_updated BOOLEAN := FALSE;
+    v_foods_updated INT[];
+    v_cancelled_rows JSONB;
+    v_cancelled INT[];
+    v_restored JSONB;
+    v_creator_id INT;
+    v_row RECORD;
+BEGIN
+    IF p_event IS NOT NULL AND p_event <> '{}'::JSONB THEN
+        UPDATE events SET
+            event_name = COALESCE(p_event->>'event_name', event_name),
+            description = CASE WHEN p_event ? 'description' THEN p_event->>'description' ELSE description END,
+            start_time = COALESCE((p_event->>'start_time')::TIMESTAMP WITH TIME ZONE, start_time),
+            last_res_time = COALESCE((p_event->>'last_res_time')::TIMESTAMP WITH TIME ZONE, last_res_time),
+            location_lat = COALESCE((p_event->>'location_lat')::DOUBLE PRECISION, location_lat),
+            location_lng = COALESCE((p_event->>'location_lng')::DOUBLE PRECISION, location_lng),
+            location_address = COALESCE(p_event->>'location_address', location_address)
+        WHERE event_id = p_event_id;
+        v_event_updated := FOUND;
+    END IF;
+
+    -- New quantities (0 included) and tags when sent, in one UPDATE
+    WITH updated AS (
+        UPDATE foods f SET
+            quantity = u.quantity,
+            dietary_tags = COALESCE(u.dietary_tags, f.dietary_tags),
+            dietary_mask = COALESCE(u.dietary_mask, f.dietary_mask)
+        FROM jsonb_to_recordset(COALESCE(p_food_updates, '[]'::JSONB))
+             AS u (food_id INT, quantity INT, dietary_tags TEXT, dietary_mask INT)
+        WHERE f.food_id = u.food_id AND f.event_id = p_event_id
+        RETURNING f.food_id
+    )
+    SELECT COALESCE(array_agg(food_id ORDER BY food_id), '{}') INTO v_foods_updated FROM updated;
+
+    -- Cancel reservations, kept aside to take them out of the rollups and give their quantity back
+    WITH cancelled AS (
+        DELETE FROM reservations r
+        USING jsonb_to_recordset(COALESCE(p_cancellations, '[]'::JSONB)) AS c (res_id INT, food_name TEXT)
+        WHERE r.res_id = c.res_id AND r.event_id = p_event_id
+        RETURNING r.res_id, r.food_id, r.user_id, r.res_time, COALESCE(r.food_name, c.food_name) AS food_name, r.quantity
+    )
+    SELECT COALESCE(jsonb_agg(to_jsonb(cancelled)), '[]'::JSONB) INTO v_cancelled_rows FROM cancelled;
+
+    IF v_cancelled_rows <> '[]'::JSONB THEN
+        SELECT creator_id INTO v_creator_id FROM events WHERE event_id = p_event_id;
+        FOR v_row IN
+            SELECT * FROM jsonb_to_recordset(v_cancelled_rows)
+                AS c (res_id INT, food_id INT, user_id INT, res_time TIMESTAMP WITH TIME ZONE, food_name TEXT, quantity INT)
+        LOOP
+            PERFORM track_reservation(p_event_id, v_creator_id, v_row.user_id, v_row.food_name, v_row.res_time, -v_row.quantity, -1);
+        END LOOP;
+    END IF;
+
+    WITH cancelled AS (
+        SELECT * FROM jsonb_to_recordset(v_cancelled_rows) AS c (res_id INT, food_id INT, quantity INT)
+    ),
+    per_food AS (
+        SELECT food_id, sum(quantity)::INT AS quantity
+        FROM cancelled
+        GROUP BY food_id
+    ),
+    restored AS (
+        UPDATE foods f SET quantity = f.quantity + p.quantity
+        FROM per_food p
+        WHERE f.food_id = p.food_id
+        RETURNING f.food_id, f.quantity
+    )
+    SELECT
+        (SELECT COALESCE(array_agg(res_id ORDER BY res_id), '{}') FROM cancelled),
+        (SELECT COALESCE(jsonb_agg(jsonb_build_object('food_id', food_id, 'quantity', quantity)), '[]'::JSONB) FROM restored)
+    INTO v_cancelled, v_restored;
+
+    RETURN jsonb_build_object(
+        'event_updated', v_event_updated,
+        'foods_updated', to_jsonb(v_foods_updated),
+        'reservations_cancelled', to_jsonb(v_cancelled),
+        'foods_restored', v_restored
+    );
+END;
+$$;
@@ -0,0 +1,103 @@
+-- Only reserve and cancel kept the rollups of 20261017129000_host_analytics.sql right: a reservation removed by
+-- any other path (a food or a user deleted and the ON DELETE CASCADE with it) stayed counted as held.
+-- Every deleted reservation now goes through track_reservation with negative deltas from a row trigger, so
+-- apply_event_update stops tracking its cancellations itself.
+
+-- Reservations removed with their event skip it, the event's rollups go with the event
+CREATE OR REPLACE FUNCTION untrack_deleted_reservation() RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_creator_id INT;
+BEGIN
+    SELECT creator_id INTO v_creator_id FROM events WHERE event_id = OLD.event_id;
+    IF FOUND THEN
+        PERFORM track_reservation(OLD.event_id, v_creator_id, OLD.user_id, OLD.food_name, OLD.res_time, -OLD.quantity, -1);
+    END IF;
+    RETURN OLD;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS reservations_untrack ON reservations;
+CREATE TRIGGER reservations_untrack
+    AFTER DELETE ON reservations
+    FOR EACH ROW EXECUTE FUNCTION untrack_deleted_reservation();
+
+-- A deleted user's attendee rows are removed by the trigger as their reservations go, cascading them as well
+-- could drop them first and leave the attendee counts behind. Checked at commit, once the cascade is done.
+ALTER TABLE event_attendees DROP CONSTRAINT IF EXISTS event_attendees_user_id_fkey;
+ALTER TABLE event_attendees ADD CONSTRAINT event_attendees_user_id_fkey
+    FOREIGN KEY (user_id) REFERENCES users(user_id) DEFERRABLE INITIALLY DEFERRED;
+
+-- Same as in 20261017134000_apply_event_update_keep_foods.sql, the trigger takes the cancellations out of the rollups
+CREATE OR REPLACE FUNCTION apply_event_update(
+    p_event_id INT,
+    p_event JSONB,
+    p_food_updates JSONB,
+    p_cancellations JSONB
+) RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_event_updated BOOLEAN := FALSE;
+    v_foods_updated INT[];
+    v_cancelled INT[];
+    v_restored JSONB;
+BEGIN
+    IF p_event IS NOT NULL AND p_event <> '{}'::JSONB THEN
+        UPDATE events SET
+            event_name = COALESCE(p_event->>'event_name', event_name),
+            description = CASE WHEN p_event ? 'description' THEN p_event->>'description' ELSE description END,
+            start_time = COALESCE((p_event->>'start_time')::TIMESTAMP WITH TIME ZONE, start_time),
+            last_res_time = COALESCE((p_event->>'last_res_time')::TIMESTAMP WITH TIME ZONE, last_res_time),
+            location_lat = COALESCE((p_event->>'location_lat')::DOUBLE PRECISION, location_lat),
+            location_lng = COALESCE((p_event->>'location_lng')::DOUBLE PRECISION, location_lng),
+            location_address = COALESCE(p_event->>'location_address', location_address)
+        WHERE event_id = p_event_id;
+        v_event_updated := FOUND;
+    END IF;
+
+    -- New quantities (0 included) and tags when sent, in one UPDATE
+    WITH updated AS (
+        UPDATE foods f SET
+            quantity = u.quantity,
+            dietary_tags = COALESCE(u.dietary_tags, f.dietary_tags),
+            dietary_mask = COALESCE(u.dietary_mask, f.dietary_mask)
+        FROM jsonb_to_recordset(COALESCE(p_food_updates, '[]'::JSONB))
+             AS u (food_id INT, quantity INT, dietary_tags TEXT, dietary_mask INT)
+        WHERE f.food_id = u.food_id AND f.event_id = p_event_id
+        RETURNING f.food_id
+    )
+    SELECT COALESCE(array_agg(food_id ORDER BY food_id), '{}') INTO v_foods_updated FROM updated;
+
+    -- Cancel reservations and give their quantity back to their food
+    WITH cancelled AS (
+        DELETE FROM reservations r
+        USING jsonb_to_recordset(COALESCE(p_cancellations, '[]'::JSONB)) AS c (res_id INT)
+        WHERE r.res_id = c.res_id AND r.event_id = p_event_id
+        RETURNING r.res_id, r.food_id, r.quantity
+    ),
+    per_food AS (
+        SELECT food_id, sum(quantity)::INT AS quantity
+        FROM cancelled
+        GROUP BY food_id
+    ),
+    restored AS (
+        UPDATE foods f SET quantity = f.quantity + p.quantity
+        FROM per_food p
+        WHERE f.food_id = p.food_id
+        RETURNING f.food_id, f.quantity
+    )
+    SELECT
+        (SELECT COALESCE(array_agg(res_id ORDER BY res_id), '{}') FROM cancelled),
+        (SELECT COALESCE(jsonb_agg(jsonb_build_object('food_id', food_id, 'quantity', quantity)), '[]'::JSONB) FROM restored)
+    INTO v_cancelled, v_restored;
+
+    RETURN jsonb_build_object(
+        'event_updated', v_event_updated,
+        'foods_updated', to_jsonb(v_foods_updated),
+        'reservations_cancelled', to_jsonb(v_cancelled),
+        'foods_restored', v_restored
+    );
+END;
+$$;
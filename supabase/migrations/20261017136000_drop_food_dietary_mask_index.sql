@@ -0,0 +1,4 @@
+-- Dietary filters only look foods up by containment on the tag array (dietary_tag_list @> ..., GIN index of
+-- 20261017131000_food_dietary_tag_list.sql), for vocabulary and free text tags alike. The dietary_mask = ANY(...)
+-- lookup over every superset mask is gone, so is its index. dietary_mask itself is still written with the tags.
+DROP INDEX IF EXISTS foods_dietary_mask_idx;